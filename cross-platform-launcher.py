@@ -4,16 +4,48 @@ Factory Management App Launcher - Cross Platform
 Works on both Ubuntu/Linux and Windows
 """
 
+import asyncio
+import contextlib
 import os
+import signal
 import sys
-import subprocess
-import threading
 import time
 import webbrowser
-import json
 import platform
 from pathlib import Path
 
+from factory_launcher.activation import (ACTIVATION_WAIT, backend_client_spec,
+                                         client_backend_port, lazy_start_enabled,
+                                         switch_when_listening)
+from factory_launcher.aio import LoopThread, TkDispatcher, run_blocking
+from factory_launcher.api_cache import CachingProxy, ResponseCache, cache_enabled, cache_settings
+from factory_launcher.backup import BackupManager, BackupScheduler, database_url, export_dir
+from factory_launcher.backup import main as backup_main
+from factory_launcher.bench import main as bench_main
+from factory_launcher.build import build_target, build_targets
+from factory_launcher.build_cache import BuildCache
+from factory_launcher.endpoint_panel import EndpointPanel
+from factory_launcher.first_load import FirstLoadHistory, first_load_enabled, measure_first_load
+from factory_launcher.inspector import Inspector, inspect_env, inspector_enabled
+from factory_launcher.install import CANCELLED, install_package, install_targets, shared_installer
+from factory_launcher.instance import claim, control_main, release, spawn_daemon
+from factory_launcher.log_buffer import LogHistory
+from factory_launcher.log_sink import TkLogSink
+from factory_launcher.mongo import prepare_database
+from factory_launcher.prod import StaticServer, cluster_script, prod_services, server_workers
+from factory_launcher.profiler import StartupProfiler
+from factory_launcher.proxy import BACKEND_HOST, ReverseProxy
+from factory_launcher.seed import main as seed_main
+from factory_launcher.standby import StandbyService, backend_ports, dev_server_spec, standby_enabled
+from factory_launcher.supervisor import Supervisor, app_services
+from factory_launcher.readiness import CLIENT_PORT, DEFAULT_PORTS, SERVER_PORT, ReadinessProbe
+from factory_launcher.resource_panel import ResourcePanel
+from factory_launcher.route_stats import RouteStatsStore, RouteTable, report, stats_path
+from factory_launcher.resources import ResourceMonitor
+from factory_launcher.shutdown import reclaim_ports
+from factory_launcher.stages import StageGraph
+from factory_launcher.toolchain import resolve_toolchain
+
 try:
     import tkinter as tk
     from tkinter import ttk, messagebox, scrolledtext
@@ -24,9 +56,40 @@ except ImportError:
 class CrossPlatformLauncher:
     def __init__(self):
         self.app_dir = Path(__file__).parent
-        self.processes = []
+        self.supervisor = None
+        self.static_server = None
+        self.proxy = None
+        self.client_proxy = None
+        self.activation_task = None
+        self.browser_opened = False
+        self.monitor = None
+        self.backup_scheduler = None
+        self.route_stats = None
+        self.inspector = None
+        self.mode = 'dev'
         self.root = None
         self.log_text = None
+        self.log_sink = None
+        self.readiness_probe = None
+        self.profiler = None
+        self.profile_startup = False
+        self.profile_compare = 5
+        self.profile_done = None
+        self.stages = None
+        self.ready_task = None
+        # The GUI runs the event loop on one background thread and receives
+        # results through the dispatcher; the CLI runs it on the main thread
+        self.loop_thread = None
+        self.dispatcher = None
+        self.loop = None
+        self.stop_requested = None
+        # --daemon/--serve: keep running with the app stopped until 'quit'
+        self.daemon = False
+        # 'start', 'stop' or 'restart' while one runs from the control socket
+        self.transition = None
+        self.transition_task = None
+        # The launch's shared npm installer, so an abandoned start can kill it
+        self.installer = None
         self.platform = platform.system().lower()
         self.is_windows = self.platform == 'windows'
         self.is_linux = self.platform == 'linux'
@@ -41,10 +104,9 @@ class CrossPlatformLauncher:
         log_message = f"[{timestamp}] {message}"
         print(log_message)
         
-        if self.log_text:
-            self.log_text.insert(tk.END, log_message + "\n")
-            self.log_text.see(tk.END)
-            self.root.update()
+        # Safe from reader threads; the Tk main loop draws queued lines in batches
+        if self.log_sink:
+            self.log_sink.write(log_message)
     
     def setup_node_environment(self):
         """Setup Node.js environment for both Windows and Linux"""
@@ -129,82 +191,12 @@ class CrossPlatformLauncher:
     
     def check_requirements(self):
         """Check if Node.js and npm are installed"""
-        self.setup_node_environment()
-        
-        try:
-            # Check Node.js
-            node_result = subprocess.run([self.node_cmd, '--version'], 
-                                       capture_output=True, text=True, timeout=10)
-            if node_result.returncode == 0:
-                self.log(f"Node.js found: {node_result.stdout.strip()}")
-            else:
-                self.log("Node.js not found or not working")
-                return False
-            
-            # Check npm
-            npm_result = subprocess.run([self.npm_cmd, '--version'], 
-                                      capture_output=True, text=True, timeout=10)
-            if npm_result.returncode == 0:
-                self.log(f"npm found: {npm_result.stdout.strip()}")
-                return True
-            else:
-                self.log("npm not found or not working")
-                return False
-                
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-            self.log(f"Error checking requirements: {e}")
-            return False
-    
-    def install_dependencies(self):
-        """Install all dependencies"""
-        self.log("Installing dependencies...")
-        
-        try:
-            # Install root dependencies
-            if not (self.app_dir / 'node_modules').exists():
-                self.log("Installing root dependencies...")
-                result = subprocess.run([self.npm_cmd, 'install'], 
-                                      cwd=self.app_dir, 
-                                      capture_output=True, text=True, timeout=300)
-                if result.returncode != 0:
-                    self.log(f"Error installing root dependencies: {result.stderr}")
-                    return False
-            
-            # Install client dependencies
-            client_dir = self.app_dir / 'client'
-            if client_dir.exists() and not (client_dir / 'node_modules').exists():
-                self.log("Installing client dependencies...")
-                result = subprocess.run([self.npm_cmd, 'install'], 
-                                      cwd=client_dir, 
-                                      capture_output=True, text=True, timeout=300)
-                if result.returncode != 0:
-                    self.log(f"Error installing client dependencies: {result.stderr}")
-                    return False
-            
-            # Install server dependencies
-            server_dir = self.app_dir / 'server'
-            if server_dir.exists() and not (server_dir / 'node_modules').exists():
-                self.log("Installing server dependencies...")
-                result = subprocess.run([self.npm_cmd, 'install'], 
-                                      cwd=server_dir, 
-                                      capture_output=True, text=True, timeout=300)
-                if result.returncode != 0:
-                    self.log(f"Error installing server dependencies: {result.stderr}")
-                    return False
-            
-            self.log("Dependencies installed successfully!")
-            return True
-            
-        except subprocess.TimeoutExpired:
-            self.log("Timeout while installing dependencies")
-            return False
-        except Exception as e:
-            self.log(f"Error installing dependencies: {e}")
-            return False
-    
-    def start_application(self):
-        """Start the MERN application"""
-        if not self.check_requirements():
+        # The nvm/install-folder probe and version checks only run when the
+        # cached toolchain no longer matches the binaries on disk
+        toolchain = resolve_toolchain(self.node_cmd, self.npm_cmd,
+                                      discover=self.setup_node_environment,
+                                      log=self.log)
+        if not toolchain:
             error_msg = "Node.js or npm not found!\n\n"
             if self.is_windows:
                 error_msg += "Please install Node.js from https://nodejs.org\n"
@@ -214,55 +206,101 @@ class CrossPlatformLauncher:
                 error_msg += "- Ubuntu: sudo apt install nodejs npm\n"
                 error_msg += "- Or use nvm: curl -o- https://raw.githubusercontent.com/nvm-sh/nvm/v0.39.0/install.sh | bash"
             
-            if GUI_AVAILABLE and self.root:
-                messagebox.showerror("Requirements Missing", error_msg)
-            else:
-                print(f"ERROR: {error_msg}")
+            self.show_error("Requirements Missing", error_msg)
             return False
         
-        # Install dependencies if needed
-        if not self.install_dependencies():
-            error_msg = "Failed to install dependencies. Please check your internet connection."
-            if GUI_AVAILABLE and self.root:
-                messagebox.showerror("Installation Failed", error_msg)
-            else:
-                print(f"ERROR: {error_msg}")
+        source = " (cached)" if toolchain.cached else ""
+        self.log(f"Node.js found: {toolchain.node_version}{source}")
+        self.log(f"npm found: {toolchain.npm_version}{source}")
+        return True
+    
+    def install_dependencies(self, name, installer):
+        """Install one package's dependencies ('root', 'client' or 'server')"""
+        try:
+            # Skipped when the lockfile is unchanged
+            if install_package(self.app_dir, name, installer):
+                return True
+        except Exception as e:
+            self.log(f"Error installing {name} dependencies: {e}")
+        if installer.errors.get(name) == CANCELLED:
+            # The install that failed first reports it
             return False
+        self.show_error("Installation Failed",
+                        "Failed to install dependencies. Please check your internet connection.")
+        return False
+    
+    def build_bundle(self, target, cache):
+        """Build one bundle if its sources changed"""
+        npm = ['cmd', '/c', 'npm'] if self.is_windows else [self.npm_cmd]
+        if build_target(target, npm, cache, self.log):
+            return True
+        self.show_error("Build Failed", "Failed to build the application. See the log for details.")
+        return False
+    
+    def profile_phase(self, name):
+        """Time a launch phase when a startup profile is being recorded"""
+        if self.profiler:
+            return self.profiler.phase(name)
+        return contextlib.nullcontext()
+    
+    def show_error(self, title, message):
+        """Show an error dialog on the Tk thread, or print it in CLI mode"""
+        if GUI_AVAILABLE and self.root and self.dispatcher:
+            self.dispatcher.post(messagebox.showerror, title, message)
+        else:
+            print(f"ERROR: {message}")
+    
+    async def start_application(self):
+        """Start the MERN application"""
+        self.profiler = StartupProfiler()
+        self.profile_done = asyncio.Event()
+        self.browser_opened = False
+        self.log(f"Starting Factory Management Application ({self.mode} mode)...")
         
         try:
-            self.log("Starting Factory Management Application...")
+            # FACTORY_WARM_STANDBY=1 or FACTORY_API_CACHE=1: the API port
+            # belongs to a local proxy and the server runs behind it, where
+            # restarts start a replacement before the old one goes away.
+            # FACTORY_LAZY_START=1 also puts the client behind one.
+            proxied = standby_enabled() or cache_enabled() or lazy_start_enabled()
             
-            # Use the appropriate script based on platform
-            if self.is_windows:
-                # On Windows, use cmd to run npm scripts
-                cmd = ['cmd', '/c', 'npm', 'run', 'dev']
-            else:
-                # On Linux, run npm directly
-                cmd = [self.npm_cmd, 'run', 'dev']
+            # Per-route latency analytics from the server's request log
+            self.route_stats = RouteStatsStore(RouteTable.from_server(self.app_dir),
+                                               path=stats_path())
+            # CPU profiles and heap snapshots over the server's inspector
+            # (FACTORY_INSPECT=off leaves it out)
+            if inspector_enabled():
+                self.inspector = Inspector([self.app_dir / 'server', cluster_script().parent],
+                                           log=self.log)
+            self.supervisor = Supervisor(log=self.log, on_ready=self.on_service_ready,
+                                         on_line=self.on_service_line)
             
-            # Start the application
-            process = subprocess.Popen(
-                cmd,
-                cwd=self.app_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,  # Redirect stderr to stdout
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                encoding='utf-8',  # Force UTF-8 encoding
-                errors='replace'   # Replace encoding errors
-            )
-            
-            self.processes.append(process)
+            # Each service starts as soon as its own dependencies are in
+            # place, rather than after every install and build has finished
+            self.stages = self.launch_stages(proxied)
+            if not await self.stages.run():
+                for line in self.stages.summary().splitlines():
+                    self.log(line)
+                await self.stop_application()
+                return False
             self.log("Application starting...")
             
-            # Start a thread to monitor the process
-            monitor_thread = threading.Thread(target=self.monitor_process, args=(process,))
-            monitor_thread.daemon = True
-            monitor_thread.start()
+            # Sample CPU/RSS of each service tree; see FACTORY_RSS_LIMIT_MB
+            self.monitor = ResourceMonitor(self.supervisor, log=self.log,
+                                           on_alert=self.on_resource_alert)
+            self.monitor.start()
             
-            # Wait a bit then try to open browser
-            threading.Timer(5.0, self.open_browser).start()
+            # Off-peak backups (FACTORY_BACKUP_AT=HH:MM) are taken here so
+            # the server's download route only serves the exported archive
+            backup_at = os.environ.get('FACTORY_BACKUP_AT')
+            if backup_at and not self.backup_scheduler:
+                manager = BackupManager(database_url(self.app_dir), log=self.log)
+                self.backup_scheduler = BackupScheduler(manager, backup_at,
+                                                        export_dir(self.app_dir), log=self.log)
+                self.backup_scheduler.start()
+            
+            # Open the browser as soon as both ports answer
+            self.ready_task = asyncio.ensure_future(self.wait_until_ready())
             
             return True
             
@@ -270,51 +308,305 @@ class CrossPlatformLauncher:
             self.log(f"Error starting application: {e}")
             return False
     
-    def monitor_process(self, process):
-        """Monitor process output"""
+    def launch_stages(self, proxied):
+        """Declare the launch as a graph of stages and what each one needs
+        
+        npm installs and builds only need Node; MongoDB and the port
+        cleanup need nothing; each service waits for its own package.
+        """
+        graph = StageGraph(log=self.log, profiler=self.profiler)
+        packages = [name for name, _ in install_targets(self.app_dir)]
+        
+        graph.add('node discovery', self.check_requirements, blocking=True)
+        # A previous run that was not shut down cleanly can leave node
+        # processes holding our ports; stop them before starting again
+        ports = DEFAULT_PORTS + (backend_ports() if proxied else ())
+        if lazy_start_enabled():
+            ports += (client_backend_port(),)
+        graph.add('reclaim ports', lambda: self.free_ports(ports), blocking=True)
+        # One installer for every package keeps FACTORY_INSTALL_JOBS as the
+        # cap on npm processes and kills the others when one install fails
+        installer = self.installer = shared_installer(self.npm_cmd, log=self.log)
+        for name in packages:
+            graph.add(f"{name} deps",
+                      lambda name=name: self.install_dependencies(name, installer),
+                      after=['node discovery'], blocking=True)
+        # The server only listens once mongoose has connected, so start
+        # a local mongod if needed and wait for it to answer a ping
+        graph.add('database', self.start_database)
+        
+        ready = {}
+        for name in ('server', 'client'):
+            ready[name] = ['reclaim ports'] + ([f"{name} deps"] if name in packages else [])
+        if self.mode == 'prod':
+            cache = BuildCache(self.app_dir, log=self.log)
+            for target in build_targets(self.app_dir):
+                graph.add(f"{target.name} build",
+                          lambda target=target: self.build_bundle(target, cache),
+                          after=ready[target.name], blocking=True)
+                ready[target.name] = [f"{target.name} build"]
+        if proxied:
+            graph.add('proxy', self.start_proxy, after=['reclaim ports'])
+            ready['server'].append('proxy')
+        if lazy_start_enabled():
+            # Both ports are bound before anything else has happened, so
+            # the browser can open now; its requests wait in the proxies
+            graph.add('client proxy', self.start_client_proxy, after=['reclaim ports'])
+            ready['client'].append('client proxy')
+            if not self.profile_startup:
+                graph.add('open browser', self.open_browser_early,
+                          after=['proxy', 'client proxy'], blocking=True)
+        
+        graph.add('server start', self.start_server, after=ready['server'] + ['database'])
+        graph.add('client start', self.start_client, after=ready['client'])
+        return graph
+    
+    def free_ports(self, ports):
+        # A port held by some other program is reported, not fatal
+        reclaim_ports(ports, self.log)
+        return True
+    
+    async def start_database(self):
+        error = await prepare_database(self.app_dir, self.supervisor, self.log)
+        if error:
+            self.show_error("Database Unavailable", error)
+            return False
+        return True
+    
+    async def start_proxy(self):
+        if cache_enabled():
+            routes, ttl = cache_settings()
+            self.log(f"Caching GET /v1/{{{','.join(routes)}}} for {ttl:.0f}s")
+            self.proxy = CachingProxy(SERVER_PORT, cache=ResponseCache(routes, ttl),
+                                      log=self.log)
+        else:
+            self.proxy = ReverseProxy(SERVER_PORT, log=self.log)
+        if lazy_start_enabled():
+            self.proxy.backend_wait = ACTIVATION_WAIT
+        await self.proxy.start()
+        return True
+    
+    async def start_client_proxy(self):
+        # Vite only listens on localhost, so the proxy in its place does too
+        self.client_proxy = ReverseProxy(CLIENT_PORT, host='localhost',
+                                         backend_wait=ACTIVATION_WAIT, log=self.log)
+        await self.client_proxy.start()
+        return True
+    
+    def open_browser_early(self):
+        self.open_browser()
+        self.browser_opened = True
+        return True
+    
+    def service_spec(self, name):
+        """The dev or prod spec for 'server' or 'client'"""
+        npm = ['cmd', '/c', 'npm'] if self.is_windows else [self.npm_cmd]
+        if self.mode == 'prod':
+            # Bundled server under a cluster
+            specs = prod_services(self.app_dir, self.node_cmd, server_workers())
+        else:
+            specs = app_services(self.app_dir, npm)
+        spec = next((spec for spec in specs if spec.name == name), None)
+        if spec and name == 'server':
+            # The download route serves the scheduled backups from here
+            spec.env = dict(spec.env or {},
+                            FACTORY_BACKUP_EXPORT_DIR=str(export_dir(self.app_dir)))
+            if inspector_enabled():
+                spec.env = inspect_env(spec.env)
+        return spec
+    
+    async def start_server(self):
+        # Server and client run as separate children so a server crash
+        # only restarts the backend and Vite stays warm
+        spec = self.service_spec('server')
+        if self.mode == 'prod':
+            self.log(f"Running the server with {server_workers()} worker(s)")
+        if self.proxy:
+            self.supervisor.add_service(self.standby_server(spec))
+        else:
+            self.supervisor.add(spec)
+        self.supervisor.start_all()
+        return True
+    
+    async def start_client(self):
+        port = client_backend_port() if self.client_proxy else CLIENT_PORT
+        if self.mode == 'prod':
+            # The built client is served from this process instead of Vite
+            host = BACKEND_HOST if self.client_proxy else ''
+            self.static_server = StaticServer(self.app_dir / 'client' / 'dist', port=port,
+                                              host=host, log=self.log)
+            self.static_server.start()
+            if self.client_proxy:
+                self.client_proxy.switch(port)
+        else:
+            spec = self.service_spec('client')
+            if self.client_proxy:
+                spec = backend_client_spec(spec, port)
+            service = self.supervisor.add(spec)
+            self.supervisor.start_all()
+            if self.client_proxy:
+                self.activation_task = asyncio.ensure_future(switch_when_listening(
+                    self.client_proxy, port, service, log=self.log))
+        return True
+    
+    def standby_server(self, spec):
+        """Wrap the server spec so restarts go through a warm standby"""
+        if self.mode == 'prod':
+            # A rebuilt bundle is rolled out like a restart
+            watch = [self.app_dir / 'server' / 'dist']
+        else:
+            # nodemon would restart in place; reload through the proxy instead
+            spec = dev_server_spec(self.app_dir, self.node_cmd)
+            watch = [self.app_dir / 'server' / 'src']
+        return StandbyService(spec, self.proxy, watch=watch, log=self.log,
+                              shutdown_policy=self.supervisor.shutdown_policy,
+                              on_ready=self.on_service_ready, on_line=self.on_service_line)
+    
+    def is_app_running(self):
+        """True while any supervised service is running or restarting"""
+        return self.supervisor is not None and self.supervisor.is_running()
+    
+    def on_resource_alert(self, service, message, metric):
+        """Show a resource alert in the status bar; capture the server's state"""
+        if self.dispatcher:
+            self.dispatcher.post(self.status_var.set, message)
+        # Sustained CPU gets a profile, sustained memory a heap snapshot
+        if self.inspector and service.name.split(':')[0] == 'server' and not self.inspector.busy:
+            self.log(f"Capturing the server's state after: {message}")
+            asyncio.ensure_future(self.capture('profile' if metric == 'cpu' else 'heap'))
+    
+    async def capture(self, kind, seconds=None):
+        """Take a CPU profile ('profile') or heap snapshot ('heap'); return the files"""
+        if not self.inspector:
+            self.log("The server's inspector is off (FACTORY_INSPECT)" if not inspector_enabled()
+                     else "The application is not running")
+            return []
+        if kind == 'profile':
+            return await self.inspector.cpu_profile(seconds)
+        return await self.inspector.heap_snapshot()
+    
+    def on_service_ready(self, service):
+        """Record a service's "ready" log line on the startup timeline"""
+        if self.profiler:
+            self.profiler.mark(f"{service.name} ready (log)", at=service.ready_at)
+    
+    def on_service_line(self, service, line):
+        """Feed the server's morgan request lines to the route statistics"""
+        if service.name == 'server' and self.route_stats:
+            self.route_stats.feed(line)
+        if self.inspector and service.name.split(':')[0] == 'server':
+            self.inspector.feed(service, line)
+    
+    async def wait_until_ready(self):
+        """Poll the client and server ports, then open the browser"""
+        self.readiness_probe = ReadinessProbe(log=self.log)
+        ready = await self.readiness_probe.wait_async()
+        self.report_critical_path()
+        if ready:
+            self.log(f"Application ready in {self.readiness_probe.elapsed:.1f}s")
+            # The crawl fetches every module the client serves; keep it
+            # off the normal launch path
+            if self.profile_startup or first_load_enabled():
+                await run_blocking(self.report_first_load)
+            if not self.profile_startup and not self.browser_opened:
+                await run_blocking(self.open_browser)
+        elif self.is_app_running():
+            self.log("Application did not become ready; open http://localhost:5173 manually")
+        self.finish_profile(ready)
+    
+    def report_critical_path(self):
+        """Log which chain of launch stages decided when the app was ready"""
+        if not self.stages:
+            return
+        probe = self.readiness_probe
+        for name, port in (('server', SERVER_PORT), ('client', CLIENT_PORT)):
+            if port in probe.ready_times:
+                self.stages.record(f"port {port} answered", [f"{name} start"],
+                                   probe.started + probe.ready_times[port])
+        for line in self.stages.summary().splitlines():
+            self.log(line)
+    
+    def report_first_load(self):
+        """Measure an empty-cache page load and compare it with the other mode"""
         try:
-            for line in iter(process.stdout.readline, ''):
-                if line:
-                    # Handle encoding issues on Windows
-                    try:
-                        clean_line = line.strip()
-                        # Remove ANSI color codes for Windows compatibility
-                        import re
-                        clean_line = re.sub(r'\x1b\[[0-9;]*m', '', clean_line)
-                        self.log(f"APP: {clean_line}")
-                    except UnicodeDecodeError:
-                        self.log(f"APP: [Binary output - encoding issue]")
-                if process.poll() is not None:
-                    break
+            with self.profile_phase('first load'):
+                result = measure_first_load()
         except Exception as e:
-            self.log(f"Error monitoring process: {e}")
+            self.log(f"Could not measure first load: {e}")
+            return
+        history = FirstLoadHistory()
+        self.log(history.summary(self.mode, result))
+        try:
+            history.record(self.mode, result)
+        except OSError as e:
+            self.log(f"Could not save first-load measurement: {e}")
+    
+    def finish_profile(self, ready):
+        """Save the launch timeline and print the waterfall in profile mode"""
+        profiler = self.profiler
+        if not profiler:
+            return
+        for port, seconds in self.readiness_probe.ready_times.items():
+            profiler.mark(f"port {port} answered", at=self.readiness_probe.started + seconds)
+        if ready:
+            profiler.finish()
+            try:
+                path = profiler.save()
+                self.log(f"Startup timeline saved to {path}")
+            except OSError as e:
+                self.log(f"Could not save startup timeline: {e}")
+        if self.profile_startup:
+            print(profiler.waterfall())
+            print(profiler.comparison(self.profile_compare))
+        self.profile_done.set()
     
-    def stop_application(self):
+    async def stop_application(self):
         """Stop all running processes"""
         self.log("Stopping application...")
         
-        for process in self.processes:
+        if self.readiness_probe:
+            self.readiness_probe.cancel()
+        if self.ready_task:
+            self.ready_task.cancel()
+            self.ready_task = None
+        
+        if self.monitor:
+            self.monitor.stop()
+        self.inspector = None
+        
+        if self.backup_scheduler:
+            self.backup_scheduler.stop()
+            self.backup_scheduler = None
+        
+        if self.supervisor:
+            await self.supervisor.stop_all()
+            self.supervisor = None
+        
+        if self.static_server:
+            await run_blocking(self.static_server.stop)
+            self.static_server = None
+        
+        if self.activation_task:
+            self.activation_task.cancel()
+            self.activation_task = None
+        if self.client_proxy:
+            await self.client_proxy.stop()
+            self.client_proxy = None
+        
+        if self.proxy:
+            await self.proxy.stop()
+            if isinstance(self.proxy, CachingProxy):
+                metrics = self.proxy.cache.snapshot()['totals']
+                self.log(f"API cache: {metrics.get('hit', 0)} hits, {metrics.get('miss', 0)} misses, "
+                         f"{metrics.get('invalidated', 0)} entries invalidated")
+            self.proxy = None
+        
+        if self.route_stats and self.route_stats.requests:
             try:
-                if self.is_windows:
-                    # On Windows, use taskkill to stop the process tree
-                    subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], 
-                                 capture_output=True)
-                else:
-                    # On Linux, terminate the process
-                    process.terminate()
-                    process.wait(timeout=5)
-            except Exception as e:
-                self.log(f"Error stopping process: {e}")
-                try:
-                    if self.is_windows:
-                        subprocess.run(['taskkill', '/F', '/PID', str(process.pid)], 
-                                     capture_output=True)
-                    else:
-                        process.kill()
-                except:
-                    pass
-        
-        self.processes.clear()
+                self.route_stats.save()
+            except OSError as e:
+                self.log(f"Could not save request statistics: {e}")
+        
         self.log("Application stopped")
     
     def open_browser(self):
@@ -334,7 +626,11 @@ class CrossPlatformLauncher:
         
         self.root = tk.Tk()
         self.root.title("Factory Management App Launcher")
-        self.root.geometry("600x500")
+        self.loop_thread = LoopThread().start()
+        self.loop = self.loop_thread.loop
+        self.dispatcher = TkDispatcher(self.root)
+        self.dispatcher.start()
+        self.root.geometry("760x820")
         
         # Set icon based on platform
         try:
@@ -378,7 +674,20 @@ class CrossPlatformLauncher:
         # Open browser button
         self.browser_btn = ttk.Button(buttons_frame, text="Open Browser", 
                                      command=self.open_browser)
-        self.browser_btn.grid(row=0, column=2)
+        self.browser_btn.grid(row=0, column=2, padx=(0, 10))
+        
+        # Load older log lines from the on-disk history
+        self.older_btn = ttk.Button(buttons_frame, text="Load Older Logs", 
+                                   command=self.on_load_older)
+        self.older_btn.grid(row=0, column=3)
+        
+        # Captures of the running server for later analysis in DevTools
+        self.profile_btn = ttk.Button(buttons_frame, text="CPU Profile", 
+                                     command=lambda: self.on_capture('profile'))
+        self.profile_btn.grid(row=1, column=0, padx=(0, 10), pady=(10, 0), sticky=tk.W)
+        self.heap_btn = ttk.Button(buttons_frame, text="Heap Snapshot", 
+                                  command=lambda: self.on_capture('heap'))
+        self.heap_btn.grid(row=1, column=1, padx=(0, 10), pady=(10, 0), sticky=tk.W)
         
         # Log area
         log_label = ttk.Label(main_frame, text="Application Log:")
@@ -390,13 +699,27 @@ class CrossPlatformLauncher:
         
         self.log_text = scrolledtext.ScrolledText(log_frame, height=15, width=70)
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.log_sink = TkLogSink(self.root, self.log_text,
+                                  history=LogHistory('cross-platform-launcher'))
+        self.log_sink.start()
+        
+        # Per-service CPU/RSS sparklines
+        self.resource_panel = ResourcePanel(main_frame, lambda: self.monitor)
+        self.resource_panel.frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E))
+        self.resource_panel.start()
+        
+        # Routes with the highest recent p95 latency
+        self.endpoint_panel = EndpointPanel(main_frame, lambda: self.route_stats)
+        self.endpoint_panel.frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E),
+                                       pady=(10, 0))
+        self.endpoint_panel.start()
         
         # Status bar
         self.status_var = tk.StringVar()
         self.status_var.set("Ready")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, 
                               relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_bar.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
         
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
@@ -416,37 +739,188 @@ class CrossPlatformLauncher:
         self.start_btn.config(state='disabled')
         self.status_var.set("Starting application...")
         
-        def start_thread():
-            success = self.start_application()
-            if success:
-                self.stop_btn.config(state='normal')
-                self.status_var.set("Application running")
-            else:
-                self.start_btn.config(state='normal')
-                self.status_var.set("Failed to start")
-        
-        threading.Thread(target=start_thread, daemon=True).start()
+        future = self.loop_thread.submit(self.transition_to('start'))
+        future.add_done_callback(lambda f: self.dispatcher.post(self.on_started, f))
+    
+    def on_started(self, future):
+        """Update the buttons once start_application finishes (Tk thread)"""
+        if not future.cancelled() and future.exception() is None and future.result():
+            self.stop_btn.config(state='normal')
+            self.status_var.set("Application running")
+        else:
+            self.start_btn.config(state='normal')
+            self.status_var.set("Failed to start")
     
     def on_stop(self):
         """Handle stop button click"""
         self.stop_btn.config(state='disabled')
         self.status_var.set("Stopping application...")
         
-        def stop_thread():
-            self.stop_application()
-            self.start_btn.config(state='normal')
-            self.status_var.set("Application stopped")
-        
-        threading.Thread(target=stop_thread, daemon=True).start()
+        future = self.loop_thread.submit(self.transition_to('stop'))
+        future.add_done_callback(lambda f: self.dispatcher.post(self.on_stopped))
+    
+    def on_stopped(self):
+        """Update the buttons once the application has stopped (Tk thread)"""
+        self.start_btn.config(state='normal')
+        self.status_var.set("Application stopped")
+    
+    def on_capture(self, kind):
+        """Handle the CPU Profile and Heap Snapshot buttons"""
+        label = "CPU profile" if kind == 'profile' else "heap snapshot"
+        self.status_var.set(f"Taking a {label}...")
+        future = self.loop_thread.submit(self.capture(kind))
+        future.add_done_callback(lambda f: self.dispatcher.post(self.on_captured, label, f))
+    
+    def on_captured(self, label, future):
+        """Report where a capture was saved (Tk thread)"""
+        paths = None if future.cancelled() or future.exception() else future.result()
+        if paths:
+            self.status_var.set(f"Saved {label} to {paths[0]}")
+        else:
+            self.status_var.set(f"No {label} taken; see the log")
+    
+    def on_load_older(self):
+        """Handle load older logs button click"""
+        if not self.log_sink.load_older():
+            self.status_var.set("No older log history")
     
     def on_closing(self):
         """Handle window closing"""
-        if self.processes:
-            if messagebox.askokcancel("Quit", "Application is running. Stop it and quit?"):
-                self.stop_application()
-                self.root.destroy()
-        else:
-            self.root.destroy()
+        if self.transition or self.is_app_running():
+            state = (f"A {self.transition} is in progress" if self.transition
+                     else "Application is running")
+            if not messagebox.askokcancel("Quit", f"{state}. Stop it and quit?"):
+                return
+        self.close_gui()
+    
+    def close_gui(self):
+        """Stop the application and close the window"""
+        self.loop_thread.call(self.shut_down())
+        self.resource_panel.stop()
+        self.dispatcher.stop()
+        self.loop_thread.stop()
+        self.log_sink.close()
+        self.root.destroy()
+    
+    def handle_control(self, request):
+        """Answer a command from the control socket (on its own thread)"""
+        command = request['command']
+        if self.loop is None:
+            return {'ok': False, 'error': "the launcher is still starting"}
+        if command == 'status':
+            return self.instance_status()
+        if command == 'activate':
+            # Someone launched the app again: show it, starting it if needed
+            if self.transition or self.is_app_running():
+                command = 'open'
+            else:
+                self.submit_transition('start')
+                return dict(self.instance_status(), message="Starting the application")
+        if command == 'open':
+            if self.dispatcher:
+                self.dispatcher.post(self.raise_window)
+            self.open_browser()
+            return dict(self.instance_status(), message="Opened http://localhost:5173")
+        if command == 'quit':
+            if self.dispatcher:
+                self.dispatcher.post(self.close_gui)
+            else:
+                self.loop.call_soon_threadsafe(self.stop_requested.set)
+            return dict(self.instance_status(), message="Launcher is shutting down")
+        if command in ('profile', 'heap'):
+            future = asyncio.run_coroutine_threadsafe(
+                self.capture(command, request.get('seconds')), self.loop)
+            paths = future.result()
+            if not paths:
+                return dict(self.instance_status(), ok=False,
+                            error="nothing was captured; see the launcher output")
+            return dict(self.instance_status(), message="Saved " + ", ".join(paths))
+        if self.transition == command:
+            # e.g. 'ctl start' right after --daemon: wait for the start under way
+            while self.transition:
+                time.sleep(0.2)
+            return dict(self.instance_status(), ok=command == 'stop' or self.is_app_running())
+        if self.transition:
+            return dict(self.instance_status(), ok=False,
+                        error=f"a {self.transition} is already in progress")
+        if not self.submit_transition(command).result():
+            return dict(self.instance_status(), ok=False,
+                        error=f"could not {command} the application; see the launcher output")
+        return self.instance_status()
+    
+    def submit_transition(self, command):
+        """Run a start, stop or restart on the loop; return a concurrent future"""
+        if self.dispatcher:
+            label = "Stopping" if command == 'stop' else "Starting"
+            self.dispatcher.post(self.status_var.set, f"{label} application...")
+        future = asyncio.run_coroutine_threadsafe(self.transition_to(command), self.loop)
+        if self.dispatcher:
+            future.add_done_callback(lambda f: self.dispatcher.post(self.sync_controls))
+        return future
+    
+    async def transition_to(self, command):
+        """Stop and/or start the application; False if another change is running"""
+        if self.transition:
+            return False
+        self.transition = command
+        self.transition_task = asyncio.current_task()
+        try:
+            if command in ('stop', 'restart') and self.supervisor:
+                await self.stop_application()
+            if command in ('start', 'restart') and not self.is_app_running():
+                return await self.start_application()
+            return True
+        finally:
+            self.transition = None
+            self.transition_task = None
+    
+    async def cancel_start(self):
+        """Abandon a start under way: kill its npm installs and stop its stages"""
+        task = self.transition_task
+        if not task or task.done() or self.transition not in ('start', 'restart'):
+            return
+        self.log("Cancelling the launch...")
+        if self.installer:
+            self.installer.cancel()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.log(f"Launch ended with an error: {e}")
+    
+    async def shut_down(self):
+        """Cancel or finish a change under way, then stop whatever is left"""
+        task = self.transition_task
+        if self.transition in ('start', 'restart'):
+            await self.cancel_start()
+        elif task and not task.done():
+            await asyncio.wait([task])
+        # A failed or cancelled start can leave mongod, the proxy or the
+        # static server behind without any service counting as running
+        if self.supervisor or self.proxy or self.client_proxy or self.static_server:
+            await self.stop_application()
+    
+    def instance_status(self):
+        """Status reply for the control socket"""
+        supervisor = self.supervisor
+        return {'ok': True, 'launcher': 'cross-platform-launcher', 'pid': os.getpid(),
+                'mode': self.mode, 'running': self.is_app_running(),
+                'transition': self.transition,
+                'services': supervisor.status() if supervisor else []}
+    
+    def sync_controls(self):
+        """Match the buttons to the application's state (Tk thread)"""
+        running = self.is_app_running()
+        self.start_btn.config(state='disabled' if running else 'normal')
+        self.stop_btn.config(state='normal' if running else 'disabled')
+        self.status_var.set("Application running" if running else "Application stopped")
+    
+    def raise_window(self):
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
     
     def run_cli(self):
         """Run in command line mode"""
@@ -455,48 +929,134 @@ class CrossPlatformLauncher:
         print("=" * 50)
         
         try:
-            if not self.check_requirements():
-                print("ERROR: Node.js or npm not found!")
-                if self.is_windows:
-                    print("Please install Node.js from https://nodejs.org")
-                else:
-                    print("Please install Node.js: sudo apt install nodejs npm")
-                return False
-            
-            if not self.install_dependencies():
-                print("ERROR: Failed to install dependencies")
-                return False
-            
-            print("Starting application... (Press Ctrl+C to stop)")
-            success = self.start_application()
-            
-            if success:
-                # Keep the main thread alive
-                try:
-                    while self.processes:
-                        time.sleep(1)
-                        # Check if any process has ended
-                        for process in self.processes[:]:
-                            if process.poll() is not None:
-                                self.processes.remove(process)
-                except KeyboardInterrupt:
-                    print("\nStopping application...")
-                    self.stop_application()
-            
-            return success
-            
+            return asyncio.run(self.run_cli_async())
         except Exception as e:
             print(f"Error: {e}")
             return False
+    
+    async def run_cli_async(self):
+        """Start the application and wait for Ctrl+C or for every service to end"""
+        loop = self.loop = asyncio.get_event_loop()
+        stop_requested = self.stop_requested = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_requested.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows: a plain handler that wakes the loop
+                signal.signal(sig, lambda *args: loop.call_soon_threadsafe(stop_requested.set))
+        
+        # start_application checks requirements and installs dependencies;
+        # installs, builds and the database wait can take minutes, so Ctrl+C
+        # is watched while they run
+        print("Starting application... (Press Ctrl+C to stop)")
+        start = asyncio.ensure_future(self.transition_to('start'))
+        stopping = asyncio.ensure_future(stop_requested.wait())
+        await asyncio.wait([start, stopping], return_when=asyncio.FIRST_COMPLETED)
+        if not start.done():
+            print("\nStopping application...")
+            await self.cancel_start()
+            await self.stop_application()
+            return False
+        stopping.cancel()
+        success = start.result()
+        if not success and not self.daemon:
+            return False
+        
+        while True:
+            # Wake only on an event: all services ended, Ctrl+C, 'quit' on
+            # the control socket, or a finished profile. A daemon outlives
+            # its services so it can start them again.
+            waiters = [asyncio.ensure_future(stop_requested.wait())]
+            if self.supervisor and not self.daemon:
+                waiters.append(asyncio.ensure_future(self.supervisor.wait()))
+            if self.profile_startup:
+                waiters.append(asyncio.ensure_future(self.profile_done.wait()))
+            _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in pending:
+                waiter.cancel()
+            if stop_requested.is_set():
+                # 'quit' while a start from the control socket is under way
+                await self.cancel_start()
+            # A restart from the control socket also ends the old services
+            while self.transition:
+                await asyncio.sleep(0.1)
+            if (stop_requested.is_set() or self.profile_done.is_set()
+                    or not (self.daemon or self.is_app_running())):
+                break
+        
+        if stop_requested.is_set():
+            print("\nStopping application...")
+        await self.stop_application()
+        return success
 
 def main():
     """Main entry point"""
+    # bench [options]: load-test the running API; see --help
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        return bench_main(sys.argv[2:]) == 0
+    # seed [options]: load a deterministic synthetic dataset into local MongoDB
+    if len(sys.argv) > 1 and sys.argv[1] == 'seed':
+        return seed_main(sys.argv[2:]) == 0
+    # backup run|list|verify|restore|export: deduplicated database backups
+    if len(sys.argv) > 1 and sys.argv[1] == 'backup':
+        return backup_main(sys.argv[2:], Path(__file__).parent) == 0
+    
+    # --report [LOG ...]: per-route request statistics of the last session,
+    # or of saved server logs
+    if len(sys.argv) > 1 and sys.argv[1] == '--report':
+        return report(Path(__file__).parent, sys.argv[2:]) == 0
+    # ctl start|stop|restart|status|open|quit: control the running launcher
+    if len(sys.argv) > 1 and sys.argv[1] == 'ctl':
+        return control_main(sys.argv[2:]) == 0
+    
     launcher = CrossPlatformLauncher()
     
+    # --mode prod: build changed bundles, run the bundled server under a
+    # cluster and serve the built client; may be combined with the options below
+    if '--mode' in sys.argv:
+        index = sys.argv.index('--mode')
+        mode = sys.argv[index + 1] if index + 1 < len(sys.argv) else ''
+        if mode not in ('dev', 'prod'):
+            print("Usage: --mode dev|prod")
+            return False
+        launcher.mode = mode
+        del sys.argv[index:index + 2]
+    
+    # --daemon: run the launcher in the background and return at once
+    if len(sys.argv) > 1 and sys.argv[1] == '--daemon':
+        script = Path(__file__).resolve()
+        return spawn_daemon([sys.executable, str(script), '--serve', '--mode', launcher.mode],
+                            script.parent) == 0
+    
+    # Only one launcher runs the app; a repeat launch asks that one to
+    # show the app (or start it) and exits
+    claimed = claim('cross-platform-launcher', launcher.handle_control)
+    if claimed is None:
+        return True
+    try:
+        return run_launcher(launcher)
+    finally:
+        release(claimed)
+
+def run_launcher(launcher):
+    """Run the launcher in the mode the command line asks for"""
+    # --serve: the daemon itself, in the foreground, without a window
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        launcher.daemon = True
+        return launcher.run_cli()
+    
     # Check command line arguments
     if len(sys.argv) > 1 and sys.argv[1] == '--cli':
         return launcher.run_cli()
     
+    # --profile-startup [N]: launch, print the startup waterfall compared
+    # with the previous N launches, then stop
+    if len(sys.argv) > 1 and sys.argv[1] == '--profile-startup':
+        launcher.profile_startup = True
+        if len(sys.argv) > 2 and sys.argv[2].isdigit():
+            launcher.profile_compare = int(sys.argv[2])
+        return launcher.run_cli()
+    
     # Try GUI mode
     if GUI_AVAILABLE:
         root = launcher.create_gui()
@@ -88,9 +88,16 @@ if ! python3 -c "import tkinter" 2>/dev/null; then
     exit 1
 fi
 
+# FACTORY_LAZY_START=1: use the launcher that binds the app ports at once,
+# so the browser opens immediately and waits for the app instead of a blank screen
+LAUNCHER="launcher.py"
+if [ -n "$FACTORY_LAZY_START" ]; then
+    LAUNCHER="cross-platform-launcher.py"
+fi
+
 # Try to run the Python GUI launcher
-log_message "Attempting to start Python GUI launcher"
-if python3 launcher.py 2>> "$LOG_FILE"; then
+log_message "Attempting to start Python GUI launcher ($LAUNCHER)"
+if python3 "$LAUNCHER" 2>> "$LOG_FILE"; then
     log_message "Python GUI launcher completed successfully"
 else
     error_code=$?
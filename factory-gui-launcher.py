@@ -10,8 +10,16 @@ import subprocess
 import threading
 import os
 import time
-import signal
 import sys
+from pathlib import Path
+
+from factory_launcher.aio import LoopThread, TkDispatcher
+from factory_launcher.instance import attach, claim, release
+from factory_launcher.log_buffer import LogHistory
+from factory_launcher.log_sink import TkLogSink
+from factory_launcher.readiness import ReadinessProbe, SERVER_PORT
+from factory_launcher.supervisor import Supervisor, app_services
+from factory_launcher.toolchain import resolve_toolchain
 
 class FactoryAppLauncher:
     def __init__(self):
@@ -21,7 +29,8 @@ class FactoryAppLauncher:
         self.root.resizable(True, True)
         
         # Application state
-        self.process = None
+        self.supervisor = None
+        self.loop_thread = LoopThread().start()
         self.is_running = False
         
         # Setup Node.js environment
@@ -29,12 +38,22 @@ class FactoryAppLauncher:
         
         # Create GUI
         self.create_widgets()
+        # Widget updates from other threads go through here
+        self.dispatcher = TkDispatcher(self.root)
+        self.dispatcher.start()
         
         # Handle window close
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
     def setup_node_environment(self):
-        """Setup Node.js environment with nvm"""
+        """Setup Node.js environment, reusing the cached toolchain when valid"""
+        toolchain = resolve_toolchain('node', 'npm', discover=self.discover_node_environment)
+        if toolchain:
+            self.node_path = toolchain.node_path
+            self.npm_path = toolchain.npm_path
+    
+    def discover_node_environment(self):
+        """Find Node.js through setup-env.sh or nvm (slow; runs on cache miss)"""
         try:
             # Source environment setup script
             setup_script = os.path.join(os.getcwd(), "setup-env.sh")
@@ -127,19 +146,28 @@ class FactoryAppLauncher:
         
         self.log_text = scrolledtext.ScrolledText(main_frame, height=15, width=60)
         self.log_text.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        self.log_sink = TkLogSink(self.root, self.log_text,
+                                  history=LogHistory('factory-gui-launcher'))
+        self.log_sink.start()
         
-        # Clear log button
-        ttk.Button(main_frame, text="Clear Log", command=self.clear_log).grid(row=5, column=0, columnspan=2)
+        # Log buttons
+        log_buttons_frame = ttk.Frame(main_frame)
+        log_buttons_frame.grid(row=5, column=0, columnspan=2)
+        ttk.Button(log_buttons_frame, text="Load Older Logs", command=self.load_older_logs).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(log_buttons_frame, text="Clear Log", command=self.clear_log).pack(side=tk.LEFT)
     
     def log_message(self, message):
-        """Add a message to the log"""
-        self.log_text.insert(tk.END, f"{time.strftime('%H:%M:%S')} - {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """Add a message to the log; safe to call from any thread"""
+        self.log_sink.write(f"{time.strftime('%H:%M:%S')} - {message}")
     
     def clear_log(self):
         """Clear the log"""
-        self.log_text.delete(1.0, tk.END)
+        self.log_sink.clear()
+    
+    def load_older_logs(self):
+        """Show older log lines from the on-disk history"""
+        if not self.log_sink.load_older():
+            messagebox.showinfo("Log History", "No older log history available.")
     
     def start_app(self):
         """Start the MERN application"""
@@ -165,40 +193,40 @@ class FactoryAppLauncher:
         
         # Start the application in a separate thread
         def run_app():
+            supervisor = None
             try:
-                # Run npm start with the correct environment
-                self.process = subprocess.Popen(
-                    [self.npm_path, "start"],
-                    cwd=project_dir,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    universal_newlines=True,
-                    bufsize=1
-                )
+                # What `npm start` runs, as two supervised children: the
+                # server's start script and the client's preview
+                supervisor = self.supervisor = Supervisor(log=self.log_message)
+                for spec in app_services(Path(project_dir), self.npm_path,
+                                         scripts=('start', 'preview')):
+                    supervisor.add(spec)
+                self.loop_thread.loop.call_soon_threadsafe(supervisor.start_all)
                 
                 self.is_running = True
-                self.root.after(0, lambda: self.status_label.config(text="Running", foreground="green"))
-                self.root.after(5000, lambda: self.open_button.config(state="normal"))  # Enable browser button after 5 seconds
+                self.dispatcher.post(lambda: self.status_label.config(text="Running", foreground="green"))
+                threading.Thread(target=self.enable_browser_when_ready, daemon=True).start()
                 
-                # Read output
-                for line in iter(self.process.stdout.readline, ''):
-                    if line:
-                        self.root.after(0, lambda msg=line.strip(): self.log_message(msg))
-                    if not self.is_running:
-                        break
-                
-                # Process finished
-                self.process.wait()
+                # Returns once both services have stopped or given up
+                self.loop_thread.call(supervisor.wait())
                 
             except Exception as e:
-                self.root.after(0, lambda: self.log_message(f"Error: {str(e)}"))
+                self.log_message(f"Error: {str(e)}")
             finally:
-                if self.is_running:
-                    self.root.after(0, self.app_stopped)
+                # Not if a restart has already replaced this supervisor
+                if self.is_running and self.supervisor is supervisor:
+                    self.dispatcher.post(self.app_stopped)
         
         # Start in thread
         threading.Thread(target=run_app, daemon=True).start()
     
+    def enable_browser_when_ready(self):
+        """Enable the browser button once the server port answers"""
+        probe = ReadinessProbe(ports=(SERVER_PORT,))
+        if probe.wait() and self.is_running:
+            self.log_message(f"Application ready in {probe.elapsed:.1f}s")
+            self.dispatcher.post(lambda: self.open_button.config(state="normal"))
+    
     def stop_app(self):
         """Stop the MERN application"""
         if not self.is_running:
@@ -207,28 +235,25 @@ class FactoryAppLauncher:
         self.log_message("Stopping application...")
         self.is_running = False
         
-        if self.process:
+        if self.supervisor:
             try:
-                # Try graceful shutdown first
-                self.process.terminate()
-                
-                # Wait a bit for graceful shutdown
-                try:
-                    self.process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # Force kill if it doesn't stop gracefully
-                    self.process.kill()
-                    self.process.wait()
-                
+                # Each service's process group goes down SIGINT -> SIGTERM -> SIGKILL
+                self.loop_thread.call(self.supervisor.stop_all())
             except Exception as e:
                 self.log_message(f"Error stopping process: {e}")
         
         self.app_stopped()
     
+    def restart_app(self):
+        """Stop the application, then start it again"""
+        # stop_app returns once every service has exited
+        self.stop_app()
+        self.start_app()
+    
     def app_stopped(self):
         """Update UI when app stops"""
         self.is_running = False
-        self.process = None
+        self.supervisor = None
         self.start_button.config(state="normal")
         self.stop_button.config(state="disabled")
         self.open_button.config(state="disabled")
@@ -244,13 +269,42 @@ class FactoryAppLauncher:
         except Exception as e:
             self.log_message(f"Error opening browser: {e}")
     
+    def handle_control(self, request):
+        """Answer a command from the control socket (on its own thread)"""
+        command = request['command']
+        status = {'ok': True, 'launcher': 'factory-gui-launcher', 'pid': os.getpid(),
+                  'running': self.is_running}
+        if command == 'status':
+            return status
+        if command == 'activate':
+            command = 'open' if self.is_running else 'start'
+        if command in ('profile', 'heap'):
+            return dict(status, ok=False, error="captures need cross-platform-launcher.py")
+        # Tk is not thread-safe: queue the action for the window's main loop
+        if command == 'open':
+            self.dispatcher.post(self.root.deiconify)
+            self.open_browser()
+        elif command == 'start' and not self.is_running:
+            self.dispatcher.post(self.start_app)
+        elif command == 'stop':
+            self.dispatcher.post(self.stop_app)
+        elif command == 'restart':
+            self.dispatcher.post(self.restart_app)
+        elif command == 'quit':
+            self.dispatcher.post(self.on_closing)
+        return dict(status, message=f"Sent '{command}' to the launcher window")
+    
     def on_closing(self):
         """Handle window close event"""
         if self.is_running:
             if messagebox.askokcancel("Quit", "Application is still running. Stop it and quit?"):
                 self.stop_app()
+                self.dispatcher.stop()
+                self.log_sink.close()
                 self.root.after(1000, self.root.destroy)
         else:
+            self.dispatcher.stop()
+            self.log_sink.close()
             self.root.destroy()
     
     def run(self):
@@ -270,6 +324,13 @@ if __name__ == "__main__":
         print(f"Node.js path: {launcher.node_path}")
         print(f"npm path: {launcher.npm_path}")
     else:
-        # Normal GUI mode
-        launcher = FactoryAppLauncher()
-        launcher.run()
+        # Normal GUI mode; a second launch shows the running app instead,
+        # before it builds a window or resolves the toolchain
+        claimed = claim('factory-gui-launcher')
+        if claimed is not None:
+            try:
+                launcher = FactoryAppLauncher()
+                attach(claimed, launcher.handle_control)
+                launcher.run()
+            finally:
+                release(claimed)
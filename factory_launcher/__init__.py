@@ -0,0 +1,5 @@
+"""
+Factory Management App Launcher - shared support package
+Building blocks used by launcher.py, cross-platform-launcher.py,
+windows-launcher.py and factory-gui-launcher.py
+"""
@@ -0,0 +1,57 @@
+"""
+Socket-activated lazy start
+The launcher binds the app ports the moment it starts and the browser can
+open at once; connections wait in the proxies until the real server and
+client are up behind them instead of being refused
+"""
+
+import asyncio
+import os
+
+from factory_launcher.proxy import BACKEND_HOST
+from factory_launcher.readiness import check_port_async
+from factory_launcher.supervisor import ServiceSpec
+
+DEFAULT_CLIENT_BACKEND_PORT = 5174
+# How long an early connection may wait; a first launch installs packages
+ACTIVATION_WAIT = 600.0
+
+
+def lazy_start_enabled():
+    return os.environ.get('FACTORY_LAZY_START', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def client_backend_port():
+    """Where Vite (or the static server) listens behind the client proxy"""
+    try:
+        return int(os.environ.get('FACTORY_LAZY_CLIENT_PORT', DEFAULT_CLIENT_BACKEND_PORT))
+    except ValueError:
+        return DEFAULT_CLIENT_BACKEND_PORT
+
+
+def backend_client_spec(spec, port):
+    """The Vite spec moved to `port` on 127.0.0.1, where the proxy expects it"""
+    # Vite on newer Node binds "localhost" to ::1 only, and would pick
+    # another port if this one is taken; pin both
+    cmd = spec.cmd + ['--', '--host', BACKEND_HOST, '--port', str(port), '--strictPort']
+    return ServiceSpec(spec.name, cmd, spec.cwd, env=spec.env, restart=spec.restart,
+                       max_restarts=spec.max_restarts, backoff_initial=spec.backoff_initial,
+                       backoff_max=spec.backoff_max, stable_after=spec.stable_after,
+                       crash_pattern=spec.crash_pattern and spec.crash_pattern.pattern,
+                       ready_pattern=spec.ready_pattern and spec.ready_pattern.pattern)
+
+
+async def switch_when_listening(proxy, port, service=None, timeout=ACTIVATION_WAIT, log=None):
+    """Point `proxy` at `port` once something accepts connections there"""
+    log = log or print
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if await check_port_async(BACKEND_HOST, port, use_http=False, timeout=0.5):
+            proxy.switch(port)
+            return True
+        if service and service.finished():
+            break
+        await asyncio.sleep(0.2)
+    log(f"Nothing is listening on port {port}; requests to port {proxy.port} will time out")
+    return False
@@ -0,0 +1,81 @@
+"""
+Event loop plumbing shared by the CLI and GUI front ends
+The CLI runs the launcher's asyncio loop on the main thread; the GUI runs
+the same loop on one background thread and hands results back to Tk
+"""
+
+import asyncio
+import collections
+import threading
+
+DISPATCH_MS = 50
+
+
+def run_blocking(func, *args):
+    """Run a blocking call (npm install, a build) without stalling the loop"""
+    return asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+class LoopThread:
+    """An asyncio event loop running on a dedicated daemon thread"""
+
+    def __init__(self, name='launcher-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, coro):
+        """Schedule a coroutine from any thread; return a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, coro, timeout=None):
+        """Run a coroutine on the loop and block for its result"""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+class TkDispatcher:
+    """Queue callables from any thread and run them on the Tk main loop
+
+    Tk is not thread-safe, so code on the event loop thread posts its
+    widget updates here instead of touching widgets directly.
+    """
+
+    def __init__(self, root, interval_ms=DISPATCH_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._pending = collections.deque()
+        self._running = False
+
+    def post(self, func, *args):
+        """Run func(*args) on the Tk main loop; safe to call from any thread"""
+        self._pending.append((func, args))
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        self._running = False
+
+    def _drain(self):
+        if not self._running:
+            return
+        try:
+            while self._pending:
+                func, args = self._pending.popleft()
+                func(*args)
+        finally:
+            self.root.after(self.interval_ms, self._drain)
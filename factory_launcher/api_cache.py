@@ -0,0 +1,250 @@
+"""
+Response cache for read-heavy API routes
+An HTTP-aware version of the local proxy that answers repeated GETs of
+slow-changing lists (products, customers, ...) from an LRU/TTL cache
+keyed on the caller's identity, and drops a resource's entries whenever
+a POST/PUT/PATCH/DELETE touches it
+
+Hit/miss counters are served by the proxy itself at /__proxy/metrics, to
+callers on this machine only.
+"""
+
+import collections
+import hashlib
+import ipaddress
+import json
+import os
+import time
+
+from factory_launcher.proxy import ReverseProxy, encode_head, header
+
+DEFAULT_ROUTES = ('products', 'customers', 'suppliers', 'accounts')
+DEFAULT_TTL = 30.0
+MAX_ENTRIES = 1000
+MAX_BYTES = 64 * 1024 * 1024
+MAX_ENTRY_BYTES = 4 * 1024 * 1024
+METRICS_PATH = '/__proxy/metrics'
+API_PREFIX = '/v1/'
+
+MUTATING_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+# Writes that also change what other resources return: sales and purchases
+# move product stock, and the customer/supplier/account ledgers are built
+# from sales, purchases, transactions and accounts
+INVALIDATES = {
+    'sales': ('products', 'customers'),
+    'purchases': ('products', 'suppliers'),
+    'transactions': ('accounts', 'customers', 'suppliers'),
+    'accounts': ('customers', 'suppliers'),
+}
+HOP_BY_HOP = {'connection', 'keep-alive', 'transfer-encoding', 'content-length',
+              'proxy-connection', 'te', 'trailer', 'upgrade'}
+
+
+def cache_enabled():
+    return os.environ.get('FACTORY_API_CACHE', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def cache_settings():
+    """(routes, ttl) from FACTORY_API_CACHE_ROUTES and FACTORY_API_CACHE_TTL"""
+    value = os.environ.get('FACTORY_API_CACHE_ROUTES')
+    routes = DEFAULT_ROUTES
+    if value:
+        routes = tuple(part.strip() for part in value.split(',') if part.strip())
+    try:
+        ttl = float(os.environ.get('FACTORY_API_CACHE_TTL', DEFAULT_TTL))
+    except ValueError:
+        ttl = DEFAULT_TTL
+    return routes, ttl
+
+
+def resource_of(target):
+    """'/v1/products/123?x=1' -> 'products'"""
+    path = target.split('?', 1)[0]
+    if not path.startswith(API_PREFIX):
+        return None
+    return path[len(API_PREFIX):].split('/', 1)[0] or None
+
+
+def is_loopback(peername):
+    """True if a socket peer address is on this machine"""
+    try:
+        address = ipaddress.ip_address(peername[0].split('%', 1)[0])
+    except (TypeError, IndexError, ValueError):
+        return False
+    mapped = getattr(address, 'ipv4_mapped', None)
+    return (mapped or address).is_loopback
+
+
+class CacheEntry:
+    __slots__ = ('status_line', 'headers', 'body', 'stored_at', 'resource')
+
+    def __init__(self, status_line, headers, body, resource):
+        self.status_line = status_line
+        self.headers = headers
+        self.body = body
+        self.stored_at = time.monotonic()
+        self.resource = resource
+
+
+class ResponseCache:
+    """LRU of responses bounded by entry count, total bytes and age"""
+
+    def __init__(self, routes=DEFAULT_ROUTES, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES,
+                 max_bytes=MAX_BYTES):
+        self.routes = set(routes)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        # Bumped on every write, so a response that raced one is not stored
+        self.generations = collections.Counter()
+        self.metrics = collections.Counter()
+        self.route_metrics = collections.defaultdict(collections.Counter)
+
+    def key(self, target, headers):
+        """Cache key: URL plus whatever the response can vary on"""
+        identity = header(headers, 'authorization') or ''
+        encoding = 'gzip' if 'gzip' in (header(headers, 'accept-encoding') or '') else ''
+        origin = header(headers, 'origin') or ''
+        digest = hashlib.sha256(identity.encode('latin-1')).hexdigest()[:16]
+        return (target, digest, encoding, origin)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.stored_at > self.ttl:
+            self._remove(key)
+            self.metrics['expired'] += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.bytes += len(entry.body)
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._remove(next(iter(self.entries)))
+            self.metrics['evicted'] += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.bytes -= len(entry.body)
+
+    def invalidate(self, resource):
+        """Drop entries of `resource` and of resources derived from it"""
+        affected = {resource, *INVALIDATES.get(resource, ())}
+        for name in affected:
+            self.generations[name] += 1
+        stale = [key for key, entry in self.entries.items() if entry.resource in affected]
+        for key in stale:
+            self._remove(key)
+        self.metrics['invalidated'] += len(stale)
+
+    def count(self, resource, outcome):
+        self.metrics[outcome] += 1
+        self.route_metrics[resource][outcome] += 1
+
+    def snapshot(self):
+        hits, misses = self.metrics['hit'], self.metrics['miss']
+        return {
+            'entries': len(self.entries), 'bytes': self.bytes, 'ttl': self.ttl,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+            'totals': dict(self.metrics),
+            'routes': {name: dict(counts) for name, counts in self.route_metrics.items()},
+        }
+
+
+class CacheTap:
+    """Keeps a copy of a relayed response and stores it if it is cacheable"""
+
+    def __init__(self, cache, key, resource, generation):
+        self.cache = cache
+        self.key = key
+        self.resource = resource
+        self.generation = generation
+        self.cacheable = False
+        self.status_line = None
+        self.headers = None
+        self.copy = []
+        self.size = 0
+
+    def start(self, status, status_line, headers):
+        self.cacheable = (status == 200
+                          and 'no-store' not in (header(headers, 'cache-control') or ''))
+        self.status_line, self.headers = status_line, headers
+        return headers + [('X-Cache', 'MISS')]
+
+    def feed(self, data):
+        if self.cacheable:
+            self.size += len(data)
+            if self.size > MAX_ENTRY_BYTES:
+                self.cacheable = False
+                self.copy = []
+            else:
+                self.copy.append(data)
+
+    def finish(self):
+        if self.cacheable and self.cache.generations[self.resource] == self.generation:
+            kept = [(name, value) for name, value in self.headers
+                    if name.lower() not in HOP_BY_HOP]
+            self.cache.put(self.key, CacheEntry(self.status_line, kept, b''.join(self.copy),
+                                                self.resource))
+
+
+class CachingProxy(ReverseProxy):
+    """ReverseProxy that answers configured GETs from a ResponseCache"""
+
+    def __init__(self, port, cache=None, **kwargs):
+        super().__init__(port, **kwargs)
+        self.cache = cache or ResponseCache()
+
+    async def _serve(self, method, target, start_line, headers, body, writer, keep_alive,
+                     backend):
+        # The proxy listens on every interface; its counters are not for
+        # other machines, whose request goes on to the server (a 404)
+        if target == METRICS_PATH and is_loopback(writer.get_extra_info('peername')):
+            self._send_metrics(writer, keep_alive)
+            await writer.drain()
+            return backend, True
+
+        resource = resource_of(target)
+        tap = None
+        if method == 'GET' and resource in self.cache.routes:
+            key = self.cache.key(target, headers)
+            entry = self.cache.get(key)
+            if entry:
+                self.cache.count(resource, 'hit')
+                self._send_entry(writer, entry, keep_alive)
+                await writer.drain()
+                return backend, True
+            self.cache.count(resource, 'miss')
+            tap = CacheTap(self.cache, key, resource, self.cache.generations[resource])
+        elif method in MUTATING_METHODS and resource:
+            self.cache.invalidate(resource)
+
+        try:
+            return await self._exchange(backend, encode_head(start_line, headers) + body,
+                                        method, writer, tap)
+        finally:
+            if method in MUTATING_METHODS and resource:
+                # Again once the write is done, for GETs that raced it
+                self.cache.invalidate(resource)
+
+    def _send_entry(self, writer, entry, keep_alive):
+        age = int(time.monotonic() - entry.stored_at)
+        headers = entry.headers + [('Content-Length', str(len(entry.body))), ('Age', str(age)),
+                                   ('X-Cache', 'HIT'),
+                                   ('Connection', 'keep-alive' if keep_alive else 'close')]
+        writer.write(encode_head(entry.status_line, headers) + entry.body)
+
+    def _send_metrics(self, writer, keep_alive):
+        body = json.dumps(dict(self.cache.snapshot(), connections=self.connections,
+                               backend=self.backend), indent=2).encode('utf-8')
+        headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body))),
+                   ('Cache-Control', 'no-store'),
+                   ('Connection', 'keep-alive' if keep_alive else 'close')]
+        writer.write(encode_head('HTTP/1.1 200 OK', headers) + body)
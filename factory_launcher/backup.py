@@ -0,0 +1,476 @@
+"""
+Scheduled, deduplicated database backups
+Streams a mongodump archive into a content-addressed chunk store, keeps
+the last N verified generations and restores them through mongorestore
+
+Run it through the launcher:
+    python3 cross-platform-launcher.py backup run
+    python3 cross-platform-launcher.py backup restore latest
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from factory_launcher.aio import run_blocking
+from factory_launcher.paths import user_cache_dir
+
+DEFAULT_URI = 'mongodb://localhost:27017/factory'
+DEFAULT_KEEP = 7
+# Exported for the server's /v1/backup/download route, into
+# FACTORY_BACKUP_EXPORT_DIR (server/backup by default); the launcher passes
+# the same directory to the server. The marker beside the archive is what
+# tells the route the archive came from here and how old its data is.
+EXPORT_NAME = 'logix-backup.gz'
+EXPORT_MARKER = 'logix-backup.json'
+
+# mongodump --archive framing: a magic number, then BSON documents and
+# 0xFFFFFFFF terminators between collection blocks
+ARCHIVE_MAGIC = (0x8199e26d).to_bytes(4, 'little')
+TERMINATOR = -1
+# Chunks end on a document whose CRC matches the mask, so an inserted or
+# changed document only changes the chunk it falls in
+MIN_CHUNK = 256 * 1024
+MAX_CHUNK = 8 * 1024 * 1024
+BOUNDARY_MASK = 0x7ff
+COMPRESS_LEVEL = 6
+WORKERS = 4
+
+
+def _env_int(name, default):
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def read_env_file(path):
+    """Return KEY=value pairs from a dotenv file, or {}"""
+    values = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    values[key.strip()] = value.strip().strip('"\'')
+    except OSError:
+        pass
+    return values
+
+
+def database_url(app_dir):
+    """FACTORY_BACKUP_URI, else the server's MONGODB_URL, else the local default"""
+    return (os.environ.get('FACTORY_BACKUP_URI')
+            or read_env_file(Path(app_dir, 'server', '.env')).get('MONGODB_URL')
+            or DEFAULT_URI)
+
+
+def export_dir(app_dir):
+    """Where scheduled backups are exported for the server's download route"""
+    return Path(os.environ.get('FACTORY_BACKUP_EXPORT_DIR') or Path(app_dir, 'server', 'backup'))
+
+
+def redact(uri):
+    """Hide the password in a MongoDB URI"""
+    return re.sub(r'//([^:/@]+):[^@]*@', r'//\1:***@', uri)
+
+
+def archive_chunks(stream):
+    """Split a mongodump archive stream into content-defined chunks
+
+    Falls back to fixed-size chunks if the stream is not in archive format.
+    """
+    chunk = bytearray(stream.read(4))
+    if bytes(chunk) != ARCHIVE_MAGIC:
+        yield from _fixed_chunks(stream, chunk)
+        return
+    while True:
+        header = stream.read(4)
+        if len(header) < 4:
+            chunk += header
+            break
+        length = int.from_bytes(header, 'little', signed=True)
+        if length == TERMINATOR:
+            chunk += header
+            continue
+        if length < 5:
+            yield from _fixed_chunks(stream, chunk + header)
+            return
+        document = header + stream.read(length - 4)
+        chunk += document
+        if len(chunk) >= MAX_CHUNK or (len(chunk) >= MIN_CHUNK
+                                       and not zlib.crc32(document) & BOUNDARY_MASK):
+            yield bytes(chunk)
+            chunk = bytearray()
+    if chunk:
+        yield bytes(chunk)
+
+
+def _fixed_chunks(stream, head):
+    data = bytes(head) + stream.read(MAX_CHUNK - len(head))
+    while data:
+        yield data
+        data = stream.read(MAX_CHUNK)
+
+
+class BackupStore:
+    """Compressed chunks by SHA-256 plus one manifest per generation"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or os.environ.get('FACTORY_BACKUP_DIR') or user_cache_dir('backups'))
+        self.chunks_dir = self.root / 'chunks'
+        self.generations_dir = self.root / 'generations'
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+        self.generations_dir.mkdir(parents=True, exist_ok=True)
+
+    def chunk_path(self, digest):
+        return self.chunks_dir / digest[:2] / digest
+
+    def put_chunk(self, data):
+        """Store a chunk unless present; return (digest, size, bytes written)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if path.exists():
+            return digest, len(data), 0
+        compressed = zlib.compress(data, COMPRESS_LEVEL)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f"{digest}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        return digest, len(data), len(compressed)
+
+    def get_chunk(self, digest):
+        """Return a chunk's contents, checking them against the digest"""
+        with open(self.chunk_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"chunk {digest[:12]} is corrupt")
+        return data
+
+    def generations(self):
+        """Return generation names, oldest first"""
+        return sorted(path.stem for path in self.generations_dir.glob('*.json'))
+
+    def resolve(self, name):
+        generations = self.generations()
+        if name in (None, 'latest'):
+            return generations[-1] if generations else None
+        return name if name in generations else None
+
+    def load(self, name):
+        with open(self.generations_dir / f"{name}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, manifest):
+        path = self.generations_dir / f"{manifest['name']}.json"
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def stream(self, name, workers=WORKERS):
+        """Yield a generation's archive in order, decompressing ahead in threads"""
+        digests = [digest for digest, _ in self.load(name)['chunks']]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = collections.deque()
+            for digest in digests:
+                pending.append(pool.submit(self.get_chunk, digest))
+                if len(pending) > workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def verify(self, name):
+        """Re-read a generation and check every chunk and the whole-archive hash"""
+        manifest = self.load(name)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for data in self.stream(name):
+                digest.update(data)
+                size += len(data)
+        except (OSError, ValueError, zlib.error):
+            size = -1
+        ok = digest.hexdigest() == manifest['sha256'] and size == manifest['size']
+        manifest['verified'] = ok
+        self.save(manifest)
+        return ok
+
+    def prune(self, keep):
+        """Drop generations beyond the newest `keep` and unreferenced chunks"""
+        removed = 0
+        for name in self.generations()[:-keep]:
+            (self.generations_dir / f"{name}.json").unlink()
+            removed += 1
+        referenced = set()
+        for name in self.generations():
+            referenced.update(digest for digest, _ in self.load(name)['chunks'])
+        freed = 0
+        for path in self.chunks_dir.glob('*/*'):
+            if path.name not in referenced:
+                freed += path.stat().st_size
+                path.unlink()
+        return removed, freed
+
+    def disk_usage(self):
+        return sum(path.stat().st_size for path in self.chunks_dir.glob('*/*'))
+
+
+class BackupManager:
+    """Dump, verify, rotate, restore and export backups of one database"""
+
+    def __init__(self, uri, store=None, keep=None, log=None):
+        self.uri = uri
+        self.store = store or BackupStore()
+        self.keep = keep or _env_int('FACTORY_BACKUP_KEEP', DEFAULT_KEEP)
+        self.log = log or print
+
+    @staticmethod
+    def tool(name):
+        return shutil.which(name)
+
+    def run(self):
+        """Take a backup; return its manifest, or None if the dump failed"""
+        mongodump = self.tool('mongodump')
+        if not mongodump:
+            self.log("mongodump not found; install the MongoDB Database Tools")
+            return None
+
+        start = time.monotonic()
+        name = time.strftime('%Y%m%d-%H%M%S')
+        self.log(f"Backing up {redact(self.uri)} as {name}...")
+        # One collection at a time keeps the archive order stable between
+        # runs, which is what lets unchanged chunks deduplicate
+        process = subprocess.Popen([mongodump, f'--uri={self.uri}', '--archive',
+                                    '--numParallelCollections=1', '--quiet'],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        chunks = []
+        digest = hashlib.sha256()
+        size = 0
+        written = 0
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            pending = collections.deque()
+            for data in archive_chunks(process.stdout):
+                digest.update(data)
+                size += len(data)
+                pending.append(pool.submit(self.store.put_chunk, data))
+                while len(pending) > WORKERS * 2 or (pending and pending[0].done()):
+                    chunk_digest, chunk_size, chunk_written = pending.popleft().result()
+                    chunks.append([chunk_digest, chunk_size])
+                    written += chunk_written
+            for future in pending:
+                chunk_digest, chunk_size, chunk_written = future.result()
+                chunks.append([chunk_digest, chunk_size])
+                written += chunk_written
+        stderr = process.stderr.read().decode('utf-8', 'replace').strip()
+        if process.wait() != 0:
+            self.log(f"mongodump failed ({process.returncode}): {stderr}")
+            return None
+
+        manifest = {'name': name, 'uri': redact(self.uri),
+                    'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'size': size, 'sha256': digest.hexdigest(), 'stored': written,
+                    'chunks': chunks, 'seconds': round(time.monotonic() - start, 1),
+                    'verified': False}
+        self.store.save(manifest)
+        if not self.store.verify(name):
+            self.log(f"Backup {name} failed verification")
+            return None
+        removed, freed = self.store.prune(self.keep)
+        self.log(f"Backup {name}: {format_size(size)} dumped, {format_size(written)} new on "
+                 f"disk in {time.monotonic() - start:.1f}s; {removed} old generation(s) "
+                 f"removed, {format_size(freed)} freed")
+        return self.store.load(name)
+
+    def restore(self, name, drop=True):
+        """Feed a generation to mongorestore; return True on success"""
+        mongorestore = self.tool('mongorestore')
+        if not mongorestore:
+            self.log("mongorestore not found; install the MongoDB Database Tools")
+            return False
+        start = time.monotonic()
+        command = [mongorestore, f'--uri={self.uri}', '--archive',
+                   '--numInsertionWorkersPerCollection=4', '--quiet']
+        if drop:
+            command.append('--drop')
+        self.log(f"Restoring {name} into {redact(self.uri)}...")
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        try:
+            for data in self.store.stream(name):
+                process.stdin.write(data)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        if process.wait() != 0:
+            self.log(f"mongorestore failed ({process.returncode})")
+            return False
+        self.log(f"Restored {name} in {time.monotonic() - start:.1f}s")
+        return True
+
+    def export(self, name, path, marker=None):
+        """Write a generation as a `mongorestore --gzip --archive` file
+
+        With `marker`, also record which generation it is and when it was
+        taken, after the archive is in place.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with gzip.open(tmp_path, 'wb', compresslevel=COMPRESS_LEVEL) as f:
+            for data in self.store.stream(name):
+                f.write(data)
+        os.replace(tmp_path, path)
+        if marker:
+            marker = Path(marker)
+            manifest = self.store.load(name)
+            tmp_marker = marker.with_name(marker.name + '.tmp')
+            with open(tmp_marker, 'w', encoding='utf-8') as f:
+                json.dump({'generation': name, 'created': manifest['created'],
+                           'archive': path.name}, f)
+            os.replace(tmp_marker, marker)
+        return path
+
+
+def seconds_until(at, now=None):
+    """Seconds from now until the next local HH:MM"""
+    now = now or datetime.datetime.now()
+    hour, minute = (int(part) for part in at.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class BackupScheduler:
+    """Run a daily backup at an off-peak local time on the launcher's loop
+
+    Each successful backup is also exported (with its marker) to
+    `export_dir`, where the download route picks it up instead of running
+    mongodump itself.
+    """
+
+    def __init__(self, manager, at, export_dir=None, log=None):
+        self.manager = manager
+        self.at = at
+        self.export_dir = Path(export_dir) if export_dir else None
+        self.log = log or print
+        self._task = None
+
+    def start(self):
+        try:
+            seconds_until(self.at)
+        except ValueError:
+            self.log(f"Ignoring FACTORY_BACKUP_AT={self.at!r}; expected HH:MM")
+            return None
+        self.log(f"Daily backup scheduled at {self.at}")
+        self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(seconds_until(self.at))
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.log(f"Scheduled backup failed: {e}")
+
+    async def run_once(self):
+        manifest = await run_blocking(self.manager.run)
+        if manifest and self.export_dir:
+            path = self.export_dir / EXPORT_NAME
+            await run_blocking(self.manager.export, manifest['name'], path,
+                               self.export_dir / EXPORT_MARKER)
+            self.log(f"Exported {manifest['name']} to {path}")
+        return manifest
+
+
+def _format_generation(manifest):
+    state = 'verified' if manifest.get('verified') else 'UNVERIFIED'
+    return (f"{manifest['name']}  {format_size(manifest['size']):>10}  "
+            f"{format_size(manifest['stored']):>10} new  {len(manifest['chunks']):6} chunks  {state}")
+
+
+def main(argv, app_dir=None):
+    app_dir = Path(app_dir or Path(__file__).resolve().parent.parent)
+    parser = argparse.ArgumentParser(prog='cross-platform-launcher.py backup',
+                                     description="Deduplicated MongoDB backups")
+    parser.add_argument('--uri', default=database_url(app_dir))
+    parser.add_argument('--dir', help="backup store (default FACTORY_BACKUP_DIR or the user cache)")
+    parser.add_argument('--keep', type=int, help=f"generations kept (default {DEFAULT_KEEP})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('run', help="take a backup now")
+    commands.add_parser('list', help="list generations")
+    verify = commands.add_parser('verify', help="re-check a generation")
+    verify.add_argument('generation', nargs='?', default='latest')
+    restore = commands.add_parser('restore', help="restore a generation")
+    restore.add_argument('generation', nargs='?', default='latest')
+    restore.add_argument('--no-drop', action='store_true',
+                         help="keep existing documents instead of dropping collections")
+    export = commands.add_parser('export', help="write a generation as a .gz archive")
+    export.add_argument('generation', nargs='?', default='latest')
+    export.add_argument('--output', help="archive path (default: the download route's export)")
+    args = parser.parse_args(argv)
+
+    manager = BackupManager(args.uri, store=BackupStore(args.dir), keep=args.keep)
+    store = manager.store
+    if args.command == 'run':
+        return 0 if manager.run() else 1
+    if args.command == 'list':
+        for name in store.generations():
+            print(_format_generation(store.load(name)))
+        print(f"Store: {store.root} ({format_size(store.disk_usage())})")
+        return 0
+
+    name = store.resolve(args.generation)
+    if not name:
+        print(f"No backup generation {args.generation!r}")
+        return 1
+    if args.command == 'verify':
+        ok = store.verify(name)
+        print(f"{name}: {'OK' if ok else 'FAILED'}")
+        return 0 if ok else 1
+    if args.command == 'restore':
+        return 0 if manager.restore(name, drop=not args.no_drop) else 1
+    if args.output:
+        path = manager.export(name, args.output)
+    else:
+        directory = export_dir(app_dir)
+        path = manager.export(name, directory / EXPORT_NAME, directory / EXPORT_MARKER)
+    print(f"Exported {name} to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
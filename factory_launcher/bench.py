@@ -0,0 +1,454 @@
+"""
+API load generator and latency benchmark
+Logs in once through /v1/auth, replays a weighted mix of read requests at a
+fixed arrival rate and reports throughput with HDR-style latency histograms
+
+Run it through the launcher:
+    python3 cross-platform-launcher.py bench --rate 50 --duration 60
+"""
+
+import argparse
+import array
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+from factory_launcher.paths import user_cache_dir
+
+DEFAULT_URL = 'http://localhost:3000/v1'
+DEFAULT_MIX = 'sales=25,sales-by-date=10,products=20,customers=15,purchases=10,transactions=10,roznamcha=10'
+REQUEST_TIMEOUT = 30.0
+PERCENTILES = (50.0, 75.0, 90.0, 95.0, 99.0, 99.9, 100.0)
+
+
+def _date_range(days):
+    end = datetime.date.today()
+    return (end - datetime.timedelta(days=days)).isoformat(), end.isoformat()
+
+
+def _by_date(path, days=30):
+    start, end = _date_range(days)
+    return f"{path}?startDate={start}&endDate={end}"
+
+
+# Named read requests against server/src/routes/v1; the mix picks among these
+REQUESTS = {
+    'sales': lambda: '/sales?limit=10&page=1',
+    'sales-by-date': lambda: _by_date('/sales/date'),
+    'sale-invoice-number': lambda: '/sales/invoice-number',
+    'products': lambda: '/products?limit=10&page=1',
+    'products-all': lambda: '/products/all',
+    'customers': lambda: '/customers?limit=10&page=1',
+    'customers-all': lambda: '/customers/all',
+    'purchases': lambda: '/purchases?limit=10&page=1',
+    'purchases-by-date': lambda: _by_date('/purchases/date'),
+    'suppliers': lambda: '/suppliers?limit=10&page=1',
+    'transactions': lambda: '/transactions?limit=10&page=1',
+    'transactions-by-date': lambda: _by_date('/transactions/date'),
+    'roznamcha': lambda: '/roznamcha?limit=10&page=1',
+}
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram in microseconds (HdrHistogram layout)
+
+    Values below 256us are exact; above that every power-of-two range is
+    split into 128 linear buckets (under 0.8% error) in about 26 KB.
+    """
+
+    SUB_BITS = 8
+    SUB_COUNT = 1 << SUB_BITS
+    HALF = SUB_COUNT >> 1
+    MAX_VALUE = 3600 * 1000 * 1000
+
+    def __init__(self):
+        size = self._index(self.MAX_VALUE) + 1
+        self.counts = array.array('Q', [0] * size)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value):
+        if value < self.SUB_COUNT:
+            return value
+        shift = value.bit_length() - self.SUB_BITS
+        return self.SUB_COUNT + (shift - 1) * self.HALF + ((value >> shift) - self.HALF)
+
+    def _highest_equivalent(self, index):
+        if index < self.SUB_COUNT:
+            return index
+        shift = (index - self.SUB_COUNT) // self.HALF + 1
+        top = (index - self.SUB_COUNT) % self.HALF + self.HALF
+        return ((top + 1) << shift) - 1
+
+    def record(self, micros):
+        micros = max(0, min(int(micros), self.MAX_VALUE))
+        self.counts[self._index(micros)] += 1
+        self.count += 1
+        self.total += micros
+        self.max = max(self.max, micros)
+        self.min = micros if self.min is None else min(self.min, micros)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    def percentile(self, percent):
+        """Value (us) at or below which `percent` of the samples fall"""
+        if not self.count:
+            return 0
+        target = max(1, int(round(percent / 100.0 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'min_ms': (self.min or 0) / 1000,
+            'mean_ms': round(self.total / self.count / 1000, 3) if self.count else 0,
+            'max_ms': self.max / 1000,
+            'percentiles_ms': {str(p): self.percentile(p) / 1000 for p in PERCENTILES},
+            # Sparse [bucket value us, count] pairs, enough to rebuild the histogram
+            'buckets': [[self._highest_equivalent(i), c] for i, c in enumerate(self.counts) if c],
+        }
+
+    def distribution(self):
+        """Text percentile table in the style of HdrHistogram's output"""
+        lines = [f"  {'Percentile':>10} {'Value (ms)':>12} {'Count':>10}"]
+        for percent in PERCENTILES:
+            value = self.percentile(percent)
+            below = sum(self.counts[:self._index(value) + 1])
+            lines.append(f"  {percent:>9.3f}% {value / 1000:>12.2f} {below:>10}")
+        return "\n".join(lines)
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            data = b''.join(chunks)
+        else:
+            data = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, response_headers, data
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class HttpPool:
+    """A bounded pool of keep-alive connections to one origin"""
+
+    def __init__(self, base_url, size):
+        parts = urllib.parse.urlsplit(base_url)
+        self.prefix = parts.path.rstrip('/')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._idle = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(HttpConnection(self.host, self.port))
+
+    async def request(self, method, path, headers=None, body=b''):
+        connection = await self._idle.get()
+        try:
+            return await asyncio.wait_for(
+                connection.request(method, self.prefix + path, headers or {}, body),
+                REQUEST_TIMEOUT)
+        except BaseException:
+            connection.close()
+            raise
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+def parse_mix(text):
+    """Parse "name=weight,..." into a list of (name, weight)"""
+    mix = []
+    for item in text.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in REQUESTS:
+            raise ValueError(f"unknown request '{name}'; choose from {', '.join(REQUESTS)}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+class Benchmark:
+    """Open-loop load run: requests start on schedule whether or not earlier ones finished
+
+    Latency is measured from each request's scheduled start, so a stalled
+    server shows up as queueing delay instead of a lower request rate.
+    """
+
+    def __init__(self, base_url, email, password, mix, rate, duration, warmup=5.0,
+                 connections=64, seed=1):
+        self.base_url = base_url
+        self.email = email
+        self.password = password
+        self.mix = mix
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.connections = connections
+        self.random = random.Random(seed)
+        self.histograms = {name: LatencyHistogram() for name, _ in mix}
+        self.statuses = {name: {} for name, _ in mix}
+        self.errors = {name: 0 for name, _ in mix}
+        self.token = None
+        self.refresh_token = None
+        self.refresh_lock = None
+        self.pool = None
+        self.elapsed = None
+
+    async def login(self):
+        body = json.dumps({'email': self.email, 'password': self.password}).encode('utf-8')
+        status, _, data = await self.pool.request('POST', '/auth/login',
+                                                  {'Content-Type': 'application/json'}, body)
+        if status != 200:
+            raise RuntimeError(f"login failed with HTTP {status}: {data[:200]!r}")
+        tokens = json.loads(data)['tokens']
+        self.token = tokens['access']['token']
+        self.refresh_token = tokens['refresh']['token']
+
+    async def refresh(self, expired):
+        """Replace the access token `expired`, once for all requests it failed"""
+        async with self.refresh_lock:
+            if self.token != expired:
+                # Another request's refresh already replaced it
+                return
+            await self._refresh()
+
+    async def _refresh(self):
+        body = json.dumps({'refreshToken': self.refresh_token}).encode('utf-8')
+        status, _, data = await self.pool.request('POST', '/auth/refresh-tokens',
+                                                  {'Content-Type': 'application/json'}, body)
+        if status == 200:
+            tokens = json.loads(data)
+            self.token = tokens['access']['token']
+            self.refresh_token = tokens['refresh']['token']
+
+    async def _one(self, name, scheduled, record):
+        token = self.token
+        headers = {'Authorization': f"Bearer {token}", 'Accept-Encoding': 'gzip'}
+        try:
+            status, _, _ = await self.pool.request('GET', REQUESTS[name](), headers)
+            if status == 401:
+                await self.refresh(token)
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            if record:
+                self.errors[name] += 1
+            return
+        if record:
+            # A 401 is rejected before the route does any work, so it is
+            # counted under statuses but kept out of the latency figures
+            if status != 401:
+                self.histograms[name].record((time.perf_counter() - scheduled) * 1e6)
+            self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+
+    async def run(self):
+        self.pool = HttpPool(self.base_url, self.connections)
+        self.refresh_lock = asyncio.Lock()
+        try:
+            await self.login()
+            names = [name for name, _ in self.mix]
+            weights = [weight for _, weight in self.mix]
+            interval = 1.0 / self.rate
+            start = time.perf_counter()
+            measure_from = start + self.warmup
+            end = measure_from + self.duration
+            tasks = set()
+            sent = 0
+            while True:
+                scheduled = start + sent * interval
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                name = self.random.choices(names, weights)[0]
+                task = asyncio.ensure_future(self._one(name, scheduled, scheduled >= measure_from))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                sent += 1
+            if tasks:
+                await asyncio.wait(tasks)
+            self.elapsed = time.perf_counter() - measure_from
+        finally:
+            await self.pool.close()
+
+    def overall(self):
+        total = LatencyHistogram()
+        for histogram in self.histograms.values():
+            total.merge(histogram)
+        return total
+
+    def unauthorized(self):
+        return sum(statuses.get(401, 0) for statuses in self.statuses.values())
+
+    def to_dict(self):
+        total = self.overall()
+        return {
+            'started_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'revision': _git_revision(),
+            'config': {'url': self.base_url, 'rate': self.rate, 'duration': self.duration,
+                       'warmup': self.warmup, 'connections': self.connections,
+                       'mix': dict(self.mix)},
+            'throughput': round(total.count / self.elapsed, 2) if self.elapsed else 0,
+            'errors': sum(self.errors.values()),
+            'unauthorized': self.unauthorized(),
+            'overall': total.to_dict(),
+            'routes': {name: dict(self.histograms[name].to_dict(),
+                                  statuses={str(k): v for k, v in self.statuses[name].items()},
+                                  errors=self.errors[name])
+                       for name, _ in self.mix},
+        }
+
+    def report(self):
+        total = self.overall()
+        lines = [f"Requests: {total.count} in {self.elapsed:.1f}s "
+                 f"({total.count / self.elapsed:.1f} req/s, target {self.rate:g}), "
+                 f"errors: {sum(self.errors.values())}, 401s (not timed): {self.unauthorized()}",
+                 "",
+                 f"  {'request':<22} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, _ in self.mix:
+            h = self.histograms[name]
+            lines.append(f"  {name:<22} {h.count:>7} {h.percentile(50) / 1000:>9.2f} "
+                         f"{h.percentile(95) / 1000:>9.2f} {h.percentile(99) / 1000:>9.2f} "
+                         f"{h.max / 1000:>9.2f}")
+        lines.extend(["", "Overall latency distribution:", total.distribution()])
+        return "\n".join(lines)
+
+
+def _git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=Path(__file__).resolve().parent.parent)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, previous):
+    """Text comparison of two saved results, per request"""
+    lines = [f"Compared with {previous.get('started_at')} ({previous.get('revision') or 'unknown'}):"]
+    for name, route in current['routes'].items():
+        old = previous.get('routes', {}).get(name)
+        if not old or not old['count'] or not route['count']:
+            continue
+        parts = []
+        for p in ('50.0', '95.0', '99.0'):
+            new_ms, old_ms = route['percentiles_ms'][p], old['percentiles_ms'][p]
+            change = (new_ms - old_ms) / old_ms * 100 if old_ms else 0
+            parts.append(f"p{p[:-2]} {old_ms:.1f}->{new_ms:.1f}ms ({change:+.0f}%)")
+        lines.append(f"  {name:<22} " + "  ".join(parts))
+    return "\n".join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='cross-platform-launcher.py bench',
+                                     description="Benchmark the API at a fixed request rate")
+    parser.add_argument('--url', default=DEFAULT_URL, help="API base URL (default %(default)s)")
+    parser.add_argument('--email', default=os.environ.get('FACTORY_BENCH_EMAIL'))
+    parser.add_argument('--password', default=os.environ.get('FACTORY_BENCH_PASSWORD'))
+    parser.add_argument('--rate', type=float, default=20, help="requests per second")
+    parser.add_argument('--duration', type=float, default=30, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=5, help="unmeasured seconds first")
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"weighted requests; available: {', '.join(REQUESTS)}")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="result file (default: user cache)")
+    parser.add_argument('--compare', help="earlier result file to compare with")
+    args = parser.parse_args(argv)
+
+    if not args.email or not args.password:
+        parser.error("--email and --password (or FACTORY_BENCH_EMAIL/PASSWORD) are required")
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    bench = Benchmark(args.url, args.email, args.password, mix, args.rate, args.duration,
+                      args.warmup, args.connections, args.seed)
+    print(f"Benchmarking {args.url} at {args.rate:g} req/s for {args.duration:g}s "
+          f"(+{args.warmup:g}s warmup)")
+    try:
+        asyncio.run(bench.run())
+    except (OSError, RuntimeError) as e:
+        print(f"Benchmark failed: {e}")
+        return 1
+
+    result = bench.to_dict()
+    print(bench.report())
+    output = Path(args.output) if args.output else (
+        user_cache_dir('bench') / f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print(compare(result, json.load(f)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,136 @@
+"""
+Production builds for the client and server bundles
+Runs `npm run build` in a package only when its sources changed since the
+last successful build, restoring archived builds where possible
+
+Roll back to the previous bundle with:
+    python -m factory_launcher.build --rollback [client|server]
+"""
+
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from factory_launcher.build_cache import BuildCache
+from factory_launcher.output import iter_output_lines
+from factory_launcher.shutdown import popen_group_kwargs, stop_process_tree
+
+BUILD_TIMEOUT = 600
+
+
+class BuildTarget:
+    """One package that produces a production bundle"""
+
+    def __init__(self, name, cwd, sources, output):
+        self.name = name
+        self.cwd = cwd
+        # Files and directories whose changes require a rebuild
+        self.sources = list(sources)
+        # A file every complete build produces
+        self.output = output
+        self.dist = output.parent
+
+
+def build_targets(app_dir):
+    """Return the client and server build targets"""
+    client = app_dir / 'client'
+    server = app_dir / 'server'
+    # package.json holds the build script itself (esbuild's flags for the
+    # server), and `tsc -b` reads every tsconfig the client has
+    return [
+        BuildTarget('client', client,
+                    [client / 'src', client / 'index.html', client / 'public',
+                     client / 'vite.config.ts', client / 'package.json',
+                     client / 'package-lock.json', client / '.env',
+                     *sorted(client.glob('tsconfig*.json'))],
+                    client / 'dist' / 'index.html'),
+        BuildTarget('server', server,
+                    [server / 'src', server / 'package.json', server / 'package-lock.json'],
+                    server / 'dist' / 'index.js'),
+    ]
+
+
+def run_build(target, npm_cmd, log, timeout=BUILD_TIMEOUT):
+    """Run `npm run build` for one target, streaming its output; return success"""
+    npm = list(npm_cmd) if isinstance(npm_cmd, (list, tuple)) else [npm_cmd]
+    log(f"[{target.name}] building...")
+    try:
+        process = subprocess.Popen(npm + ['run', 'build'], cwd=target.cwd,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   bufsize=0, **popen_group_kwargs())
+    except OSError as e:
+        log(f"[{target.name}] could not start build: {e}")
+        return False
+
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        stop_process_tree(process)
+
+    timer = threading.Timer(timeout, on_timeout)
+    timer.daemon = True
+    timer.start()
+    try:
+        for line in iter_output_lines(process.stdout):
+            log(f"[{target.name}] {line}")
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+        process.stdout.close()
+
+    if timed_out.is_set():
+        log(f"[{target.name}] build timed out after {timeout}s")
+        return False
+    if returncode != 0:
+        log(f"[{target.name}] build failed (exit code {returncode})")
+        return False
+    return True
+
+
+def build_target(target, npm_cmd, cache, log):
+    """Build, restore or skip one bundle; return True when it is current"""
+    fingerprint = cache.fingerprint(target)
+    action = cache.plan(target, fingerprint)
+    if action == 'skip':
+        log(f"[{target.name}] bundle is up to date")
+        return True
+    if action == 'restore' and cache.restore(target, fingerprint):
+        return True
+    if not run_build(target, npm_cmd, log):
+        return False
+    try:
+        cache.record(target, fingerprint)
+    except OSError as e:
+        log(f"[{target.name}] could not archive the build: {e}")
+    return True
+
+
+def build_all(app_dir, npm_cmd, log=None, cache=None):
+    """Build, restore or skip each bundle; return True when all bundles are current"""
+    log = log or print
+    cache = cache or BuildCache(app_dir, log=log)
+    for target in build_targets(app_dir):
+        if not build_target(target, npm_cmd, cache, log):
+            return False
+    return True
+
+
+def main(argv):
+    app_dir = Path(__file__).resolve().parent.parent
+    cache = BuildCache(app_dir)
+    names = argv[1:] or ['client', 'server']
+    targets = [t for t in build_targets(app_dir) if t.name in names]
+    if not argv or argv[0] not in ('--list', '--rollback') or not targets:
+        print("Usage: python -m factory_launcher.build --list|--rollback [client|server]")
+        return 1
+    if argv[0] == '--list':
+        for target in targets:
+            print("\n".join(cache.describe(target)))
+        return 0
+    return 0 if all([cache.rollback(target) for target in targets]) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,231 @@
+"""
+Incremental build cache
+Fingerprints each bundle's sources with a parallel hasher, skips builds
+whose fingerprint matches the last successful one and keeps recent build
+outputs so an earlier bundle can be restored without rebuilding
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from factory_launcher.install_cache import hash_file
+from factory_launcher.paths import user_cache_dir
+
+DEFAULT_KEEP = 3
+HASH_WORKERS = 8
+STATE_NAME = 'state.json'
+INDEX_NAME = 'index.json'
+
+# Directories never part of a bundle's sources
+SKIP_DIRS = {'node_modules', 'dist', '.git', '__pycache__'}
+
+
+def default_keep():
+    """Number of build outputs kept per bundle; override with FACTORY_BUILD_KEEP"""
+    try:
+        value = int(os.environ.get('FACTORY_BUILD_KEEP', DEFAULT_KEEP))
+    except ValueError:
+        value = DEFAULT_KEEP
+    return max(1, value)
+
+
+def source_files(paths):
+    """Yield every file under the given files and directories"""
+    for path in paths:
+        if path.is_file():
+            yield str(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for name in files:
+                yield os.path.join(root, name)
+
+
+class FileHasher:
+    """Content hashes for source files, reused while size and mtime are unchanged"""
+
+    def __init__(self, index_path, workers=HASH_WORKERS):
+        self.index_path = index_path
+        self.workers = workers
+        self.hashed = 0
+        self.reused = 0
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def fingerprint(self, paths, base):
+        """Return one digest over the relative path and content of every file"""
+        entries = {}
+        stale = []
+        for path in source_files(paths):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            relative = os.path.relpath(path, base).replace(os.sep, '/')
+            cached = self.index.get(relative)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                entries[relative] = cached
+                self.reused += 1
+            else:
+                stale.append((relative, path, st))
+
+        # Only files whose size or mtime moved are read; hashlib releases
+        # the GIL, so a thread pool overlaps disk reads and hashing
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                digests = pool.map(self._hash, [path for _, path, _ in stale])
+                for (relative, _, st), digest in zip(stale, digests):
+                    if digest:
+                        entries[relative] = [st.st_size, st.st_mtime_ns, digest]
+                        self.hashed += 1
+
+        self.index.update(entries)
+        combined = hashlib.sha256()
+        for relative in sorted(entries):
+            combined.update(f"{relative}\0{entries[relative][2]}\n".encode('utf-8'))
+        return combined.hexdigest()
+
+    @staticmethod
+    def _hash(path):
+        try:
+            return hash_file(path)
+        except OSError:
+            return None
+
+    def save(self):
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+class BuildCache:
+    """Per-bundle build state and the last K build outputs"""
+
+    def __init__(self, app_dir, store_dir=None, keep=None, log=None):
+        app_key = hashlib.sha256(str(app_dir.resolve()).encode('utf-8')).hexdigest()[:12]
+        self.app_dir = app_dir
+        self.store_dir = store_dir or user_cache_dir('builds', app_key)
+        self.keep = keep or default_keep()
+        self.log = log or print
+
+    def _target_dir(self, name):
+        path = self.store_dir / name
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def load_state(self, name):
+        try:
+            with open(self._target_dir(name) / STATE_NAME, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'current': None, 'pinned': None, 'artifacts': []}
+
+    def save_state(self, name, state):
+        path = self._target_dir(name) / STATE_NAME
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def fingerprint(self, target):
+        """Fingerprint a target's sources, hashing only files that changed"""
+        start = time.monotonic()
+        hasher = FileHasher(self._target_dir(target.name) / INDEX_NAME)
+        digest = hasher.fingerprint(target.sources, self.app_dir)
+        if hasher.hashed:
+            try:
+                hasher.save()
+            except OSError as e:
+                self.log(f"[{target.name}] could not save the hash index: {e}")
+        self.log(f"[{target.name}] fingerprinted {hasher.hashed + hasher.reused} files "
+                 f"({hasher.hashed} hashed) in {time.monotonic() - start:.2f}s")
+        return digest
+
+    def plan(self, target, fingerprint):
+        """Return 'skip', 'restore' or 'build' for a target"""
+        state = self.load_state(target.name)
+        if not target.output.exists():
+            state['current'] = None
+        if fingerprint in (state['current'], state.get('pinned')) and target.output.exists():
+            return 'skip'
+        if any(a['fingerprint'] == fingerprint for a in state['artifacts']):
+            return 'restore'
+        return 'build'
+
+    def record(self, target, fingerprint):
+        """Archive a successful build and mark it current"""
+        state = self.load_state(target.name)
+        entry = self._target_dir(target.name) / fingerprint[:16]
+        tmp_entry = entry.with_name(entry.name + '.tmp')
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        shutil.copytree(target.dist, tmp_entry)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+
+        artifacts = [a for a in state['artifacts'] if a['fingerprint'] != fingerprint]
+        artifacts.insert(0, {'fingerprint': fingerprint, 'path': entry.name,
+                             'built_at': time.strftime("%Y-%m-%dT%H:%M:%S")})
+        for old in artifacts[self.keep:]:
+            shutil.rmtree(self._target_dir(target.name) / old['path'], ignore_errors=True)
+        state.update(current=fingerprint, pinned=None, artifacts=artifacts[:self.keep])
+        self.save_state(target.name, state)
+
+    def restore(self, target, fingerprint, pin=False):
+        """Replace the target's dist folder with an archived build"""
+        state = self.load_state(target.name)
+        artifact = next((a for a in state['artifacts'] if a['fingerprint'] == fingerprint), None)
+        if not artifact:
+            return False
+        source = self._target_dir(target.name) / artifact['path']
+        if not source.is_dir():
+            return False
+
+        # Copy next to dist, then swap, so a failed copy never leaves it half written
+        tmp_dist = target.dist.with_name(target.dist.name + '.restore')
+        old_dist = target.dist.with_name(target.dist.name + '.old')
+        shutil.rmtree(tmp_dist, ignore_errors=True)
+        shutil.rmtree(old_dist, ignore_errors=True)
+        shutil.copytree(source, tmp_dist)
+        if target.dist.exists():
+            os.replace(target.dist, old_dist)
+        os.replace(tmp_dist, target.dist)
+        shutil.rmtree(old_dist, ignore_errors=True)
+
+        state['current'] = fingerprint
+        # A rollback sticks until the sources change again
+        state['pinned'] = self.fingerprint(target) if pin else None
+        self.save_state(target.name, state)
+        self.log(f"[{target.name}] restored build from {artifact['built_at']}")
+        return True
+
+    def rollback(self, target):
+        """Restore the build made before the current one"""
+        state = self.load_state(target.name)
+        fingerprints = [a['fingerprint'] for a in state['artifacts']]
+        if state['current'] in fingerprints:
+            older = fingerprints[fingerprints.index(state['current']) + 1:]
+        else:
+            older = fingerprints
+        if not older:
+            self.log(f"[{target.name}] no earlier build to roll back to")
+            return False
+        return self.restore(target, older[0], pin=True)
+
+    def describe(self, target):
+        """Return text lines listing the archived builds for a target"""
+        state = self.load_state(target.name)
+        lines = [f"{target.name}:"]
+        for artifact in state['artifacts']:
+            flag = '  (current)' if artifact['fingerprint'] == state['current'] else ''
+            lines.append(f"  {artifact['built_at']}  {artifact['fingerprint'][:12]}{flag}")
+        if not state['artifacts']:
+            lines.append("  no archived builds")
+        return lines
@@ -0,0 +1,65 @@
+"""
+Slowest-endpoints table for the tkinter launchers
+Shows the routes with the highest p95 latency over the last few minutes
+from a RouteStatsStore; refreshed from the Tk main loop only
+"""
+
+try:
+    import tkinter as tk
+    from tkinter import ttk
+except ImportError:
+    tk = None
+
+REFRESH_MS = 2000
+ROWS = 6
+COLUMNS = (
+    ('route', "Endpoint", 300),
+    ('count', "Requests", 70),
+    ('errors', "Err%", 55),
+    ('p50', "p50 ms", 65),
+    ('p95', "p95 ms", 65),
+    ('p99', "p99 ms", 65),
+)
+
+
+class EndpointPanel:
+    """The ROWS slowest routes by p95 in the rolling window"""
+
+    def __init__(self, parent, get_store, refresh_ms=REFRESH_MS, rows=ROWS):
+        self.frame = ttk.Frame(parent)
+        self.get_store = get_store
+        self.refresh_ms = refresh_ms
+        self.rows = rows
+        self._running = False
+        ttk.Label(self.frame, text="Slowest endpoints (last 10 minutes):").pack(anchor=tk.W)
+        self.tree = ttk.Treeview(self.frame, columns=[c[0] for c in COLUMNS],
+                                 show='headings', height=rows)
+        for name, heading, width in COLUMNS:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, anchor=tk.W if name == 'route' else tk.E,
+                             stretch=name == 'route')
+        self.tree.pack(fill=tk.X)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.frame.after(self.refresh_ms, self._refresh)
+
+    def stop(self):
+        self._running = False
+
+    def _refresh(self):
+        if not self._running:
+            return
+        store = self.get_store()
+        if store:
+            self._show(store.top(self.rows))
+        self.frame.after(self.refresh_ms, self._refresh)
+
+    def _show(self, rows):
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert('', tk.END, values=(
+                f"{row['method']} {row['route']}", row['count'],
+                f"{row['error_rate'] * 100:.1f}", f"{row['p50_ms']:.1f}",
+                f"{row['p95_ms']:.1f}", f"{row['p99_ms']:.1f}"))
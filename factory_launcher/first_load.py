@@ -0,0 +1,139 @@
+"""
+First page load measurement
+Fetches the client page and every script, stylesheet and static import it
+pulls in, the way a browser with an empty cache would, and keeps the
+results per launch mode so prod can be compared with dev
+"""
+
+import json
+import os
+import re
+import statistics
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from factory_launcher.paths import user_cache_dir
+from factory_launcher.readiness import CLIENT_PORT
+
+# Browsers open about six connections per host
+CONNECTIONS = 6
+MAX_REQUESTS = 3000
+REQUEST_TIMEOUT = 30
+KEEP_RESULTS = 20
+
+HTML_REF_RE = re.compile(r'<(?:script|link)\b[^>]*?\b(?:src|href)=["\']([^"\']+)["\']', re.I)
+# Static imports and re-exports; dynamic import() is left for later navigation
+JS_IMPORT_RE = re.compile(
+    r'(?:^|[;\s}])(?:import|export)\s*(?:[\w*{}\s,$]*?\s*from\s*)?["\']([^"\']+)["\']'
+)
+CSS_IMPORT_RE = re.compile(r'@import\s+(?:url\()?["\']([^"\']+)["\']')
+
+
+def first_load_enabled():
+    """Crawl the client after launch only when FACTORY_FIRST_LOAD asks for it"""
+    return os.environ.get('FACTORY_FIRST_LOAD', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def _references(url, content_type, body):
+    text = body.decode('utf-8', errors='replace')
+    if 'html' in content_type:
+        refs = HTML_REF_RE.findall(text)
+    elif 'javascript' in content_type:
+        refs = [ref for ref in JS_IMPORT_RE.findall(text) if ref.startswith(('.', '/'))]
+    elif 'css' in content_type:
+        refs = CSS_IMPORT_RE.findall(text)
+    else:
+        return []
+    origin = urllib.parse.urlsplit(url)
+    resolved = []
+    for ref in refs:
+        target = urllib.parse.urljoin(url, ref)
+        parts = urllib.parse.urlsplit(target)
+        # Only count what the client server itself delivers
+        if parts.netloc == origin.netloc and not parts.path.endswith(('.ico', '.png', '.svg')):
+            resolved.append(urllib.parse.urlunsplit(parts._replace(fragment='')))
+    return resolved
+
+
+def _fetch(url):
+    request = urllib.request.Request(url, headers={'Accept': '*/*', 'Cache-Control': 'no-cache'})
+    with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+        body = response.read()
+        return response.headers.get('Content-Type', ''), body
+
+
+def measure_first_load(url=None, connections=CONNECTIONS):
+    """Load the page and its static dependency graph; return a result dict"""
+    url = url or f"http://localhost:{CLIENT_PORT}/"
+    start = time.perf_counter()
+    seen = {url}
+    pending = [url]
+    total_bytes = 0
+    errors = 0
+
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        while pending and len(seen) <= MAX_REQUESTS:
+            wave = pending
+            pending = []
+            futures = [(target, pool.submit(_fetch, target)) for target in wave]
+            for target, future in futures:
+                try:
+                    content_type, body = future.result()
+                except (OSError, ValueError):
+                    errors += 1
+                    continue
+                total_bytes += len(body)
+                for ref in _references(target, content_type, body):
+                    if ref not in seen:
+                        seen.add(ref)
+                        pending.append(ref)
+
+    return {
+        'url': url,
+        'seconds': round(time.perf_counter() - start, 3),
+        'requests': len(seen),
+        'bytes': total_bytes,
+        'errors': errors,
+        'at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+class FirstLoadHistory:
+    """Recent first-load measurements per launch mode"""
+
+    def __init__(self, path=None):
+        self.path = path or user_cache_dir() / 'first-load.json'
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, mode, result):
+        data = self.load()
+        results = data.setdefault(mode, [])
+        results.append(result)
+        data[mode] = results[-KEEP_RESULTS:]
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        tmp_path.replace(self.path)
+
+    def summary(self, mode, result):
+        """One-line report of a measurement compared with the other mode"""
+        line = (f"First load ({mode}): {result['seconds']:.2f}s, "
+                f"{result['requests']} requests, {result['bytes'] / 1024:.0f} KB")
+        other = 'dev' if mode == 'prod' else 'prod'
+        samples = self.load().get(other, [])
+        if not samples:
+            return f"{line}; no {other} measurement to compare with yet"
+        median = statistics.median(sample['seconds'] for sample in samples)
+        line += f"; {other} median {median:.2f}s over {samples[-1]['requests']} requests"
+        dev, prod = (result['seconds'], median) if mode == 'dev' else (median, result['seconds'])
+        if dev and prod:
+            line += f" (prod loads {dev / prod:.1f}x as fast as dev)"
+        return line
@@ -0,0 +1,278 @@
+"""
+CPU profiles and heap snapshots of the running server
+The server starts with Node's inspector on a random loopback port; the
+launcher reads the port from its output and records captures over the
+DevTools protocol into timestamped files under the user cache
+"""
+
+import asyncio
+import base64
+import json
+import os
+import re
+import struct
+import time
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+from factory_launcher.paths import user_cache_dir
+
+LISTENING_PATTERN = re.compile(r'Debugger listening on (ws://127\.0\.0\.1:(\d+)/[\w-]+)')
+DEFAULT_PROFILE_SECONDS = 10
+MAX_PROFILE_SECONDS = 600
+# A snapshot pauses the server; a big heap on a slow disk takes minutes
+SNAPSHOT_TIMEOUT = 600.0
+CONNECT_TIMEOUT = 2.0
+
+
+def inspector_enabled():
+    """The inspector is on unless FACTORY_INSPECT is off"""
+    return os.environ.get('FACTORY_INSPECT', '').lower() not in ('0', 'false', 'no', 'off')
+
+
+def profile_seconds(value=None):
+    """Length of a CPU profile: `value`, FACTORY_PROFILE_SECONDS or the default"""
+    try:
+        seconds = float(value or os.environ.get('FACTORY_PROFILE_SECONDS', DEFAULT_PROFILE_SECONDS))
+    except ValueError:
+        seconds = DEFAULT_PROFILE_SECONDS
+    return min(max(seconds, 1.0), MAX_PROFILE_SECONDS)
+
+
+def inspect_env(env=None):
+    """`env` with NODE_OPTIONS asking every node process for a loopback inspector
+
+    Port 0 gives each process (npm, nodemon, the server, cluster workers)
+    its own port, so none of them fails to bind; the launcher picks the
+    server's from its "Debugger listening" line.
+    """
+    options = (env or {}).get('NODE_OPTIONS', os.environ.get('NODE_OPTIONS', ''))
+    return dict(env or {}, NODE_OPTIONS=f"{options} --inspect=127.0.0.1:0".strip())
+
+
+class DevToolsSession:
+    """A minimal WebSocket client speaking the DevTools protocol"""
+
+    def __init__(self, url):
+        self.url = urlsplit(url)
+        self.reader = None
+        self.writer = None
+        self._next_id = 0
+
+    async def connect(self):
+        host, port = self.url.hostname, self.url.port
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        self.writer.write((f"GET {self.url.path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                           f"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+                          .encode('ascii'))
+        head = await asyncio.wait_for(self.reader.readuntil(b'\r\n\r\n'), CONNECT_TIMEOUT)
+        if b' 101 ' not in head.split(b'\r\n', 1)[0]:
+            raise ConnectionError(f"inspector refused the connection: {head[:80]!r}")
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    async def call(self, method, params=None, on_event=None):
+        """Send one command; return its result, passing events to `on_event`"""
+        self._next_id += 1
+        request_id = self._next_id
+        self._send(json.dumps({'id': request_id, 'method': method, 'params': params or {}}))
+        while True:
+            message = json.loads(await self._receive())
+            if message.get('id') == request_id:
+                if 'error' in message:
+                    raise RuntimeError(f"{method}: {message['error'].get('message')}")
+                return message.get('result', {})
+            if 'method' in message and on_event:
+                on_event(message['method'], message.get('params', {}))
+
+    def _send(self, text, opcode=0x1):
+        payload = text.encode('utf-8') if isinstance(text, str) else text
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        # Clients must mask; an all-zero mask leaves the payload as it is
+        self.writer.write(header + b'\0\0\0\0' + payload)
+
+    async def _receive(self):
+        """Read one complete text message, answering pings on the way"""
+        parts = []
+        while True:
+            first, second = await self.reader.readexactly(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length, = struct.unpack('!H', await self.reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack('!Q', await self.reader.readexactly(8))
+            mask = await self.reader.readexactly(4) if second & 0x80 else None
+            payload = await self.reader.readexactly(length)
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            if opcode == 0x8:
+                raise ConnectionError("inspector closed the connection")
+            if opcode == 0x9:
+                self._send(payload, opcode=0xA)
+                continue
+            if opcode in (0x0, 0x1):
+                parts.append(payload)
+                if first & 0x80:
+                    return b''.join(parts).decode('utf-8')
+
+
+async def list_targets(port):
+    """The inspector's /json/list: one entry per debuggable context"""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection('127.0.0.1', port), CONNECT_TIMEOUT)
+    try:
+        writer.write(f"GET /json/list HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+                     f"Connection: close\r\n\r\n".encode('ascii'))
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), CONNECT_TIMEOUT)
+        length = re.search(rb'content-length:\s*(\d+)', head, re.IGNORECASE)
+        if length:
+            body = await asyncio.wait_for(reader.readexactly(int(length.group(1))),
+                                          CONNECT_TIMEOUT)
+        else:
+            body = await asyncio.wait_for(reader.read(), CONNECT_TIMEOUT)
+    finally:
+        writer.close()
+    return json.loads(body)
+
+
+class Inspector:
+    """Track the server processes' inspector ports and take captures from them
+
+    `feed()` sees the server's output lines; only targets running a script
+    under one of `script_dirs` (and not in node_modules) are captured, which
+    skips npm, cross-env and nodemon.
+    """
+
+    def __init__(self, script_dirs, log=None):
+        self.script_dirs = [str(path.resolve()) for path in script_dirs]
+        self.log = log or print
+        self.ports = {}
+        self._lock = asyncio.Lock()
+
+    def feed(self, service, line):
+        match = LISTENING_PATTERN.search(line)
+        if match:
+            self.ports[int(match.group(2))] = service.name
+
+    @property
+    def busy(self):
+        return self._lock.locked()
+
+    async def targets(self):
+        """Return (service name, target) for every live server process"""
+        found = []
+        for port, name in list(self.ports.items()):
+            try:
+                targets = await list_targets(port)
+            except (OSError, ValueError, asyncio.TimeoutError):
+                # The process has exited or restarted onto a new port
+                self.ports.pop(port, None)
+                continue
+            for target in targets:
+                if self._is_server(target.get('url', '')):
+                    found.append((name, target))
+        return found
+
+    def _is_server(self, url):
+        if not url.startswith('file://'):
+            return False
+        path = os.path.normpath(url2pathname(urlsplit(url).path))
+        return ('node_modules' not in path.split(os.sep)
+                and any(path.startswith(directory) for directory in self.script_dirs))
+
+    async def cpu_profile(self, seconds=None):
+        """Profile every server process for `seconds`; return the saved files"""
+        seconds = profile_seconds(seconds)
+        return await self._capture('CPU profile', lambda name, target: self._profile_one(
+            name, target, seconds), concurrent=True)
+
+    async def heap_snapshot(self):
+        """Snapshot every server process's heap in turn; return the saved files"""
+        return await self._capture('heap snapshot', self._snapshot_one)
+
+    async def _capture(self, label, take, concurrent=False):
+        if self._lock.locked():
+            self.log(f"A capture is already running; skipping the {label}")
+            return []
+        async with self._lock:
+            targets = await self.targets()
+            if not targets:
+                self.log(f"No server process with an inspector to take a {label} from")
+                return []
+            if concurrent:
+                results = await asyncio.gather(*[take(name, target) for name, target in targets],
+                                               return_exceptions=True)
+            else:
+                results = []
+                for name, target in targets:
+                    try:
+                        results.append(await take(name, target))
+                    except Exception as e:
+                        results.append(e)
+        paths = []
+        for result in results:
+            if isinstance(result, Exception):
+                self.log(f"Could not take the {label}: {result}")
+            else:
+                self.log(f"Saved {label} to {result}")
+                paths.append(str(result))
+        return paths
+
+    async def _open(self, target):
+        session = DevToolsSession(target['webSocketDebuggerUrl'])
+        await session.connect()
+        result = await session.call('Runtime.evaluate',
+                                    {'expression': 'process.pid', 'returnByValue': True})
+        return session, result.get('result', {}).get('value', 'node')
+
+    async def _profile_one(self, name, target, seconds):
+        session, pid = await self._open(target)
+        try:
+            await session.call('Profiler.enable')
+            await session.call('Profiler.start')
+            await asyncio.sleep(seconds)
+            profile = (await session.call('Profiler.stop'))['profile']
+        finally:
+            session.close()
+        path = capture_path(name, pid, 'cpuprofile')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(profile, f)
+        return path
+
+    async def _snapshot_one(self, name, target):
+        session, pid = await self._open(target)
+        path = capture_path(name, pid, 'heapsnapshot')
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                def on_event(method, params):
+                    if method == 'HeapProfiler.addHeapSnapshotChunk':
+                        f.write(params['chunk'])
+
+                await asyncio.wait_for(session.call('HeapProfiler.takeHeapSnapshot',
+                                                    {'reportProgress': False}, on_event),
+                                       SNAPSHOT_TIMEOUT)
+            os.replace(tmp_path, path)
+        finally:
+            session.close()
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return path
+
+
+def capture_path(name, pid, suffix):
+    """A timestamped file under the profiles cache, e.g. server-1234-20240501-154210.cpuprofile"""
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return user_cache_dir('profiles') / f"{name.replace(':', '-')}-{pid}-{stamp}.{suffix}"
@@ -0,0 +1,198 @@
+"""
+Parallel dependency installation
+Runs `npm install` for the root, client and server directories at the same time
+"""
+
+import os
+import signal
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from factory_launcher.install_cache import InstallCache
+from factory_launcher.shutdown import popen_group_kwargs
+
+# Cap on simultaneous `npm install` processes; override with FACTORY_INSTALL_JOBS
+DEFAULT_MAX_WORKERS = 3
+INSTALL_TIMEOUT = 300
+CANCELLED = "stopped because another install failed"
+
+
+def default_max_workers():
+    """Read the install concurrency setting from the environment"""
+    try:
+        value = int(os.environ.get('FACTORY_INSTALL_JOBS', DEFAULT_MAX_WORKERS))
+    except ValueError:
+        value = DEFAULT_MAX_WORKERS
+    return max(1, value)
+
+
+def install_targets(app_dir):
+    """Return (name, directory) pairs for every package in the project"""
+    targets = []
+    for name, directory in (('root', app_dir),
+                            ('client', app_dir / 'client'),
+                            ('server', app_dir / 'server')):
+        if (directory / 'package.json').exists():
+            targets.append((name, directory))
+    return targets
+
+
+class ParallelInstaller:
+    """Run several `npm install` processes in a bounded pool, failing fast
+
+    `run()` installs every target; `install()` lets callers that schedule
+    packages themselves (the launch graph) share one installer, so the
+    concurrency cap and fail-fast still apply across them.
+    """
+
+    def __init__(self, npm_cmd, targets, max_workers=None,
+                 timeout=INSTALL_TIMEOUT, log=None, on_success=None, cache=None):
+        self.npm_cmd = npm_cmd if isinstance(npm_cmd, (list, tuple)) else [npm_cmd]
+        self.targets = list(targets)
+        self.max_workers = max_workers or default_max_workers()
+        self.timeout = timeout
+        self.log = log or print
+        self.on_success = on_success
+        # The InstallCache behind on_success, for install_package
+        self.cache = cache
+        self.failed = threading.Event()
+        self.errors = {}
+        self._processes = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+
+    def run(self):
+        """Install every target; return True only if all installs succeed"""
+        if not self.targets:
+            return True
+
+        workers = min(self.max_workers, len(self.targets))
+        names = ', '.join(name for name, _ in self.targets)
+        self.log(f"Installing {names} dependencies ({workers} at a time)...")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._install, name, directory)
+                       for name, directory in self.targets]
+            for future in futures:
+                future.result()
+
+        for name, error in self.errors.items():
+            self.log(f"Error installing {name} dependencies: {error}")
+        return not self.failed.is_set()
+
+    def install(self, name, directory):
+        """Install one package once a slot is free; return True on success
+
+        Returns False at once after any install of this installer failed.
+        """
+        with self._slots:
+            if self.failed.is_set():
+                self.errors.setdefault(name, CANCELLED)
+            else:
+                self.log(f"Installing {name} dependencies...")
+                self._install(name, directory)
+        if name in self.errors:
+            self.log(f"Error installing {name} dependencies: {self.errors[name]}")
+            return False
+        return True
+
+    def cancel(self):
+        """Stop every running install"""
+        self.failed.set()
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            try:
+                if os.name == 'nt':
+                    # npm.cmd runs node as a grandchild; kill the whole tree
+                    subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                                   capture_output=True)
+                else:
+                    # npm's own children (node-gyp, postinstall scripts) too
+                    os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def _install(self, name, directory):
+        """Run one install, streaming its output with a [name] prefix"""
+        if self.failed.is_set():
+            return
+
+        try:
+            process = subprocess.Popen(
+                self.npm_cmd + ['install'],
+                cwd=directory,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                **popen_group_kwargs()
+            )
+        except OSError as e:
+            self._fail(name, e)
+            return
+
+        with self._lock:
+            self._processes[name] = process
+
+        timer = threading.Timer(self.timeout, self._on_timeout, args=(name,))
+        timer.daemon = True
+        timer.start()
+        try:
+            for line in iter(process.stdout.readline, ''):
+                line = line.rstrip()
+                if line:
+                    self.log(f"[{name}] {line}")
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+            process.stdout.close()
+            with self._lock:
+                self._processes.pop(name, None)
+
+        if returncode != 0 and name not in self.errors:
+            if self.failed.is_set():
+                self.errors[name] = CANCELLED
+            else:
+                self._fail(name, f"npm install exited with code {returncode}")
+        elif returncode == 0:
+            self.log(f"[{name}] dependencies installed")
+            if self.on_success:
+                self.on_success(name, directory)
+
+    def _on_timeout(self, name):
+        """Kill the pool when an install runs past its deadline"""
+        self._fail(name, f"timed out after {self.timeout}s")
+
+    def _fail(self, name, error):
+        """Record the first failure and stop the other installs"""
+        self.errors.setdefault(name, error)
+        self.cancel()
+
+
+def install_all(app_dir, npm_cmd, max_workers=None, log=None, cache=None):
+    """Install the project's dependencies, skipping or restoring cached ones"""
+    cache = cache or InstallCache(log=log)
+    targets = cache.plan(install_targets(app_dir))
+    installer = ParallelInstaller(npm_cmd, targets, max_workers=max_workers,
+                                  log=log, on_success=cache.record)
+    return installer.run()
+
+
+def shared_installer(npm_cmd, log=None, cache=None, max_workers=None):
+    """One installer for packages installed by separate callers, see install_package"""
+    cache = cache or InstallCache(log=log)
+    return ParallelInstaller(npm_cmd, [], max_workers=max_workers, log=log,
+                             on_success=cache.record, cache=cache)
+
+
+def install_package(app_dir, name, installer):
+    """Install one package ('root', 'client' or 'server') through a shared installer
+
+    Installs of the same installer are capped at FACTORY_INSTALL_JOBS and
+    one failure stops the others.
+    """
+    targets = installer.cache.plan([t for t in install_targets(app_dir) if t[0] == name])
+    return all([installer.install(target, directory) for target, directory in targets])
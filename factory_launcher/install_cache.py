@@ -0,0 +1,276 @@
+"""
+Lockfile-hash install cache
+Skips `npm install` when package-lock.json is unchanged and restores
+node_modules from a local store when a previous install matches
+"""
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tarfile
+import time
+
+from factory_launcher.paths import user_cache_dir
+from factory_launcher.toolchain import node_version
+
+# Written inside node_modules, so deleting node_modules also drops the state
+MANIFEST_NAME = '.factory-install.json'
+LOCK_FILES = ('package-lock.json', 'package.json')
+
+# Store modes: auto (hardlinks when on the same disk, else tar), tar, link, off
+STORE_MODES = ('auto', 'tar', 'link', 'off')
+DEFAULT_KEEP = 3
+# Caches that Vite's dependency optimizer, babel, eslint and terser rewrite
+# in place inside node_modules; hardlinked, they would write into the store
+MUTABLE_DIRS = ('.vite', '.vite-temp', '.cache')
+# Native addons that `npm rebuild` rewrites in place; copied, never linked
+COPY_SUFFIXES = ('.node',)
+
+
+def lock_file(directory):
+    """Return the file that pins a directory's dependencies"""
+    for name in LOCK_FILES:
+        path = directory / name
+        if path.exists():
+            return path
+    return None
+
+
+def hash_file(path):
+    """Return the SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, target):
+    """copy_function for the link store: hardlink, except files rewritten in place"""
+    if source.endswith(COPY_SUFFIXES):
+        return shutil.copy2(source, target)
+    return os.link(source, target)
+
+
+def _shared(info):
+    """tarfile filter leaving the manifest and mutable caches out of the store"""
+    parts = info.name.split('/')
+    if parts[-1] == MANIFEST_NAME or any(part in MUTABLE_DIRS for part in parts):
+        return None
+    return info
+
+
+def read_manifest(directory):
+    """Return the recorded install state for a directory, or None"""
+    try:
+        with open(directory / 'node_modules' / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(directory, state):
+    """Record the install state for a directory"""
+    path = directory / 'node_modules' / MANIFEST_NAME
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def runtime_tag(version):
+    """'v18.19.0' -> 'node18'"""
+    # Native addons only load under the Node major (ABI) they were built for
+    major = (version or '').lstrip('v').split('.', 1)[0]
+    return f"node{major}" if major.isdigit() else 'node'
+
+
+class InstallCache:
+    """Content-addressed cache of node_modules keyed on the lockfile hash"""
+
+    def __init__(self, store_dir=None, mode=None, keep=DEFAULT_KEEP, log=None):
+        self.store_dir = store_dir or user_cache_dir('node_modules')
+        self.mode = mode or os.environ.get('FACTORY_INSTALL_STORE', 'auto')
+        if self.mode not in STORE_MODES:
+            self.mode = 'auto'
+        self.keep = keep
+        self.log = log or print
+        self._runtime = None
+
+    @property
+    def runtime(self):
+        """Tag of the Node.js version installs run under, looked up once"""
+        if self._runtime is None:
+            self._runtime = runtime_tag(node_version())
+        return self._runtime
+
+    def fingerprint(self, directory, state=None):
+        """Return (lock_stat, key) for a directory's current lockfile
+
+        The stored hash is reused when the lockfile's size and mtime and the
+        Node.js major are unchanged, so the common "nothing changed" case
+        never reads the file. A different Node.js major gives a different key.
+        """
+        path = lock_file(directory)
+        if path is None:
+            return None, None
+        st = path.stat()
+        lock_stat = [st.st_size, st.st_mtime_ns]
+        runtime = self.runtime
+        if (state and state.get('lock_stat') == lock_stat and state.get('runtime') == runtime
+                and state.get('key')):
+            return lock_stat, state['key']
+        platform_tag = f"{sys.platform}-{platform.machine().lower()}-{runtime}"
+        key = hashlib.sha256(f"{hash_file(path)}:{platform_tag}".encode()).hexdigest()[:32]
+        return lock_stat, key
+
+    def is_current(self, directory):
+        """True if node_modules was installed from the current lockfile"""
+        state = read_manifest(directory)
+        if not state:
+            return False
+        _, key = self.fingerprint(directory, state)
+        return key is not None and key == state.get('key')
+
+    def plan(self, targets):
+        """Return the targets that still need `npm install`
+
+        Up-to-date directories are skipped and the rest are restored from the
+        store when a previous install with the same lockfile exists.
+        """
+        pending = []
+        for name, directory in targets:
+            if self.is_current(directory):
+                self.log(f"[{name}] dependencies up to date (lockfile unchanged)")
+                continue
+            _, key = self.fingerprint(directory)
+            if key and self.restore(name, directory, key):
+                continue
+            self._discard_linked(directory)
+            pending.append((name, directory))
+        return pending
+
+    def record(self, name, directory, source='npm'):
+        """Mark a directory as installed and save its node_modules to the store"""
+        lock_stat, key = self.fingerprint(directory)
+        if key is None or not (directory / 'node_modules').exists():
+            return
+        linked = False
+        if source == 'npm':
+            linked = self.save(name, directory, key)
+        else:
+            linked = source == 'link'
+        write_manifest(directory, {
+            'key': key,
+            'lock_stat': lock_stat,
+            'runtime': self.runtime,
+            'source': source,
+            'linked': linked,
+            'installed_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def _store_mode(self, directory):
+        """Resolve 'auto' to link or tar depending on the filesystem"""
+        if self.mode != 'auto':
+            return self.mode
+        try:
+            same_device = os.stat(self.store_dir).st_dev == os.stat(directory).st_dev
+        except OSError:
+            same_device = False
+        return 'link' if same_device else 'tar'
+
+    def _entry(self, name, key):
+        return self.store_dir / f"{name}-{key}"
+
+    def save(self, name, directory, key):
+        """Snapshot node_modules into the store; return True if hardlinked"""
+        mode = self._store_mode(directory)
+        if mode == 'off':
+            return False
+
+        entry = self._entry(name, key)
+        source = directory / 'node_modules'
+        start = time.monotonic()
+        try:
+            if mode == 'link':
+                if not entry.exists():
+                    tmp_entry = entry.with_name(entry.name + '.tmp')
+                    shutil.rmtree(tmp_entry, ignore_errors=True)
+                    shutil.copytree(source, tmp_entry / 'node_modules',
+                                    symlinks=True, copy_function=link_or_copy,
+                                    ignore=shutil.ignore_patterns(MANIFEST_NAME, *MUTABLE_DIRS))
+                    os.replace(tmp_entry, entry)
+            else:
+                archive = entry.with_suffix('.tar')
+                if not archive.exists():
+                    tmp_archive = entry.with_suffix('.tar.tmp')
+                    with tarfile.open(tmp_archive, 'w') as tar:
+                        tar.add(source, arcname='node_modules', filter=_shared)
+                    os.replace(tmp_archive, archive)
+        except OSError as e:
+            self.log(f"[{name}] could not save dependencies to cache: {e}")
+            return False
+
+        self.log(f"[{name}] dependencies cached ({mode}) in {time.monotonic() - start:.1f}s")
+        self.prune(name)
+        return mode == 'link'
+
+    def restore(self, name, directory, key):
+        """Restore node_modules from the store; return True on success"""
+        entry = self._entry(name, key)
+        archive = entry.with_suffix('.tar')
+        target = directory / 'node_modules'
+        start = time.monotonic()
+
+        if entry.exists():
+            source = 'link'
+        elif archive.exists():
+            source = 'tar'
+        else:
+            return False
+
+        self.log(f"[{name}] restoring dependencies from cache ({source})...")
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            if source == 'link':
+                shutil.copytree(entry / 'node_modules', target,
+                                symlinks=True, copy_function=link_or_copy,
+                                ignore=shutil.ignore_patterns(*MUTABLE_DIRS))
+            else:
+                with tarfile.open(archive, 'r') as tar:
+                    if hasattr(tarfile, 'data_filter'):
+                        tar.extractall(directory, filter='data')
+                    else:
+                        tar.extractall(directory)
+        except (OSError, tarfile.TarError) as e:
+            self.log(f"[{name}] cache restore failed, falling back to npm install: {e}")
+            shutil.rmtree(target, ignore_errors=True)
+            return False
+
+        os.utime(entry if source == 'link' else archive)
+        self.record(name, directory, source=source)
+        self.log(f"[{name}] dependencies restored in {time.monotonic() - start:.1f}s")
+        return True
+
+    def prune(self, name):
+        """Keep only the most recently used store entries for a target"""
+        entries = [p for p in self.store_dir.glob(f"{name}-*")
+                   if not p.name.endswith('.tmp')]
+        entries.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+        for old in entries[self.keep:]:
+            if old.is_dir():
+                shutil.rmtree(old, ignore_errors=True)
+            else:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def _discard_linked(self, directory):
+        """Remove a hardlinked node_modules so npm cannot write through into the store"""
+        state = read_manifest(directory)
+        if state and state.get('linked'):
+            shutil.rmtree(directory / 'node_modules', ignore_errors=True)
@@ -0,0 +1,304 @@
+"""
+Single running instance of the app per user
+The launcher that owns the app holds a lock file and answers JSON commands
+(start, stop, restart, status, open) on a local control socket; any later
+launch sends its request there and exits instead of booting a second copy
+
+    python3 cross-platform-launcher.py ctl status|start|stop|restart|open|quit
+    python3 cross-platform-launcher.py ctl profile [SECONDS] | ctl heap
+"""
+
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from factory_launcher.paths import user_cache_dir
+
+COMMANDS = ('activate', 'open', 'status', 'start', 'stop', 'restart', 'quit', 'profile', 'heap')
+# start and restart answer once the app is up, which may mean an install;
+# profile and heap once the capture is on disk
+SLOW_COMMANDS = ('start', 'restart', 'profile', 'heap')
+COMMAND_TIMEOUT = 5.0
+SLOW_COMMAND_TIMEOUT = 900.0
+MAX_REQUEST = 64 * 1024
+
+
+def _instance_dir():
+    return user_cache_dir('instance')
+
+
+def _use_unix_socket(path):
+    # sun_path is limited to ~104 bytes; asyncio and Windows get TCP instead
+    return hasattr(socket, 'AF_UNIX') and sys.platform != 'win32' and len(str(path)) < 100
+
+
+class InstanceLock:
+    """An exclusive lock on a file, released by the OS if the process dies"""
+
+    def __init__(self, path=None):
+        self.path = path or _instance_dir() / 'instance.lock'
+        self._file = None
+
+    def acquire(self):
+        """Take the lock without waiting; return False if another process holds it"""
+        handle = open(self.path, 'a+')
+        try:
+            if sys.platform == 'win32':
+                import msvcrt
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        return True
+
+    def release(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class ControlServer:
+    """Answer one JSON request per connection on a local socket, on threads
+
+    `handler(request)` returns a dict and may block (start waits for the
+    app), so each connection gets its own thread. Until a handler is set
+    requests are told the launcher is still starting.
+    """
+
+    def __init__(self, handler, name, log=None):
+        self.handler = handler
+        self.name = name
+        self.log = log or print
+        self.token = secrets.token_hex(16)
+        self.info_path = _instance_dir() / 'instance.json'
+        self.socket_path = _instance_dir() / 'control.sock'
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        if _use_unix_socket(self.socket_path):
+            try:
+                self.socket_path.unlink()
+            except OSError:
+                pass
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(str(self.socket_path))
+            os.chmod(self.socket_path, 0o600)
+            address = str(self.socket_path)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('127.0.0.1', 0))
+            address = sock.getsockname()[1]
+        sock.listen(8)
+        self._sock = sock
+        info = {'pid': os.getpid(), 'launcher': self.name, 'address': address,
+                'token': self.token, 'started': time.time()}
+        tmp_path = self.info_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp_path, self.info_path)
+        self._thread = threading.Thread(target=self._serve, name='control-socket', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        for path in (self.info_path, self.socket_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _serve(self):
+        while self._sock:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._answer, args=(conn,), daemon=True).start()
+
+    def _answer(self, conn):
+        with conn:
+            try:
+                conn.settimeout(COMMAND_TIMEOUT)
+                request = json.loads(_read_line(conn))
+                if not secrets.compare_digest(str(request.get('token', '')), self.token):
+                    reply = {'ok': False, 'error': "bad token"}
+                elif request.get('command') not in COMMANDS:
+                    reply = {'ok': False, 'error': f"unknown command {request.get('command')!r}"}
+                elif self.handler is None:
+                    reply = {'ok': False, 'error': "the launcher is still starting",
+                             'message': "The launcher is still starting; try again in a moment"}
+                else:
+                    reply = self.handler(request)
+            except (OSError, ValueError) as e:
+                reply = {'ok': False, 'error': str(e)}
+            except Exception as e:
+                self.log(f"Control command failed: {e}")
+                reply = {'ok': False, 'error': str(e)}
+            try:
+                conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+            except OSError:
+                pass
+
+
+def _read_line(conn):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_REQUEST:
+            raise ValueError("request too large")
+    return data.decode('utf-8')
+
+
+def send_command(command, timeout=None, **fields):
+    """Send a command to the running instance; return its reply, or None if none runs"""
+    try:
+        with open(_instance_dir() / 'instance.json', 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if timeout is None:
+        timeout = SLOW_COMMAND_TIMEOUT if command in SLOW_COMMANDS else COMMAND_TIMEOUT
+    address = info.get('address')
+    try:
+        if isinstance(address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = ('127.0.0.1', address)
+        with sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            request = dict(fields, command=command, token=info.get('token'))
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            return json.loads(_read_line(sock))
+    except (OSError, ValueError):
+        return None
+
+
+def format_status(status):
+    """Text lines for a status reply"""
+    state = "running" if status.get('running') else "stopped"
+    lines = [f"{status.get('launcher', 'launcher')} (pid {status.get('pid')}): app {state}"]
+    for service in status.get('services', []):
+        lines.append(f"  {service['name']:<10} {service['state']:<9} pid {service['pid'] or '-'} "
+                     f"up {service['uptime']:.0f}s, {service['crashes']} crash(es)")
+    return lines
+
+
+def claim(name, handler=None, log=None):
+    """Become the single instance, or hand this launch to the one that exists
+
+    Returns (lock, control server) when this process now owns the app, or
+    None after the running instance was asked to show the app. A launcher
+    that is expensive to build can claim first and attach() its handler.
+    """
+    log = log or print
+    lock = InstanceLock()
+    # Another launcher may still be writing instance.json; give it a moment
+    for _ in range(20):
+        if lock.acquire():
+            break
+        reply = send_command('activate')
+        if reply is not None:
+            for line in format_status(reply):
+                log(line)
+            log(reply.get('message', "Opened the running application"))
+            return None
+        time.sleep(0.1)
+    else:
+        log("Another launcher is running but does not answer; not starting a second one")
+        return None
+    server = ControlServer(handler, name, log=log)
+    try:
+        server.start()
+    except OSError as e:
+        log(f"Could not open the control socket: {e}")
+        return lock, None
+    return lock, server
+
+
+def attach(claimed, handler):
+    """Route control commands to `handler` once the launcher exists"""
+    if claimed and claimed[1]:
+        claimed[1].handler = handler
+
+
+def release(claimed):
+    """Undo claim(): close the control socket and drop the lock"""
+    if claimed:
+        lock, server = claimed
+        if server:
+            server.stop()
+        lock.release()
+
+
+def spawn_daemon(cmd, cwd, out=print, timeout=30.0):
+    """Start `cmd` detached with its output in the logs directory; wait until it answers"""
+    reply = send_command('status')
+    if reply is not None:
+        out("A launcher is already running")
+        for line in format_status(reply):
+            out(line)
+        return 0
+    log_path = user_cache_dir('logs') / 'daemon.log'
+    if sys.platform == 'win32':
+        flags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        kwargs = {'creationflags': flags}
+    else:
+        kwargs = {'start_new_session': True}
+    with open(log_path, 'ab') as log_file:
+        process = subprocess.Popen(cmd, cwd=cwd, stdin=subprocess.DEVNULL, stdout=log_file,
+                                   stderr=subprocess.STDOUT, **kwargs)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        reply = send_command('status')
+        if reply is not None and reply.get('pid') == process.pid:
+            out(f"Launcher running in the background (pid {process.pid}); output in {log_path}")
+            return 0
+        time.sleep(0.1)
+    out(f"The launcher did not come up; see {log_path}")
+    return 1
+
+
+def control_main(argv, out=print):
+    """`ctl COMMAND`: send one command to the running instance"""
+    command = argv[0] if argv else 'status'
+    if command not in COMMANDS:
+        out(f"Usage: ctl {'|'.join(COMMANDS)} (profile takes an optional SECONDS)")
+        return 1
+    fields = {}
+    if command == 'profile' and len(argv) > 1:
+        try:
+            fields['seconds'] = float(argv[1])
+        except ValueError:
+            out(f"Not a number of seconds: {argv[1]}")
+            return 1
+    reply = send_command(command, **fields)
+    if reply is None:
+        out("No launcher is running")
+        return 1
+    if 'running' in reply:
+        for line in format_status(reply):
+            out(line)
+    if reply.get('message'):
+        out(reply['message'])
+    if not reply.get('ok', True):
+        out(f"Error: {reply.get('error')}")
+        return 1
+    return 0
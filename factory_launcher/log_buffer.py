@@ -0,0 +1,138 @@
+"""
+Bounded in-memory log history with on-disk spill
+Recent lines live in a fixed-size ring; evicted lines go to a rotating,
+gzip-compressed log file that can be read back on demand
+"""
+
+import collections
+import gzip
+import os
+import shutil
+import threading
+
+from factory_launcher.paths import user_cache_dir
+
+RING_CAPACITY = 10000
+SPILL_MAX_BYTES = 1024 * 1024
+SPILL_BACKUPS = 10
+
+
+class SpillFile:
+    """Append-only log file rotated into launcher.log.1.gz, .2.gz, ..."""
+
+    def __init__(self, path, max_bytes=SPILL_MAX_BYTES, backups=SPILL_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8', errors='replace')
+        return self._file
+
+    def write_lines(self, lines):
+        f = self._open()
+        f.write("\n".join(lines) + "\n")
+        if f.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        """Compress the current file and shift older archives up by one"""
+        self.close()
+        oldest = self._archive(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.backups - 1, 0, -1):
+            source = self._archive(index)
+            if os.path.exists(source):
+                os.replace(source, self._archive(index + 1))
+        with open(self.path, 'rb') as src, gzip.open(self._archive(1), 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+
+    def _archive(self, index):
+        return f"{self.path}.{index}.gz"
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def files_newest_first(self):
+        """Yield (path, opener) for the current file and every archive"""
+        if os.path.exists(self.path):
+            yield self.path, open
+        for index in range(1, self.backups + 1):
+            archive = self._archive(index)
+            if not os.path.exists(archive):
+                break
+            yield archive, gzip.open
+
+
+class LogHistory:
+    """Fixed-capacity ring of recent lines that spills older lines to disk"""
+
+    def __init__(self, name='launcher', capacity=RING_CAPACITY, spill_dir=None):
+        spill_dir = spill_dir or user_cache_dir('logs')
+        self.ring = collections.deque()
+        self.capacity = capacity
+        self.spill = SpillFile(os.path.join(spill_dir, f"{name}.log"))
+        self._lock = threading.Lock()
+
+    def extend(self, lines):
+        """Add lines, spilling whatever falls out of the ring"""
+        with self._lock:
+            self.ring.extend(lines)
+            overflow = len(self.ring) - self.capacity
+            if overflow > 0:
+                self.spill.write_lines([self.ring.popleft() for _ in range(overflow)])
+
+    def older(self, skip, count):
+        """Return up to `count` lines that precede the newest `skip` lines"""
+        with self._lock:
+            ring = list(self.ring)
+            self.spill.flush()
+
+        end = len(ring) - skip
+        if end > 0:
+            start = max(0, end - count)
+            lines = ring[start:end]
+            if len(lines) == count:
+                return lines
+            count -= len(lines)
+            skip = 0
+        else:
+            lines = []
+            skip = -end
+
+        older_lines = []
+        for path, opener in self.spill.files_newest_first():
+            try:
+                with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+                    file_lines = f.read().splitlines()
+            except OSError:
+                break
+            if skip >= len(file_lines):
+                skip -= len(file_lines)
+                continue
+            end = len(file_lines) - skip
+            taken = file_lines[max(0, end - count):end]
+            older_lines = taken + older_lines
+            count -= len(taken)
+            skip = 0
+            if count <= 0:
+                break
+        return older_lines + lines
+
+    def close(self):
+        """Spill everything still in memory so the history survives a restart"""
+        with self._lock:
+            if self.ring:
+                self.spill.write_lines(list(self.ring))
+                self.ring.clear()
+            self.spill.close()
@@ -0,0 +1,153 @@
+"""
+Thread-safe, batched log sink for the tkinter launchers
+Reader threads only enqueue lines; the Tk main loop drains them in batches
+into a Text widget that only holds a bounded window of recent lines
+"""
+
+import collections
+import threading
+
+try:
+    import tkinter as tk
+except ImportError:
+    tk = None
+
+FRAME_MS = 50
+MAX_LINES_PER_FRAME = 1000
+# Lines kept in the Text widget; older ones stay reachable through load_older()
+VIEW_LINES = 2000
+# How far load_older() may grow that window, as a multiple of it
+MAX_VIEW_FACTOR = 10
+
+
+class TkLogSink:
+    """Queue log lines from any thread and draw them from the Tk main loop"""
+
+    def __init__(self, root, text_widget, frame_ms=FRAME_MS,
+                 max_lines_per_frame=MAX_LINES_PER_FRAME,
+                 history=None, max_view_lines=VIEW_LINES):
+        self.root = root
+        self.text_widget = text_widget
+        self.frame_ms = frame_ms
+        self.max_lines_per_frame = max_lines_per_frame
+        self.history = history
+        self.max_view_lines = max_view_lines
+        self._view_limit = max_view_lines
+        self._shown = 0
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def write(self, line):
+        """Queue a line for display; safe to call from any thread"""
+        with self._lock:
+            self._pending.append(line)
+
+    def start(self):
+        """Begin draining the queue at a fixed frame rate"""
+        if not self._running:
+            self._running = True
+            self.root.after(self.frame_ms, self._drain)
+
+    def stop(self):
+        """Stop draining; queued lines are discarded"""
+        self._running = False
+
+    def close(self):
+        """Stop draining and persist the in-memory history"""
+        self.stop()
+        if self.history:
+            lines = self._take_batch()
+            if lines:
+                self.history.extend(list(lines))
+            self.history.close()
+
+    def clear(self):
+        """Empty the widget; the history itself is kept"""
+        self.text_widget.delete('1.0', tk.END)
+        self._shown = 0
+        self._view_limit = self.max_view_lines
+
+    def load_older(self, count=500):
+        """Prepend up to `count` older lines from the history; return how many
+
+        The widget keeps them until the view is scrolled back to the newest
+        line, up to MAX_VIEW_FACTOR times the usual window.
+        """
+        count = min(count, self.max_view_lines * MAX_VIEW_FACTOR - self._shown)
+        if not self.history or count <= 0:
+            return 0
+        lines = self.history.older(self._shown, count)
+        if lines:
+            self.text_widget.insert('1.0', "\n".join(lines) + "\n")
+            self.text_widget.see('1.0')
+            self._shown += len(lines)
+            self._view_limit += len(lines)
+        return len(lines)
+
+    def _take_batch(self):
+        """Swap out everything queued so far in one locked operation"""
+        with self._lock:
+            batch, self._pending = self._pending, collections.deque()
+        return batch
+
+    def coalesce(self, lines):
+        """Collapse repeated lines and trim a backlog the UI cannot keep up with"""
+        omitted = 0
+        if len(lines) > self.max_lines_per_frame:
+            omitted = len(lines) - self.max_lines_per_frame
+            for _ in range(omitted):
+                lines.popleft()
+
+        output = []
+        if omitted:
+            output.append(f"... {omitted} lines omitted (see console output) ...")
+
+        previous = None
+        repeats = 0
+        for line in lines:
+            if line == previous:
+                repeats += 1
+                continue
+            if repeats:
+                output.append(f"    (previous line repeated {repeats}x)")
+            output.append(line)
+            previous = line
+            repeats = 0
+        if repeats:
+            output.append(f"    (previous line repeated {repeats}x)")
+        return output
+
+    def _drain(self):
+        """Insert all queued lines with a single widget update"""
+        if not self._running:
+            return
+        batch = self._take_batch()
+        if batch:
+            lines = "\n".join(self.coalesce(batch)).split("\n")
+            if self.history:
+                self.history.extend(lines)
+            try:
+                # Follow new lines only while the view is at the bottom, so
+                # loaded history stays put while someone is reading it
+                following = self.text_widget.yview()[1] >= 1.0
+                self.text_widget.insert(tk.END, "\n".join(lines) + "\n")
+                self._shown += len(lines)
+                if following:
+                    # Back at the tail: the loaded history can go again
+                    self._view_limit = self.max_view_lines
+                self._trim()
+                if following:
+                    self.text_widget.see(tk.END)
+            except tk.TclError:
+                # Widget destroyed while the window was closing
+                self._running = False
+                return
+        self.root.after(self.frame_ms, self._drain)
+
+    def _trim(self):
+        """Keep the widget to a fixed window of the most recent lines"""
+        excess = self._shown - self._view_limit
+        if excess > 0:
+            self.text_widget.delete('1.0', f"{excess + 1}.0")
+            self._shown -= excess
@@ -0,0 +1,382 @@
+"""
+Launcher-managed local MongoDB
+Waits for an installed MongoDB service, or (when asked to) starts mongod
+as a supervised service sized to the machine, holds the server back until
+MongoDB answers a ping and shuts it down cleanly
+"""
+
+import asyncio
+import glob
+import itertools
+import os
+import shutil
+import struct
+import subprocess
+import sys
+from pathlib import Path
+
+from factory_launcher.backup import read_env_file, redact
+from factory_launcher.aio import run_blocking
+from factory_launcher.paths import user_data_dir
+from factory_launcher.readiness import check_port_async
+from factory_launcher.resources import total_memory
+from factory_launcher.supervisor import RESTART_ON_FAILURE, Service, ServiceSpec
+
+DEFAULT_URL = 'mongodb://localhost:27017/factory'
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+READY_TIMEOUT = 120.0
+# How long an installed MongoDB service may take to answer on a cold boot
+SERVICE_WAIT = 60.0
+SHUTDOWN_TIMEOUT = 60.0
+# mongod's own default; lower loses less on a power cut, higher writes less
+JOURNAL_COMMIT_MS = 100
+# Below this much RAM, skip the diagnostic data mongod records every second
+SMALL_MACHINE = 4 << 30
+GB = 1 << 30
+
+OP_MSG = 2013
+_request_ids = itertools.count(1)
+
+
+def server_database_url(app_dir):
+    """The URL the server connects to: MONGODB_URL, else server/.env"""
+    return (os.environ.get('MONGODB_URL')
+            or read_env_file(Path(app_dir, 'server', '.env')).get('MONGODB_URL')
+            or DEFAULT_URL)
+
+
+def local_address(url):
+    """(host, port) of a mongodb:// URL on this machine, else None"""
+    if not url.startswith('mongodb://'):
+        return None
+    hosts = url[len('mongodb://'):].split('/', 1)[0].split('?', 1)[0]
+    host = hosts.rsplit('@', 1)[-1].split(',')[0]
+    if host.startswith('['):
+        host, _, rest = host[1:].partition(']')
+        port = rest.lstrip(':')
+    else:
+        host, _, port = host.partition(':')
+    if host not in LOCAL_HOSTS:
+        return None
+    try:
+        return host, int(port or 27017)
+    except ValueError:
+        return None
+
+
+def mongo_mode():
+    """FACTORY_MONGO: 'auto' (default), 'managed' or 'off'
+
+    'auto' waits for an installed MongoDB and only runs its own mongod on a
+    data directory that already exists (FACTORY_MONGO_DBPATH or one made
+    under 'managed'); 'managed' may create that directory; 'off' never
+    starts mongod.
+    """
+    value = os.environ.get('FACTORY_MONGO', 'auto').lower()
+    if value in ('0', 'off', 'false', 'no'):
+        return 'off'
+    return 'managed' if value == 'managed' else 'auto'
+
+
+def service_wait():
+    try:
+        return max(0.0, float(os.environ.get('FACTORY_MONGO_WAIT', SERVICE_WAIT)))
+    except ValueError:
+        return SERVICE_WAIT
+
+
+def managed_dbpath():
+    return Path(os.environ.get('FACTORY_MONGO_DBPATH') or user_data_dir('mongodb'))
+
+
+def installed_service_state():
+    """'running', 'starting' or 'stopped' for an installed MongoDB service, or None
+
+    Looks for the Windows installer's "MongoDB" service or a systemd
+    mongod/mongodb unit.
+    """
+    if sys.platform == 'win32':
+        commands = [['sc', 'query', 'MongoDB']]
+    elif shutil.which('systemctl'):
+        commands = [['systemctl', 'is-active', unit] for unit in ('mongod', 'mongodb')]
+    else:
+        return None
+    for cmd in commands:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        output = result.stdout
+        if sys.platform == 'win32':
+            if result.returncode != 0:
+                continue
+            if 'RUNNING' in output:
+                return 'running'
+            return 'starting' if 'START_PENDING' in output else 'stopped'
+        state = output.strip()
+        if state in ('active', 'reloading'):
+            return 'running'
+        if state == 'activating':
+            return 'starting'
+        if state in ('inactive', 'failed', 'deactivating'):
+            # is-active also says "inactive" for units that do not exist
+            try:
+                loaded = subprocess.run(['systemctl', 'show', '-p', 'LoadState', '--value',
+                                         cmd[-1]], capture_output=True, text=True,
+                                        timeout=5).stdout.strip()
+            except (OSError, subprocess.TimeoutExpired):
+                return None
+            if loaded == 'loaded':
+                return 'stopped'
+    return None
+
+
+def find_mongod():
+    """FACTORY_MONGOD, mongod on PATH, or the newest standard Windows install"""
+    configured = os.environ.get('FACTORY_MONGOD')
+    if configured:
+        return configured if os.path.exists(configured) else None
+    found = shutil.which('mongod')
+    if found or sys.platform != 'win32':
+        return found
+    pattern = os.path.join(os.environ.get('ProgramFiles', r'C:\Program Files'),
+                           'MongoDB', 'Server', '*', 'bin', 'mongod.exe')
+
+    def version(path):
+        name = Path(path).parents[1].name
+        return tuple(int(part) if part.isdigit() else 0 for part in name.split('.'))
+
+    installs = sorted(glob.glob(pattern), key=version)
+    return installs[-1] if installs else None
+
+
+def cache_size_gb(memory=None):
+    """WiredTiger cache for a desktop shared with Node, Vite and a browser
+
+    mongod defaults to half of (RAM - 1 GB), which suits a dedicated host;
+    here it gets a quarter, between 0.25 and 8 GB. FACTORY_MONGO_CACHE_GB
+    overrides it.
+    """
+    configured = os.environ.get('FACTORY_MONGO_CACHE_GB')
+    if configured:
+        try:
+            return max(0.25, float(configured))
+        except ValueError:
+            pass
+    memory = memory or total_memory()
+    if not memory:
+        return 1.0
+    size = (memory - GB) / 4 / GB
+    return round(min(max(size, 0.25), 8.0), 2)
+
+
+def journal_commit_ms():
+    try:
+        value = int(os.environ.get('FACTORY_MONGO_JOURNAL_MS', JOURNAL_COMMIT_MS))
+    except ValueError:
+        return JOURNAL_COMMIT_MS
+    # The range mongod accepts
+    return min(max(value, 1), 500)
+
+
+def mongod_spec(mongod, port, dbpath=None, memory=None):
+    """ServiceSpec for a mongod bound to localhost, with its data and log paths"""
+    dbpath = Path(dbpath or managed_dbpath())
+    dbpath.mkdir(parents=True, exist_ok=True)
+    memory = memory or total_memory()
+    # Journaling is always on in current mongod; the commit interval is
+    # what bounds how much a crash can lose
+    cmd = [mongod, '--dbpath', str(dbpath), '--port', str(port), '--bind_ip', '127.0.0.1',
+           '--wiredTigerCacheSizeGB', str(cache_size_gb(memory)),
+           '--journalCommitInterval', str(journal_commit_ms()),
+           '--logpath', str(dbpath / 'mongod.log'), '--logappend']
+    if memory and memory < SMALL_MACHINE:
+        cmd += ['--setParameter', 'diagnosticDataCollectionEnabled=false']
+    return ServiceSpec('mongod', cmd, dbpath, restart=RESTART_ON_FAILURE, max_restarts=3,
+                       backoff_initial=2.0)
+
+
+def _encode(document):
+    """BSON for a flat document of ints and strings"""
+    body = b''
+    for key, value in document.items():
+        name = key.encode('utf-8') + b'\0'
+        if isinstance(value, str):
+            data = value.encode('utf-8') + b'\0'
+            body += b'\x02' + name + struct.pack('<i', len(data)) + data
+        else:
+            body += b'\x10' + name + struct.pack('<i', value)
+    return struct.pack('<i', len(body) + 5) + body + b'\0'
+
+
+_FIXED_SIZES = {0x01: 8, 0x07: 12, 0x08: 1, 0x09: 8, 0x0A: 0, 0x10: 4, 0x11: 8, 0x12: 8,
+                0x13: 16}
+
+
+def _decode(data):
+    """The top-level numeric, boolean and string fields of a BSON document"""
+    fields = {}
+    end = struct.unpack_from('<i', data)[0] - 1
+    offset = 4
+    while offset < end:
+        kind = data[offset]
+        name_end = data.index(b'\0', offset + 1)
+        name = data[offset + 1:name_end].decode('utf-8', 'replace')
+        offset = name_end + 1
+        if kind == 0x01:
+            fields[name] = struct.unpack_from('<d', data, offset)[0]
+        elif kind == 0x08:
+            fields[name] = bool(data[offset])
+        elif kind == 0x10:
+            fields[name] = struct.unpack_from('<i', data, offset)[0]
+        elif kind == 0x12:
+            fields[name] = struct.unpack_from('<q', data, offset)[0]
+        elif kind == 0x02:
+            length = struct.unpack_from('<i', data, offset)[0]
+            fields[name] = data[offset + 4:offset + 3 + length].decode('utf-8', 'replace')
+            offset += 4 + length
+            continue
+        if kind in _FIXED_SIZES:
+            offset += _FIXED_SIZES[kind]
+        elif kind in (0x03, 0x04):
+            offset += struct.unpack_from('<i', data, offset)[0]
+        elif kind == 0x05:
+            offset += 5 + struct.unpack_from('<i', data, offset)[0]
+        else:
+            break
+    return fields
+
+
+async def run_command(host, port, command, timeout=2.0):
+    """Send one command to the admin database with OP_MSG; return the reply's fields"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        payload = struct.pack('<I', 0) + b'\0' + _encode(dict(command, **{'$db': 'admin'}))
+        writer.write(struct.pack('<iiii', 16 + len(payload), next(_request_ids), 0, OP_MSG)
+                     + payload)
+        head = await asyncio.wait_for(reader.readexactly(16), timeout)
+        length, _, _, opcode = struct.unpack('<iiii', head)
+        body = await asyncio.wait_for(reader.readexactly(length - 16), timeout)
+        if opcode != OP_MSG or body[4] != 0:
+            raise ValueError(f"unexpected reply (opcode {opcode})")
+        return _decode(body[5:])
+    finally:
+        writer.close()
+
+
+async def ping(host, port, timeout=2.0):
+    """True if MongoDB on host:port answers {ping: 1} with ok: 1"""
+    try:
+        reply = await run_command(host, port, {'ping': 1}, timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError,
+            struct.error):
+        return False
+    return reply.get('ok') == 1
+
+
+async def wait_for_ping(host, port, timeout=READY_TIMEOUT, service=None):
+    """Ping until MongoDB answers; give up early if `service` stops"""
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    delay = 0.1
+    while loop.time() < deadline:
+        if await ping(host, port):
+            return True
+        if service and service.finished():
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    return False
+
+
+class MongoService(Service):
+    """A supervised mongod that is stopped with the shutdown command
+
+    A signal also shuts mongod down cleanly on POSIX, but Windows has no
+    equivalent, so every platform asks first and only then escalates.
+    """
+
+    def __init__(self, spec, port, log, shutdown_policy=None, on_ready=None, on_line=None):
+        super().__init__(spec, log, shutdown_policy, on_ready, on_line)
+        self.port = port
+
+    async def _stop_process(self, process):
+        if process.returncode is None:
+            asked = True
+            try:
+                await run_command('127.0.0.1', self.port, {'shutdown': 1})
+            except ConnectionRefusedError:
+                # Not listening yet (stopped mid-start); nothing to wait for
+                asked = False
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError,
+                    struct.error):
+                # The connection drops while mongod shuts down
+                pass
+            try:
+                if asked:
+                    await asyncio.wait_for(asyncio.shield(process.wait()), SHUTDOWN_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.log(f"[{self.name}] did not shut down in {SHUTDOWN_TIMEOUT:.0f}s; stopping it")
+        return await super()._stop_process(process)
+
+
+async def prepare_database(app_dir, supervisor, log):
+    """Make sure the server's database answers before the server starts
+
+    A MongoDB that is installed as a service, or already holds the port,
+    is waited for rather than replaced: on a cold boot it may still be
+    starting. Otherwise a managed mongod is started, but it is only given
+    a new, empty data directory when the user opted in. Returns an error
+    message, or None when the server can start.
+    """
+    url = server_database_url(app_dir)
+    address = local_address(url)
+    if address is None:
+        log(f"Database at {redact(url)} is not local; not managing MongoDB")
+        return None
+    host, port = address
+    if await ping(host, port):
+        log(f"Using the MongoDB already running on port {port}")
+        return None
+    mode = mongo_mode()
+    if mode == 'off':
+        log(f"MongoDB on port {port} is not answering (FACTORY_MONGO=off)")
+        return None
+
+    state = await run_blocking(installed_service_state)
+    if state in ('running', 'starting') or await check_port_async(host, port, use_http=False):
+        wait = service_wait()
+        log(f"Waiting up to {wait:.0f}s for the MongoDB already on this machine to answer")
+        if await wait_for_ping(host, port, timeout=wait):
+            log(f"MongoDB answered a ping on port {port}")
+            return None
+        return (f"MongoDB on port {port} did not answer within {wait:.0f}s.\n\n"
+                "Check the MongoDB service, or raise FACTORY_MONGO_WAIT.")
+
+    dbpath = managed_dbpath()
+    existing = (dbpath / 'WiredTiger').exists()
+    opted_in = mode == 'managed' or 'FACTORY_MONGO_DBPATH' in os.environ
+    if not existing and not opted_in:
+        start = ("Start the MongoDB service" if state == 'stopped'
+                 else "Install MongoDB Community Server and start it as a service")
+        return (f"MongoDB is not running on port {port}.\n\n"
+                f"{start}, or set FACTORY_MONGO=managed to let the launcher run its own "
+                "database (it starts out empty).")
+    mongod = find_mongod()
+    if not mongod:
+        return (f"MongoDB is not running on port {port} and mongod was not found.\n\n"
+                "Install MongoDB Community Server, start it as a service, or set "
+                "FACTORY_MONGOD to the mongod executable.")
+    spec = mongod_spec(mongod, port, dbpath)
+    if not existing:
+        log(f"Creating a NEW, EMPTY database in {dbpath}; the app starts with no data "
+            f"(restore a backup to fill it)")
+    log(f"Starting MongoDB on port {port} (cache {cache_size_gb()} GB, data in {spec.cwd})")
+    service = supervisor.add_service(MongoService(spec, port, log, supervisor.shutdown_policy,
+                                                  supervisor.on_ready, supervisor.on_line))
+    supervisor.start_all()
+    if await wait_for_ping(host, port, service=service):
+        log(f"MongoDB answered a ping on port {port}")
+        return None
+    return (f"MongoDB did not start on port {port}.\n\n"
+            f"See {spec.cwd / 'mongod.log'} for the reason.")
@@ -0,0 +1,135 @@
+"""
+Child process output pipeline
+Reads stdout as binary chunks, strips ANSI/OSC sequences with one
+precompiled pattern and decodes once per chunk
+
+Benchmark against the old per-line approach with:
+    python -m factory_launcher.output --bench [recorded.log]
+"""
+
+import re
+import sys
+import time
+
+CHUNK_SIZE = 64 * 1024
+
+# CSI (colors, cursor moves), OSC (titles, hyperlinks) and two-byte escapes
+ANSI_RE = re.compile(
+    rb'\x1b\[[0-?]*[ -/]*[@-~]'
+    rb'|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'
+    rb'|\x1b[@-Z\\-_]'
+)
+
+
+class LineSplitter:
+    """Turn arbitrary byte chunks into clean text lines"""
+
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self._partial = b''
+
+    def feed(self, chunk):
+        """Return the complete lines in chunk; keep any trailing fragment"""
+        data = self._partial + chunk
+        end = data.rfind(b'\n')
+        if end < 0:
+            self._partial = data
+            return []
+        # Only complete lines are processed, so an escape sequence or a
+        # multi-byte character split across reads is never cut in half
+        self._partial = data[end + 1:]
+        return self._clean(data[:end])
+
+    def flush(self):
+        """Return whatever is left once the stream has ended"""
+        data, self._partial = self._partial, b''
+        return self._clean(data) if data else []
+
+    def _clean(self, data):
+        text = ANSI_RE.sub(b'', data).decode(self.encoding, errors='replace')
+        lines = []
+        for line in text.split('\n'):
+            # Progress output redraws with \r; keep only the final state
+            line = line.rstrip('\r')
+            if '\r' in line:
+                line = line.rsplit('\r', 1)[1]
+            line = line.strip()
+            if line:
+                lines.append(line)
+        return lines
+
+
+def iter_output_lines(stream, chunk_size=CHUNK_SIZE):
+    """Yield clean lines from a binary stream until it closes
+
+    `stream` should be an unbuffered pipe (Popen with bufsize=0), whose
+    read() returns as soon as any output is available.
+    """
+    splitter = LineSplitter()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield from splitter.feed(chunk)
+    yield from splitter.flush()
+
+
+SAMPLE_LINES = (
+    b'\x1b[34m[0]\x1b[39m \x1b[33m[nodemon] 3.0.1\x1b[39m',
+    b'\x1b[34m[0]\x1b[39m \x1b[33m[nodemon] watching path(s): *.*\x1b[39m',
+    b'\x1b[34m[0]\x1b[39m \x1b[32minfo\x1b[39m: GET /v1/products?limit=10 200 - 12.345 ms',
+    b'\x1b[35m[1]\x1b[39m   \x1b[32m\x1b[1mVITE\x1b[22m v5.4.1\x1b[39m  ready in \x1b[1m412\x1b[22m ms',
+    b'\x1b[35m[1]\x1b[39m   \x1b[32m\xe2\x9e\x9c\x1b[39m  \x1b[1mLocal\x1b[22m:   \x1b[36mhttp://localhost:\x1b[1m5173\x1b[22m/\x1b[39m',
+    b'\x1b]0;vite\x07\x1b[2m11:02:45 AM\x1b[22m \x1b[36m\x1b[1m[vite]\x1b[22m\x1b[39m \x1b[32mhmr update \x1b[39m\x1b[2m/src/main.tsx\x1b[22m',
+)
+
+
+def _legacy_lines(data):
+    """The previous pipeline: text-mode lines with a per-line re.sub"""
+    count = 0
+    for line in data.decode('utf-8', errors='replace').splitlines():
+        clean_line = line.strip()
+        import re as legacy_re
+        clean_line = legacy_re.sub(r'\x1b\[[0-9;]*m', '', clean_line)
+        count += 1
+    return count
+
+
+def _chunked_lines(data, chunk_size=CHUNK_SIZE):
+    splitter = LineSplitter()
+    count = 0
+    for start in range(0, len(data), chunk_size):
+        count += len(splitter.feed(data[start:start + chunk_size]))
+    return count + len(splitter.flush())
+
+
+def benchmark(data, rounds=5):
+    """Print throughput of the legacy and chunked pipelines over data"""
+    size_mb = len(data) / (1024 * 1024)
+    line_count = data.count(b'\n')
+    print(f"Replaying {size_mb:.1f} MB, {line_count} lines, {rounds} rounds")
+    for name, func in (('legacy per-line', _legacy_lines), ('chunked', _chunked_lines)):
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            lines = func(data)
+            best = min(best, time.perf_counter() - start)
+        print(f"  {name:16} {size_mb / best:8.1f} MB/s  {lines / best:12,.0f} lines/s")
+
+
+def main(argv):
+    if len(argv) < 1 or argv[0] != '--bench':
+        print("Usage: python -m factory_launcher.output --bench [recorded.log]")
+        return 1
+    if len(argv) > 1:
+        with open(argv[1], 'rb') as f:
+            data = f.read()
+    else:
+        # No recording given; synthesize concurrently/nodemon/Vite style output
+        data = b'\n'.join(SAMPLE_LINES * 50000) + b'\n'
+    benchmark(data)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,32 @@
+"""
+Per-user locations for launcher caches and state
+Kept outside the app folder so they survive redeploys
+"""
+
+import os
+import sys
+from pathlib import Path
+
+APP_NAME = 'factory-app'
+
+
+def user_cache_dir(*parts):
+    """Return (and create) a per-user cache directory"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(r'~\AppData\Local')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = Path(base, APP_NAME, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def user_data_dir(*parts):
+    """Return (and create) a per-user directory for data that must not be cleared"""
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser(r'~\AppData\Roaming')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    path = Path(base, APP_NAME, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
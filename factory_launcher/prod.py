@@ -0,0 +1,156 @@
+"""
+Production launch mode
+Runs the bundled server under a Node cluster sized to the machine's cores
+and serves the built client with long-lived cache headers
+"""
+
+import functools
+import os
+import posixpath
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from factory_launcher.paths import user_cache_dir
+from factory_launcher.readiness import CLIENT_PORT
+from factory_launcher.supervisor import ServiceSpec
+
+# Vite puts content-hashed files under assets/, so they never change in place
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+# Primary process: load server/.env (the bundle resolves it relative to
+# dist/, one level off), then fork one worker per core and replace any
+# worker that dies; workers share the listening port through the primary
+CLUSTER_BOOTSTRAP = """\
+const cluster = require('cluster');
+const path = require('path');
+const [bundle, count] = process.argv.slice(-2);
+const workers = Math.max(1, parseInt(count, 10) || 1);
+const isPrimary = cluster.isPrimary !== undefined ? cluster.isPrimary : cluster.isMaster;
+if (!isPrimary) {
+  require(bundle);
+} else {
+  const serverDir = path.dirname(path.dirname(bundle));
+  try {
+    require(path.join(serverDir, 'node_modules', 'dotenv')).config({ path: path.join(serverDir, '.env') });
+  } catch (e) {}
+  let stopping = false;
+  const stop = () => {
+    stopping = true;
+    for (const id in cluster.workers) cluster.workers[id].process.kill('SIGTERM');
+    setTimeout(() => process.exit(0), 5000).unref();
+  };
+  process.on('SIGINT', stop);
+  process.on('SIGTERM', stop);
+  cluster.on('exit', (worker, code, signal) => {
+    if (stopping) {
+      if (Object.keys(cluster.workers).length === 0) process.exit(0);
+      return;
+    }
+    console.log(`Worker ${worker.process.pid} exited (${signal || code}); starting a replacement`);
+    cluster.fork();
+  });
+  console.log(`Cluster primary ${process.pid} starting ${workers} worker(s)`);
+  for (let i = 0; i < workers; i += 1) cluster.fork();
+}
+"""
+
+
+def server_workers():
+    """Worker count for the server cluster; override with FACTORY_SERVER_WORKERS"""
+    try:
+        value = int(os.environ.get('FACTORY_SERVER_WORKERS', 0))
+    except ValueError:
+        value = 0
+    return max(1, value or os.cpu_count() or 1)
+
+
+def cluster_script():
+    """Write the cluster bootstrap to the user cache and return its path"""
+    path = user_cache_dir('prod') / 'cluster.js'
+    try:
+        current = path.read_text(encoding='utf-8')
+    except OSError:
+        current = None
+    if current != CLUSTER_BOOTSTRAP:
+        path.write_text(CLUSTER_BOOTSTRAP, encoding='utf-8')
+    return path
+
+
+def prod_services(app_dir, node_cmd, workers=None):
+    """Return the service spec for the bundled server running under a cluster"""
+    workers = workers or server_workers()
+    bundle = app_dir / 'server' / 'dist' / 'index.js'
+    return [
+        ServiceSpec('server', [node_cmd, str(cluster_script()), str(bundle), str(workers)],
+                    app_dir / 'server', env={'NODE_ENV': 'production'},
+                    max_restarts=10, ready_pattern=r'Listening to port'),
+    ]
+
+
+class StaticHandler(SimpleHTTPRequestHandler):
+    """Serve the built client with cache headers and a single-page-app fallback"""
+
+    def end_headers(self):
+        path = self.path.split('?', 1)[0]
+        if '/assets/' in path:
+            self.send_header('Cache-Control', IMMUTABLE_CACHE)
+        else:
+            # index.html names the hashed bundles, so it must always be revalidated
+            self.send_header('Cache-Control', REVALIDATE_CACHE)
+        super().end_headers()
+
+    def send_head(self):
+        url_path = self.path.split('?', 1)[0]
+        if not os.path.exists(self.translate_path(url_path)):
+            if not posixpath.splitext(url_path)[1]:
+                # Client-side routes such as /sales/new have no file; serve index.html
+                self.path = '/index.html'
+            else:
+                self.path = self._relative_to_root(url_path) or self.path
+        return super().send_head()
+
+    def _relative_to_root(self, url_path):
+        """Map /sales/assets/app.js to /assets/app.js if only the latter exists"""
+        # The client is built with base './', so index.html served on a deep
+        # link such as /sales/new resolves its bundles below that route
+        parts = [part for part in url_path.split('/') if part]
+        for start in range(1, len(parts)):
+            candidate = '/' + '/'.join(parts[start:])
+            if os.path.isfile(self.translate_path(candidate)):
+                return candidate
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StaticServer:
+    """Threaded HTTP server for client/dist running inside the launcher"""
+
+    def __init__(self, root_dir, port=CLIENT_PORT, host='', log=None):
+        self.root_dir = root_dir
+        self.port = port
+        self.host = host
+        self.log = log or print
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        handler = functools.partial(StaticHandler, directory=str(self.root_dir))
+        self._httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name='static-client', daemon=True)
+        self._thread.start()
+        self.log(f"[client] serving {self.root_dir} on port {self.port}")
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            self.log("[client] static server stopped")
+
+    def is_running(self):
+        return self._httpd is not None
@@ -0,0 +1,147 @@
+"""
+Startup phase profiler
+Records monotonic timestamps for each launch phase, writes a JSON timeline
+per launch and renders a waterfall compared with previous launches
+"""
+
+import contextlib
+import json
+import os
+import platform
+import statistics
+import threading
+import time
+
+from factory_launcher.paths import user_cache_dir
+
+KEEP_TIMELINES = 50
+BAR_WIDTH = 40
+
+
+class StartupProfiler:
+    """Collect phases (with duration) and marks (instants) for one launch"""
+
+    def __init__(self, launcher='cross-platform-launcher', timeline_dir=None):
+        self.launcher = launcher
+        self.timeline_dir = timeline_dir or user_cache_dir('startup-profiles')
+        self.origin = time.monotonic()
+        self.started_at = time.time()
+        self.phases = []
+        self.marks = []
+        self.total = None
+        self.saved_path = None
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Seconds since the launch began"""
+        return time.monotonic() - self.origin
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the enclosed block as a named phase"""
+        start = self.now()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append({'name': name, 'start': round(start, 3),
+                                    'end': round(self.now(), 3)})
+
+    def mark(self, name, at=None):
+        """Record an instant; `at` is an absolute time.monotonic() value"""
+        offset = self.now() if at is None else at - self.origin
+        with self._lock:
+            if not any(m['name'] == name for m in self.marks):
+                self.marks.append({'name': name, 'at': round(offset, 3)})
+
+    def finish(self):
+        """Close the timeline and return the total launch time"""
+        self.total = round(self.now(), 3)
+        return self.total
+
+    def to_dict(self):
+        return {
+            'launcher': self.launcher,
+            'started_at': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            'platform': f"{platform.system()} {platform.release()}",
+            'total': self.total,
+            'phases': self.phases,
+            'marks': sorted(self.marks, key=lambda m: m['at']),
+        }
+
+    def save(self):
+        """Write this launch's timeline and prune old ones; return the path"""
+        name = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        path = self.timeline_dir / f"{name}-{os.getpid()}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        self.saved_path = path
+
+        timelines = sorted(self.timeline_dir.glob('*.json'))
+        for old in timelines[:-KEEP_TIMELINES]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+        return path
+
+    def previous(self, count):
+        """Load up to `count` earlier timelines from the same launcher"""
+        timelines = []
+        for path in sorted(self.timeline_dir.glob('*.json'), reverse=True):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if path == self.saved_path or data.get('launcher') != self.launcher:
+                continue
+            timelines.append(data)
+            if len(timelines) >= count:
+                break
+        return timelines
+
+    def waterfall(self):
+        """Render phases and marks as a text waterfall"""
+        total = self.total or self.now()
+        scale = BAR_WIDTH / total if total else 0
+        lines = [f"Startup timeline ({total:.2f}s total)"]
+        for phase in self.phases:
+            offset = int(phase['start'] * scale)
+            width = max(1, int((phase['end'] - phase['start']) * scale))
+            bar = ' ' * offset + '#' * width
+            duration = phase['end'] - phase['start']
+            lines.append(f"  {phase['name']:<24} |{bar:<{BAR_WIDTH}}| "
+                         f"{phase['start']:7.2f}s +{duration:.2f}s")
+        for mark in sorted(self.marks, key=lambda m: m['at']):
+            bar = ' ' * min(int(mark['at'] * scale), BAR_WIDTH - 1) + '^'
+            lines.append(f"  {mark['name']:<24} |{bar:<{BAR_WIDTH}}| {mark['at']:7.2f}s")
+        return "\n".join(lines)
+
+    def comparison(self, count=5):
+        """Compare this launch with the median of the previous `count` launches"""
+        history = self.previous(count)
+        if not history:
+            return "No previous launches to compare with"
+
+        def durations(data):
+            result = {p['name']: p['end'] - p['start'] for p in data.get('phases', [])}
+            result.update({m['name']: m['at'] for m in data.get('marks', [])})
+            if data.get('total') is not None:
+                result['total'] = data['total']
+            return result
+
+        current = durations(self.to_dict())
+        past = [durations(data) for data in history]
+        lines = [f"Compared with the median of the previous {len(history)} launch(es):"]
+        for name, value in current.items():
+            samples = [p[name] for p in past if name in p]
+            if not samples:
+                lines.append(f"  {name:<24} {value:7.2f}s   (new)")
+                continue
+            median = statistics.median(samples)
+            delta = value - median
+            flag = "  <-- slower" if median and delta > max(0.5, median * 0.2) else ""
+            lines.append(f"  {name:<24} {value:7.2f}s   median {median:7.2f}s   "
+                         f"{delta:+.2f}s{flag}")
+        return "\n".join(lines)
@@ -0,0 +1,341 @@
+"""
+Local reverse proxy in front of the API port
+Owns the public server port and forwards each HTTP request to whichever
+backend port is current, so the server behind it can be swapped without
+refusing a connection or stranding a browser's keep-alive connection on
+the old instance
+"""
+
+import asyncio
+import collections
+
+BACKEND_HOST = '127.0.0.1'
+BUFFER_SIZE = 64 * 1024
+# How long a new connection waits for a backend while none is ready
+BACKEND_WAIT = 30.0
+# Close idle keep-alive connections before node's 5s keepAliveTimeout
+# would, so a retired backend drains quickly
+IDLE_TIMEOUT = 4.0
+# How long a retried request keeps trying to reach a (replacement) backend
+RETRY_WAIT = 10.0
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class BackendClosed(Exception):
+    """The backend closed the connection before sending a response"""
+
+
+def header(headers, name):
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+async def read_head(reader):
+    """Read a request or response head; return (start line, [(name, value)])"""
+    data = await reader.readuntil(b'\r\n\r\n')
+    lines = data[:-4].decode('latin-1').split('\r\n')
+    headers = []
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def encode_head(start_line, headers):
+    text = start_line + '\r\n' + ''.join(f"{name}: {value}\r\n" for name, value in headers)
+    return (text + '\r\n').encode('latin-1')
+
+
+async def iter_body(reader, headers, until_eof=False):
+    """Yield (raw bytes, decoded bytes) pieces of a message body"""
+    if (header(headers, 'transfer-encoding') or '').lower().endswith('chunked'):
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                raw = size_line
+                while True:
+                    line = await reader.readline()
+                    raw += line
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                yield raw, b''
+                return
+            data = await reader.readexactly(size + 2)
+            yield size_line + data, data[:-2]
+    length = header(headers, 'content-length')
+    if length is not None:
+        remaining = int(length)
+        while remaining:
+            data = await reader.readexactly(min(remaining, BUFFER_SIZE))
+            remaining -= len(data)
+            yield data, data
+    elif until_eof:
+        while True:
+            data = await reader.read(BUFFER_SIZE)
+            if not data:
+                return
+            yield data, data
+
+
+class BackendConnection:
+    """One connection from the proxy to a backend port"""
+
+    __slots__ = ('port', 'reader', 'writer', 'closed')
+
+    def __init__(self, port, reader, writer):
+        self.port = port
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+
+class ReverseProxy:
+    """Forward HTTP/1.1 requests on `port` to the current backend port
+
+    All methods must run on the event loop. Each request goes to the
+    backend that is current when it arrives; a kept-alive backend
+    connection is only reused while its port is still current, and idle
+    ones are closed on a switch, so a retiring backend drains as soon as
+    its in-flight responses are done. While no backend is set (the server
+    crashed and its replacement is starting) new requests wait up to
+    `backend_wait` seconds instead of being refused. Upgrade requests
+    (websockets, Vite's HMR) become a byte tunnel to one backend.
+    """
+
+    def __init__(self, port, host=None, backend_wait=BACKEND_WAIT, log=None):
+        self.port = port
+        self.host = host
+        self.backend_wait = backend_wait
+        self.log = log or print
+        self.backend = None
+        self.active = collections.Counter()
+        self.connections = 0
+        self._idle = set()
+        self._server = None
+        self._backend_ready = None
+
+    async def start(self):
+        self._backend_ready = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  reuse_address=True)
+        self.log(f"Proxy listening on port {self.port}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def switch(self, port):
+        """Send new requests to `port`; requests in flight finish where they are"""
+        previous, self.backend = self.backend, port
+        self._backend_ready.set()
+        self._close_idle()
+        if previous != port:
+            self.log(f"Proxy: port {self.port} now forwards to {port}")
+
+    def detach(self, port):
+        """Stop sending new requests to `port` until the next switch()"""
+        if self.backend == port:
+            self.backend = None
+            self._backend_ready.clear()
+            self._close_idle()
+
+    async def drain(self, port, timeout):
+        """Wait for connections to `port` to finish; return how many remain"""
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while self.active[port] and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        return self.active[port]
+
+    async def _backend_port(self):
+        if self.backend is None:
+            await asyncio.wait_for(self._backend_ready.wait(), self.backend_wait)
+        return self.backend
+
+    def _close_idle(self):
+        """Close kept-alive backend connections that are no longer current"""
+        for backend in [b for b in self._idle if b.port != self.backend]:
+            self._close_backend(backend)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        backend = None
+        try:
+            while True:
+                try:
+                    start_line, headers = await asyncio.wait_for(read_head(reader), IDLE_TIMEOUT)
+                    method, target, version = start_line.split(' ', 2)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        asyncio.LimitOverrunError, ValueError, ConnectionError):
+                    break
+                self._idle.discard(backend)
+                keep_alive = self._keep_alive(version, headers)
+
+                if header(headers, 'upgrade'):
+                    if backend:
+                        self._close_backend(backend)
+                        backend = None
+                    port = await self._backend_port()
+                    backend_reader, backend_writer = await asyncio.open_connection(BACKEND_HOST, port)
+                    backend_writer.write(encode_head(start_line, headers))
+                    await self.forward(reader, writer, backend_reader, backend_writer, port)
+                    return
+
+                if (header(headers, 'expect') or '').lower() == '100-continue':
+                    # Answered here, since the body is read before a backend is picked
+                    writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                    headers = [(name, value) for name, value in headers
+                               if name.lower() != 'expect']
+                body = b''.join([raw async for raw, _ in iter_body(reader, headers)])
+                backend, backend_open = await self._serve(method, target, start_line, headers,
+                                                          body, writer, keep_alive, backend)
+                if backend and not backend_open:
+                    self._close_backend(backend)
+                    backend = None
+                if not keep_alive:
+                    break
+                if backend:
+                    if backend.port != self.backend:
+                        # Switched while this response was in flight
+                        self._close_backend(backend)
+                        backend = None
+                    else:
+                        self._idle.add(backend)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, OSError,
+                BackendClosed):
+            pass
+        finally:
+            if backend:
+                self._close_backend(backend)
+            writer.close()
+
+    async def _serve(self, method, target, start_line, headers, body, writer, keep_alive,
+                     backend):
+        """Answer one request; return (backend connection, whether it can be reused)"""
+        return await self._exchange(backend, encode_head(start_line, headers) + body,
+                                    method, writer)
+
+    async def _connect(self):
+        port = await self._backend_port()
+        backend_reader, backend_writer = await asyncio.open_connection(BACKEND_HOST, port)
+        self.active[port] += 1
+        return BackendConnection(port, backend_reader, backend_writer)
+
+    async def _exchange(self, backend, request, method, writer, tap=None):
+        """Send one request and relay its response; return (backend, reusable)
+
+        The backend connection is reused unless the proxy switched ports.
+        On failure it is closed before the exception propagates.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + RETRY_WAIT
+        while True:
+            if backend and (backend.closed or backend.port != self.backend
+                            or backend.writer.is_closing()):
+                self._close_backend(backend)
+                backend = None
+            if backend is None:
+                try:
+                    backend = await self._connect()
+                except OSError:
+                    # Refused: the instance is exiting and the proxy has not
+                    # switched away from it yet; nothing was sent
+                    if loop.time() >= deadline:
+                        raise
+                    await asyncio.sleep(0.2)
+                    continue
+            backend.writer.write(request)
+            try:
+                return backend, await self._relay_response(method, backend, writer, tap)
+            except BackendClosed:
+                # A reused connection timed out or the instance crashed
+                # mid-request; nothing reached the client yet, so an
+                # idempotent request is retried on the (replacement) backend
+                self._close_backend(backend)
+                backend = None
+                if method not in IDEMPOTENT_METHODS or loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.2)
+            except BaseException:
+                self._close_backend(backend)
+                raise
+
+    def _close_backend(self, backend):
+        self._idle.discard(backend)
+        if not backend.closed:
+            backend.closed = True
+            self.active[backend.port] -= 1
+            backend.writer.close()
+
+    async def _relay_response(self, method, backend, writer, tap=None):
+        """Stream the response to the client, showing it to `tap` on the way
+
+        Returns False when the backend connection cannot be reused.
+        """
+        try:
+            status_line, headers = await read_head(backend.reader)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            raise BackendClosed() from e
+        status = int(status_line.split(' ', 2)[1])
+        if 100 <= status < 200 and status != 101:
+            # An interim response (102 Processing); the real one follows
+            writer.write(encode_head(status_line, headers))
+            return await self._relay_response(method, backend, writer, tap)
+        out_headers = tap.start(status, status_line, headers) if tap else headers
+        writer.write(encode_head(status_line, out_headers))
+
+        has_body = method != 'HEAD' and status not in (204, 304) and status >= 200
+        delimited = (header(headers, 'content-length') is not None
+                     or header(headers, 'transfer-encoding') is not None)
+        if has_body:
+            async for raw, decoded in iter_body(backend.reader, headers, until_eof=not delimited):
+                writer.write(raw)
+                await writer.drain()
+                if tap:
+                    tap.feed(decoded)
+        await writer.drain()
+        if tap:
+            tap.finish()
+
+        if (header(headers, 'connection') or '').lower() == 'close':
+            return False
+        # A body that ran to EOF means the backend closed the connection
+        return delimited or not has_body
+
+    @staticmethod
+    def _keep_alive(version, headers):
+        connection = (header(headers, 'connection') or '').lower()
+        if version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    async def forward(self, reader, writer, backend_reader, backend_writer, port):
+        """Copy bytes both ways until both directions have closed"""
+        self.active[port] += 1
+        try:
+            await asyncio.gather(self._pipe(reader, backend_writer),
+                                 self._pipe(backend_reader, writer))
+        finally:
+            self.active[port] -= 1
+            for stream in (writer, backend_writer):
+                stream.close()
+
+    @staticmethod
+    async def _pipe(reader, writer):
+        try:
+            while True:
+                data = await reader.read(BUFFER_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+            # Pass the half-close on so the other side sees end of request
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError, RuntimeError):
+            writer.close()
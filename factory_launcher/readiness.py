@@ -0,0 +1,183 @@
+"""
+Readiness probing for the application ports
+Polls the Vite (5173) and Express (3000) ports until they answer
+"""
+
+import asyncio
+import errno
+import http.client
+import select
+import socket
+import time
+
+CLIENT_PORT = 5173
+SERVER_PORT = 3000
+DEFAULT_PORTS = (CLIENT_PORT, SERVER_PORT)
+
+# Windows reports an in-progress non-blocking connect as WSAEWOULDBLOCK
+_CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY,
+                    getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)}
+
+
+def tcp_check(host, port, timeout=0.5):
+    """Return True if a TCP connection to host:port succeeds within timeout"""
+    try:
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        return False
+
+    # "localhost" may resolve to both ::1 and 127.0.0.1; Vite on newer Node
+    # versions only listens on one of them, so try every address.
+    for family, socktype, proto, _, sockaddr in addresses:
+        sock = socket.socket(family, socktype, proto)
+        sock.setblocking(False)
+        try:
+            err = sock.connect_ex(sockaddr)
+            if err in _CONNECT_PENDING:
+                _, writable, _ = select.select([], [sock], [sock], timeout)
+                if not writable:
+                    continue
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err == 0:
+                return True
+        except OSError:
+            continue
+        finally:
+            sock.close()
+    return False
+
+
+def http_check(host, port, path='/', timeout=1.0):
+    """Return True if an HTTP server on host:port answers a HEAD request"""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('HEAD', path)
+        conn.getresponse()
+        # Any status code means the server is up and handling requests
+        return True
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+
+async def check_port_async(host, port, use_http=True, timeout=1.0):
+    """Non-blocking equivalent of tcp_check followed by http_check"""
+    writer = None
+    try:
+        # open_connection tries every address "localhost" resolves to
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        if not use_http:
+            return True
+        writer.write(f"HEAD / HTTP/1.0\r\nHost: {host}:{port}\r\n\r\n".encode('ascii'))
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        # Any status code means the server is up and handling requests
+        return status_line.startswith(b'HTTP/')
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        if writer:
+            writer.close()
+
+
+class ReadinessProbe:
+    """Wait for a set of local ports to answer, with exponential backoff"""
+
+    def __init__(self, ports=DEFAULT_PORTS, host='localhost', timeout=180.0,
+                 initial_delay=0.1, max_delay=2.0, use_http=True, log=None):
+        self.ports = tuple(ports)
+        self.host = host
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.use_http = use_http
+        self.log = log or (lambda message: None)
+        self.ready_times = {}
+        self.started = None
+        self.elapsed = None
+        self._cancelled = False
+
+    def cancel(self):
+        """Stop waiting; wait() returns False on its next iteration"""
+        self._cancelled = True
+
+    def check_port(self, port):
+        """Check a single port; the TCP check gates the more expensive HTTP one"""
+        if not tcp_check(self.host, port):
+            return False
+        if self.use_http:
+            return http_check(self.host, port)
+        return True
+
+    def wait(self):
+        """Block until every port is ready; return True on success"""
+        start = self.started = time.monotonic()
+        deadline = start + self.timeout
+        delay = self.initial_delay
+        pending = list(self.ports)
+
+        while pending and not self._cancelled:
+            for port in pending[:]:
+                if self.check_port(port):
+                    self.ready_times[port] = time.monotonic() - start
+                    pending.remove(port)
+                    self.log(f"Port {port} ready after {self.ready_times[port]:.1f}s")
+
+            if not pending:
+                break
+
+            now = time.monotonic()
+            if now >= deadline:
+                self.log(f"Timed out after {self.timeout:.0f}s waiting for port(s): "
+                         f"{', '.join(str(p) for p in pending)}")
+                return False
+
+            time.sleep(min(delay, deadline - now))
+            delay = min(delay * 2, self.max_delay)
+
+        if pending:
+            return False
+
+        self.elapsed = time.monotonic() - start
+        return True
+
+    async def wait_async(self):
+        """wait() for an event loop; ports are checked concurrently"""
+        start = self.started = time.monotonic()
+        deadline = start + self.timeout
+        delay = self.initial_delay
+        pending = list(self.ports)
+
+        while pending and not self._cancelled:
+            results = await asyncio.gather(*(check_port_async(self.host, port, self.use_http)
+                                             for port in pending))
+            for port, ready in zip(pending[:], results):
+                if ready:
+                    self.ready_times[port] = time.monotonic() - start
+                    pending.remove(port)
+                    self.log(f"Port {port} ready after {self.ready_times[port]:.1f}s")
+
+            if not pending:
+                break
+
+            now = time.monotonic()
+            if now >= deadline:
+                self.log(f"Timed out after {self.timeout:.0f}s waiting for port(s): "
+                         f"{', '.join(str(p) for p in pending)}")
+                return False
+
+            await asyncio.sleep(min(delay, deadline - now))
+            delay = min(delay * 2, self.max_delay)
+
+        if pending:
+            return False
+
+        self.elapsed = time.monotonic() - start
+        return True
+
+
+def wait_for_app(ports=DEFAULT_PORTS, timeout=180.0, log=None):
+    """Convenience wrapper returning (ready, seconds_to_ready)"""
+    probe = ReadinessProbe(ports=ports, timeout=timeout, log=log)
+    ready = probe.wait()
+    return ready, probe.elapsed
@@ -0,0 +1,89 @@
+"""
+Resource sparklines for the tkinter launchers
+Draws each service's RSS and CPU history from the monitor's sample rings;
+redrawn from the Tk main loop only
+"""
+
+try:
+    import tkinter as tk
+    from tkinter import ttk
+except ImportError:
+    tk = None
+
+REFRESH_MS = 2000
+WIDTH = 300
+HEIGHT = 36
+RSS_COLOR = '#1f77b4'
+CPU_COLOR = '#ff7f0e'
+LIMIT_COLOR = '#d62728'
+
+
+def _points(values, scale, width, height):
+    """Map values to canvas coordinates, newest at the right edge"""
+    if len(values) < 2 or not scale:
+        return []
+    step = width / (len(values) - 1)
+    coords = []
+    for index, value in enumerate(values):
+        coords.extend((index * step, height - 2 - min(value / scale, 1.0) * (height - 4)))
+    return coords
+
+
+class ResourcePanel:
+    """One row per service: latest figures and RSS/CPU sparklines"""
+
+    def __init__(self, parent, get_monitor, refresh_ms=REFRESH_MS):
+        self.frame = ttk.Frame(parent)
+        self.get_monitor = get_monitor
+        self.refresh_ms = refresh_ms
+        self._rows = {}
+        self._running = False
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.frame.after(self.refresh_ms, self._refresh)
+
+    def stop(self):
+        self._running = False
+
+    def _row(self, name):
+        if name not in self._rows:
+            row = len(self._rows)
+            label = ttk.Label(self.frame, text=name, width=44, anchor=tk.W)
+            label.grid(row=row, column=0, sticky=tk.W)
+            canvas = tk.Canvas(self.frame, width=WIDTH, height=HEIGHT,
+                               highlightthickness=1, highlightbackground='#cccccc')
+            canvas.grid(row=row, column=1, padx=(10, 0), pady=2)
+            self._rows[name] = (label, canvas)
+        return self._rows[name]
+
+    def _refresh(self):
+        if not self._running:
+            return
+        monitor = self.get_monitor()
+        if monitor:
+            for name, ring in list(monitor.rings.items()):
+                self._draw(name, ring, monitor.rss_limit_mb)
+        self.frame.after(self.refresh_ms, self._refresh)
+
+    def _draw(self, name, ring, rss_limit_mb):
+        latest = ring.latest()
+        if not latest:
+            return
+        label, canvas = self._row(name)
+        label.config(text=f"{name:<8} CPU {latest['cpu']:5.1f}%  RSS {latest['rss_mb']:6.0f} MB  "
+                          f"fds {latest['fds']:.0f}  threads {latest['threads']:.0f}")
+
+        rss = ring.values('rss_mb')
+        cpu = ring.values('cpu')
+        rss_scale = max(max(rss), rss_limit_mb or 0) * 1.1
+        cpu_scale = max(100.0, max(cpu))
+        canvas.delete('all')
+        if rss_limit_mb:
+            y = HEIGHT - 2 - (rss_limit_mb / rss_scale) * (HEIGHT - 4)
+            canvas.create_line(0, y, WIDTH, y, fill=LIMIT_COLOR, dash=(3, 3))
+        for values, scale, color in ((cpu, cpu_scale, CPU_COLOR), (rss, rss_scale, RSS_COLOR)):
+            coords = _points(values, scale, WIDTH, HEIGHT)
+            if coords:
+                canvas.create_line(*coords, fill=color)
@@ -0,0 +1,346 @@
+"""
+Per-service resource monitor
+Samples CPU%, RSS, open file descriptors and thread count for every
+process in each supervised service's tree into fixed-size rings, and
+alerts on (or restarts) a service whose memory or CPU stays over a threshold
+"""
+
+import array
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from factory_launcher.aio import run_blocking
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+IS_LINUX = sys.platform.startswith('linux')
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_CAPACITY = 300
+# Consecutive samples over the limit before acting, so a GC spike is ignored
+SUSTAINED_SAMPLES = 3
+ALERT_COOLDOWN = 300.0
+
+METRICS = ('cpu', 'rss_mb', 'fds', 'threads')
+
+if IS_LINUX:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class SampleRing:
+    """Fixed-capacity time series backed by one typed array per metric"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.times = array.array('d', [0.0] * capacity)
+        self.series = {name: array.array('f', [0.0] * capacity) for name in METRICS}
+        self.count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def append(self, at, sample):
+        with self._lock:
+            self.times[self._next] = at
+            for name in METRICS:
+                self.series[name][self._next] = sample[name]
+            self._next = (self._next + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def values(self, name):
+        """Return the samples of one metric, oldest first"""
+        with self._lock:
+            data = self.series[name]
+            if self.count < self.capacity:
+                return data[:self.count].tolist()
+            return (data[self._next:] + data[:self._next]).tolist()
+
+    def latest(self):
+        """Return the newest sample as a dict, or None"""
+        with self._lock:
+            if not self.count:
+                return None
+            index = (self._next - 1) % self.capacity
+            return {name: self.series[name][index] for name in METRICS}
+
+
+def _linux_processes():
+    """Return {pid: (ppid, utime+stime ticks, threads, rss pages)} from /proc"""
+    processes = {}
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        # fields[0] is field 3 (state) of proc(5), so field N is fields[N - 3]
+        processes[int(pid)] = (int(fields[1]), int(fields[11]) + int(fields[12]),
+                               int(fields[17]), int(fields[21]))
+    return processes
+
+
+def _descendants(root_pid, parents):
+    """Return root_pid and every pid below it, given {pid: ppid}"""
+    children = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+    tree = []
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        if pid in parents:
+            tree.append(pid)
+            stack.extend(children.get(pid, ()))
+    return tree
+
+
+def _count_fds(pid):
+    try:
+        return len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        return 0
+
+
+def total_memory():
+    """Physical memory in bytes, or None if it cannot be determined"""
+    if psutil:
+        return psutil.virtual_memory().total
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('length', ctypes.c_ulong), ('load', ctypes.c_ulong),
+                        ('total', ctypes.c_ulonglong), ('available', ctypes.c_ulonglong),
+                        ('total_page', ctypes.c_ulonglong), ('available_page', ctypes.c_ulonglong),
+                        ('total_virtual', ctypes.c_ulonglong),
+                        ('available_virtual', ctypes.c_ulonglong),
+                        ('available_extended', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.length = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.total
+        return None
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class TreeSampler:
+    """Turn cumulative CPU time per pid into CPU% between two samples"""
+
+    def __init__(self):
+        self._cpu_seconds = {}
+        self._last_at = None
+
+    def sample(self, roots):
+        """Return {root_pid: sample dict} covering each root's process tree"""
+        now = time.monotonic()
+        elapsed = now - self._last_at if self._last_at else None
+        self._last_at = now
+        if IS_LINUX:
+            return self._sample_linux(roots, elapsed)
+        if psutil:
+            return self._sample_psutil(roots, elapsed)
+        return {}
+
+    def _cpu_percent(self, pid, seconds, elapsed, seen):
+        previous = self._cpu_seconds.get(pid)
+        self._cpu_seconds[pid] = seconds
+        seen.add(pid)
+        if previous is None or not elapsed:
+            return 0.0
+        return max(0.0, (seconds - previous) / elapsed * 100)
+
+    def _sample_linux(self, roots, elapsed):
+        processes = _linux_processes()
+        parents = {pid: info[0] for pid, info in processes.items()}
+        samples = {}
+        seen = set()
+        for root in roots:
+            sample = {'cpu': 0.0, 'rss_mb': 0.0, 'fds': 0, 'threads': 0}
+            for pid in _descendants(root, parents):
+                _, ticks, threads, rss_pages = processes[pid]
+                sample['cpu'] += self._cpu_percent(pid, ticks / CLOCK_TICKS, elapsed, seen)
+                sample['rss_mb'] += rss_pages * PAGE_SIZE / (1024 * 1024)
+                sample['fds'] += _count_fds(pid)
+                sample['threads'] += threads
+            samples[root] = sample
+        self._forget(seen)
+        return samples
+
+    def _sample_psutil(self, roots, elapsed):
+        samples = {}
+        seen = set()
+        for root in roots:
+            sample = {'cpu': 0.0, 'rss_mb': 0.0, 'fds': 0, 'threads': 0}
+            try:
+                parent = psutil.Process(root)
+                tree = [parent] + parent.children(recursive=True)
+            except psutil.Error:
+                continue
+            for process in tree:
+                try:
+                    with process.oneshot():
+                        times = process.cpu_times()
+                        sample['cpu'] += self._cpu_percent(process.pid, times.user + times.system,
+                                                           elapsed, seen)
+                        sample['rss_mb'] += process.memory_info().rss / (1024 * 1024)
+                        sample['threads'] += process.num_threads()
+                        sample['fds'] += (process.num_handles() if os.name == 'nt'
+                                          else process.num_fds())
+                except psutil.Error:
+                    continue
+            samples[root] = sample
+        self._forget(seen)
+        return samples
+
+    def _forget(self, seen):
+        for pid in list(self._cpu_seconds):
+            if pid not in seen:
+                del self._cpu_seconds[pid]
+
+
+class ResourceMonitor:
+    """Sample every supervised service periodically and watch its RSS and CPU
+
+    The RSS limit (FACTORY_RSS_LIMIT_MB) and CPU limit (FACTORY_CPU_LIMIT,
+    in percent of one core) are checked against the whole process tree; 0
+    disables either. FACTORY_RSS_ACTION=restart restarts a service over the
+    RSS limit through the supervisor; the default only raises an alert.
+    `on_alert(service, message, metric)` hears about both.
+    """
+
+    def __init__(self, supervisor, interval=None, capacity=DEFAULT_CAPACITY,
+                 rss_limit_mb=None, action=None, log=None, on_alert=None, cpu_limit=None):
+        self.supervisor = supervisor
+        self.interval = interval or _env_float('FACTORY_MONITOR_INTERVAL', DEFAULT_INTERVAL)
+        self.capacity = capacity
+        self.rss_limit_mb = (rss_limit_mb if rss_limit_mb is not None
+                             else _env_float('FACTORY_RSS_LIMIT_MB', 0))
+        self.cpu_limit = cpu_limit if cpu_limit is not None else _env_float('FACTORY_CPU_LIMIT', 0)
+        self.action = action or os.environ.get('FACTORY_RSS_ACTION', 'alert')
+        self.log = log or print
+        self.on_alert = on_alert
+        self.rings = {}
+        self._sampler = TreeSampler()
+        self._over_limit = {}
+        self._last_alert = {}
+        self._restarts = {}
+        self._task = None
+
+    @property
+    def available(self):
+        return IS_LINUX or psutil is not None
+
+    def start(self):
+        """Start sampling as a task on the running loop"""
+        if not self.available:
+            self.log("Resource monitor needs /proc or the psutil package; not sampling")
+            return None
+        self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in self._restarts.values():
+            task.cancel()
+        self._restarts.clear()
+
+    def ring(self, name):
+        if name not in self.rings:
+            self.rings[name] = SampleRing(self.capacity)
+        return self.rings[name]
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sample_once()
+            except Exception as e:
+                self.log(f"Resource sampling failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sample_once(self):
+        services = {service.process.pid: service
+                    for service in self.supervisor.services.values()
+                    if service.process and service.process.returncode is None}
+        now = time.time()
+        # Walking /proc (or the Windows process list) for every tree is
+        # blocking I/O; keep it off the loop that relays service output
+        samples = await run_blocking(self._sampler.sample, list(services))
+        for pid, sample in samples.items():
+            service = services[pid]
+            self.ring(service.name).append(now, sample)
+            self._check_limits(service, sample)
+
+    def _check_limits(self, service, sample):
+        if self._sustained(service, 'cpu', sample['cpu'], self.cpu_limit):
+            message = (f"[{service.name}] CPU {sample['cpu']:.0f}% is over the "
+                       f"{self.cpu_limit:.0f}% limit")
+            self.log(message)
+            if self.on_alert:
+                self.on_alert(service, message, 'cpu')
+        if self._sustained(service, 'rss_mb', sample['rss_mb'], self.rss_limit_mb):
+            message = (f"[{service.name}] memory {sample['rss_mb']:.0f} MB is over the "
+                       f"{self.rss_limit_mb:.0f} MB limit")
+            if self.on_alert:
+                self.on_alert(service, message, 'rss_mb')
+            if self.action == 'restart':
+                if self._restart(service):
+                    self.log(f"{message}; restarting")
+                else:
+                    self.log(f"{message}; a restart is already under way")
+            else:
+                self.log(message)
+
+    def _restart(self, service):
+        """Restart `service` in the background; False if one is already running"""
+        # A restart waits for the old process to exit and the new one to
+        # start; sampling the other services carries on meanwhile
+        task = self._restarts.get(service.name)
+        if task and not task.done():
+            return False
+        self._restarts[service.name] = asyncio.ensure_future(self._run_restart(service))
+        return True
+
+    async def _run_restart(self, service):
+        try:
+            await service.restart()
+        except Exception as e:
+            self.log(f"[{service.name}] restart failed: {e}")
+        finally:
+            self._restarts.pop(service.name, None)
+
+    def _sustained(self, service, metric, value, limit):
+        """True once `value` has stayed over `limit`, at most once per cooldown"""
+        key = (service.name, metric)
+        if not limit or value < limit:
+            self._over_limit[key] = 0
+            return False
+        count = self._over_limit.get(key, 0) + 1
+        self._over_limit[key] = count
+        if count < SUSTAINED_SAMPLES:
+            return False
+        if time.monotonic() - self._last_alert.get(key, -ALERT_COOLDOWN) < ALERT_COOLDOWN:
+            return False
+        self._last_alert[key] = time.monotonic()
+        self._over_limit[key] = 0
+        return True
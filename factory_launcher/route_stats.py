@@ -0,0 +1,296 @@
+"""
+Per-route request analytics from the server's morgan lines
+Parses `GET /v1/sales/64f... 200 - 12.3 ms` into records, maps each URL to
+its Express route template and keeps counts, error rates and latency
+histograms for the whole session and a rolling window
+
+Print the last session's table, or analyse saved logs:
+    python3 cross-platform-launcher.py --report [server.log ...]
+"""
+
+import collections
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from factory_launcher.bench import LatencyHistogram
+from factory_launcher.paths import user_cache_dir
+
+WINDOW_SECONDS = 600
+SLOT_SECONDS = 60
+MAX_ROUTES = 200
+SAVE_INTERVAL = 60
+OTHER_ROUTE = '(other)'
+
+# morgan's ":method :url :status - :response-time ms", behind winston's
+# "level: " and, in production, ":remote-addr - "
+REQUEST_RE = re.compile(
+    r'\b(?P<method>GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS) (?P<url>/\S*) '
+    r'(?P<status>\d{3}) - (?P<ms>\d+(?:\.\d+)?) ms(?: - message: (?P<message>.*))?$'
+)
+
+MOUNT_RE = re.compile(r"path:\s*'([^']+)',\s*route:\s*(\w+)")
+REQUIRE_RE = re.compile(r"const\s+(\w+)\s*=\s*require\('\./([\w.]+)'\)")
+ROUTE_RE = re.compile(r"\.route\('([^']*)'\)|router\.(?:get|post|put|patch|delete)\('([^']*)'")
+# Path segments that are ids even when no route file describes them
+ID_SEGMENT_RE = re.compile(r'^(?:[0-9a-fA-F]{24}|\d+|[0-9a-fA-F-]{36})$')
+
+def stats_path():
+    """Where the launcher keeps the current session's summary"""
+    return user_cache_dir() / 'route-stats.json'
+
+
+RequestRecord = collections.namedtuple('RequestRecord', 'method url path status ms message')
+
+
+def parse_request_line(line):
+    """Return a RequestRecord for a morgan request line, or None"""
+    match = REQUEST_RE.search(line)
+    if not match:
+        return None
+    url = match.group('url')
+    return RequestRecord(match.group('method'), url, url.split('?', 1)[0],
+                         int(match.group('status')), float(match.group('ms')),
+                         match.group('message'))
+
+
+class CompactHistogram(LatencyHistogram):
+    """LatencyHistogram with 16 buckets per power of two (~6% error, ~3 KB)"""
+
+    SUB_BITS = 5
+    SUB_COUNT = 1 << SUB_BITS
+    HALF = SUB_COUNT >> 1
+    MAX_VALUE = 600 * 1000 * 1000
+
+
+class RouteTable:
+    """Express route templates, most specific match first"""
+
+    def __init__(self, templates=()):
+        self.templates = sorted(set(templates))
+        self._tree = {}
+        for template in self.templates:
+            node = self._tree
+            for segment in template.strip('/').split('/'):
+                key = ':' if segment.startswith(':') else segment
+                node = node.setdefault(key, {})
+                if key == ':':
+                    node.setdefault('name', segment)
+            node['template'] = template
+
+    @classmethod
+    def from_server(cls, app_dir, prefix='/v1'):
+        """Read the mounts in routes/v1/index.js and each router's paths"""
+        routes_dir = Path(app_dir, 'server', 'src', 'routes', 'v1')
+        try:
+            index = (routes_dir / 'index.js').read_text(encoding='utf-8')
+        except OSError:
+            return cls()
+        modules = dict(REQUIRE_RE.findall(index))
+        templates = []
+        for mount, variable in MOUNT_RE.findall(index):
+            try:
+                source = (routes_dir / f"{modules[variable]}.js").read_text(encoding='utf-8')
+            except (KeyError, OSError):
+                continue
+            for route, verb_path in ROUTE_RE.findall(source):
+                path = route or verb_path
+                templates.append(prefix + mount + ('' if path == '/' else path))
+        return cls(templates)
+
+    def match(self, path):
+        """Return the template for a URL path, or a generic one with ids collapsed"""
+        segments = path.strip('/').split('/')
+        found = self._match(self._tree, segments)
+        if found:
+            return found
+        return '/' + '/'.join(':id' if ID_SEGMENT_RE.match(s) else s for s in segments)
+
+    def _match(self, node, segments):
+        if not segments:
+            return node.get('template')
+        head, rest = segments[0], segments[1:]
+        # Static segments win over parameters, so /sales/date is not /sales/:saleId
+        if head in node and head != ':':
+            found = self._match(node[head], rest)
+            if found:
+                return found
+        if ':' in node and head:
+            return self._match(node[':'], rest)
+        return None
+
+
+class RouteStats:
+    """Counters and histograms for one method + route template"""
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.histogram = CompactHistogram()
+        self.client_errors = 0
+        self.server_errors = 0
+        # slot number -> [requests, errors, histogram] for the rolling window
+        self.slots = collections.OrderedDict()
+
+    def add(self, record, now):
+        micros = record.ms * 1000
+        self.histogram.record(micros)
+        is_error = record.status >= 400
+        if record.status >= 500:
+            self.server_errors += 1
+        elif is_error:
+            self.client_errors += 1
+        slot = int(now // SLOT_SECONDS)
+        if slot not in self.slots:
+            self.slots[slot] = [0, 0, CompactHistogram()]
+            self.expire(now)
+        entry = self.slots[slot]
+        entry[0] += 1
+        entry[1] += is_error
+        entry[2].record(micros)
+
+    def expire(self, now):
+        oldest = int((now - WINDOW_SECONDS) // SLOT_SECONDS)
+        while self.slots and next(iter(self.slots)) <= oldest:
+            self.slots.popitem(last=False)
+
+    def summary(self, window=False):
+        """Return a plain dict of counts and latencies (ms)"""
+        if window:
+            histogram = CompactHistogram()
+            errors = 0
+            for _, slot_errors, slot_histogram in self.slots.values():
+                histogram.merge(slot_histogram)
+                errors += slot_errors
+        else:
+            histogram = self.histogram
+            errors = self.client_errors + self.server_errors
+        count = histogram.count
+        return {
+            'method': self.method, 'route': self.route, 'count': count,
+            'error_rate': errors / count if count else 0.0,
+            'server_errors': self.server_errors,
+            'p50_ms': histogram.percentile(50) / 1000,
+            'p95_ms': histogram.percentile(95) / 1000,
+            'p99_ms': histogram.percentile(99) / 1000,
+            'max_ms': histogram.max / 1000,
+            'total_ms': histogram.total / 1000,
+        }
+
+
+class RouteStatsStore:
+    """Thread-safe per-route statistics fed one log line at a time
+
+    Lines arrive on the event loop; the GUI reads summaries from the Tk thread.
+    """
+
+    def __init__(self, routes=None, max_routes=MAX_ROUTES, path=None):
+        self.routes = routes or RouteTable()
+        self.max_routes = max_routes
+        # Only a store with a path saves its summary for `--report`
+        self.path = path
+        self.stats = {}
+        self.requests = 0
+        self.started = time.time()
+        self._saved_at = self.started
+        self._lock = threading.Lock()
+
+    def feed(self, line, now=None):
+        """Record the line if it is a request line; return the record or None"""
+        record = parse_request_line(line)
+        if record:
+            self.add(record, now)
+        return record
+
+    def add(self, record, now=None):
+        now = time.time() if now is None else now
+        route = self.routes.match(record.path)
+        key = (record.method, route)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                # Bound memory when URLs do not collapse into templates
+                if len(self.stats) >= self.max_routes:
+                    key = (record.method, OTHER_ROUTE)
+                    stats = self.stats.get(key)
+                if stats is None:
+                    stats = self.stats[key] = RouteStats(*key)
+            stats.add(record, now)
+            self.requests += 1
+        # Saved now and then so `--report` also works while the app runs
+        if self.path and now - self._saved_at >= SAVE_INTERVAL:
+            self._saved_at = now
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def top(self, count=10, key='p95_ms', window=True, now=None):
+        """Return route summaries sorted by `key`, highest first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for stats in self.stats.values():
+                stats.expire(now)
+            rows = [stats.summary(window) for stats in self.stats.values()]
+        rows = [row for row in rows if row['count']]
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:count]
+
+    def save(self):
+        """Write the session summary for `--report`"""
+        data = {'started': self.started, 'saved': time.time(), 'requests': self.requests,
+                'routes': self.top(count=len(self.stats), key='total_ms', window=False)}
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def format_table(rows):
+    """Text table of route summaries"""
+    total = sum(row['total_ms'] for row in rows) or 1
+    lines = [f"{'Method':<7} {'Route':<40} {'Count':>8} {'Err%':>6} {'p50':>8} "
+             f"{'p95':>8} {'p99':>8} {'Max':>8} {'Time%':>6}"]
+    for row in rows:
+        lines.append(f"{row['method']:<7} {row['route'][:40]:<40} {row['count']:>8} "
+                     f"{row['error_rate'] * 100:>5.1f}% {row['p50_ms']:>8.1f} "
+                     f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} "
+                     f"{row['total_ms'] / total * 100:>5.1f}%")
+    return "\n".join(lines)
+
+
+def _read_lines(path):
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        yield from f
+
+
+def report(app_dir, files=(), out=print):
+    """Print per-route statistics from log files, or from the last session"""
+    if files:
+        store = RouteStatsStore(RouteTable.from_server(app_dir))
+        for path in files:
+            try:
+                for line in _read_lines(path):
+                    store.feed(line.rstrip('\n'))
+            except OSError as e:
+                out(f"Could not read {path}: {e}")
+                return 1
+        rows = store.top(count=len(store.stats), key='total_ms', window=False)
+        out(f"{store.requests} requests in {len(files)} file(s)")
+    else:
+        try:
+            with open(stats_path(), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            out("No request statistics recorded yet; start the app or pass log files")
+            return 1
+        rows = data['routes']
+        started = time.strftime('%Y-%m-%d %H:%M', time.localtime(data['started']))
+        out(f"{data['requests']} requests since {started} (latencies in ms, by total time)")
+    out(format_table(rows))
+    return 0
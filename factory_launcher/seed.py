@@ -0,0 +1,364 @@
+"""
+Synthetic dataset generator
+Bulk-loads consistent customers, suppliers, products, sales, purchases,
+transactions and roznamcha entries matching server/src/models, so every
+benchmark starts from the same data
+
+Run it through the launcher:
+    python3 cross-platform-launcher.py seed --preset medium --seed 42 --drop
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+try:
+    import bson
+    import pymongo
+except ImportError:
+    pymongo = None
+
+DEFAULT_URL = 'mongodb://localhost:27017/factory'
+# Documents per job; fixed so the output does not depend on the worker count
+CHUNK_SIZE = 20000
+BATCH_SIZE = 5000
+FIRST_INVOICE = 5001
+
+PRESETS = {
+    'small': {'customers': 500, 'suppliers': 50, 'products': 300, 'sales': 20000,
+              'purchases': 5000, 'transactions': 10000, 'roznamcha': 5000},
+    'medium': {'customers': 5000, 'suppliers': 500, 'products': 2000, 'sales': 1000000,
+               'purchases': 200000, 'transactions': 500000, 'roznamcha': 300000},
+    'large': {'customers': 20000, 'suppliers': 2000, 'products': 10000, 'sales': 5000000,
+              'purchases': 1000000, 'transactions': 2000000, 'roznamcha': 1000000},
+}
+
+# Load order: referenced collections come first
+COLLECTIONS = ('customers', 'suppliers', 'accounts', 'products', 'sales', 'purchases',
+               'transactions', 'roznamcha')
+# Mongoose model name -> collection name (pluralized by mongoose)
+COLLECTION_NAMES = {'roznamcha': 'roznamchas'}
+# ObjectId collection codes; embedded sale/purchase items get their own
+KIND_CODES = {name: index + 1
+              for index, name in enumerate(COLLECTIONS + ('sale_items', 'purchase_items'))}
+
+FIRST_NAMES = ('Ahmed', 'Ali', 'Bilal', 'Fatima', 'Hassan', 'Imran', 'Junaid', 'Kamran',
+               'Maryam', 'Nadia', 'Omar', 'Rashid', 'Saad', 'Sana', 'Usman', 'Zainab')
+LAST_NAMES = ('Khan', 'Malik', 'Butt', 'Sheikh', 'Chaudhry', 'Qureshi', 'Raza', 'Siddiqui')
+CITIES = ('Lahore', 'Karachi', 'Faisalabad', 'Multan', 'Sialkot', 'Gujranwala', 'Rawalpindi')
+CATEGORIES = ('Fabric', 'Thread', 'Dye', 'Buttons', 'Packaging', 'Spare Parts', 'Chemicals')
+ITEMS = ('Cotton Roll', 'Polyester Yarn', 'Reactive Dye', 'Zip', 'Carton', 'Needle Set',
+         'Bleach', 'Lawn Sheet', 'Denim Roll', 'Label Pack')
+EXPENSES = ('Electricity bill', 'Labour wages', 'Diesel', 'Rent', 'Tea and refreshments',
+            'Machine repair', 'Transport', 'Cash received from counter', 'Bank deposit')
+
+
+class Encoder:
+    """How ids and dates are represented: BSON for inserts, Extended JSON for files"""
+
+    def __init__(self, extended_json=False):
+        self.extended_json = extended_json
+
+    def oid(self, kind, index):
+        # Deterministic ObjectId: fixed timestamp, collection code, record index,
+        # so references resolve without any worker knowing another's output
+        raw = (1577836800).to_bytes(4, 'big') + bytes([KIND_CODES[kind]]) + index.to_bytes(7, 'big')
+        if self.extended_json:
+            return {'$oid': raw.hex()}
+        return bson.ObjectId(raw)
+
+    def date(self, value):
+        if self.extended_json:
+            return {'$date': value.strftime('%Y-%m-%dT%H:%M:%S.000Z')}
+        return value
+
+
+class Dataset:
+    """Pure functions from (seed, collection, index) to documents"""
+
+    def __init__(self, seed, counts, years, encoder):
+        self.seed = seed
+        self.counts = counts
+        self.encoder = encoder
+        self.end = datetime.datetime(2026, 1, 1)
+        self.start = self.end - datetime.timedelta(days=365 * years)
+        self._prices = None
+
+    def _rng(self, kind, chunk):
+        return random.Random(f"{self.seed}:{kind}:{chunk}")
+
+    def _date(self, kind, index, rng):
+        # Spread records evenly over the period so invoice numbers follow dates
+        span = (self.end - self.start).total_seconds()
+        offset = span * index / max(1, self.counts[kind]) + rng.uniform(0, 3600)
+        return self.start + datetime.timedelta(seconds=min(offset, span - 1))
+
+    def prices(self):
+        """(price, cost) per product index, shared by products, sales and purchases"""
+        if self._prices is None:
+            rng = random.Random(f"{self.seed}:prices")
+            self._prices = []
+            for _ in range(self.counts['products']):
+                cost = round(rng.uniform(20, 5000), 2)
+                self._prices.append((round(cost * rng.uniform(1.05, 1.6), 2), cost))
+        return self._prices
+
+    def _person(self, rng):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        phone = f"03{rng.randrange(0, 10)}{rng.randrange(10000000, 99999999)}"
+        return name, phone
+
+    def _stamped(self, doc, when):
+        stamp = self.encoder.date(when)
+        doc['createdAt'] = stamp
+        doc['updatedAt'] = stamp
+        doc['__v'] = 0
+        return doc
+
+    def customers(self, index, rng):
+        name, phone = self._person(rng)
+        return self._stamped({
+            '_id': self.encoder.oid('customers', index), 'name': f"{name} {index}",
+            'email': f"customer{index}@example.com", 'phone': phone, 'whatsapp': phone,
+            'address': rng.choice(CITIES),
+        }, self.start)
+
+    def suppliers(self, index, rng):
+        name, phone = self._person(rng)
+        return self._stamped({
+            '_id': self.encoder.oid('suppliers', index), 'name': f"{name} Traders {index}",
+            'email': f"supplier{index}@example.com", 'phone': phone, 'whatsapp': phone,
+            'address': rng.choice(CITIES),
+        }, self.start)
+
+    def accounts(self, index, rng):
+        # One receivable account per customer, then one payable per supplier
+        customers = self.counts['customers']
+        if index < customers:
+            party = {'type': 'receivable', 'customer': self.encoder.oid('customers', index),
+                     'supplier': None, 'transactionType': 'cashReceived'}
+        else:
+            party = {'type': 'payable', 'customer': None,
+                     'supplier': self.encoder.oid('suppliers', index - customers),
+                     'transactionType': 'expenseVoucher'}
+        return self._stamped(dict(party, _id=self.encoder.oid('accounts', index),
+                                  name=f"Account {index}", balance=0), self.start)
+
+    def products(self, index, rng):
+        price, cost = self.prices()[index]
+        return self._stamped({
+            '_id': self.encoder.oid('products', index),
+            'name': f"{rng.choice(ITEMS)} {index}", 'description': '',
+            'price': price, 'cost': cost, 'stockQuantity': rng.randrange(0, 2000),
+            'sku': f"SKU-{index:06d}", 'category': rng.choice(CATEGORIES),
+            'supplier': self.encoder.oid('suppliers', rng.randrange(self.counts['suppliers'])),
+        }, self.start)
+
+    def sales(self, index, rng):
+        prices = self.prices()
+        items = []
+        for product in rng.sample(range(len(prices)), min(len(prices), rng.randint(1, 5))):
+            price, cost = prices[product]
+            quantity = rng.randint(1, 20)
+            items.append({'_id': self.encoder.oid('sale_items', index * 8 + len(items)),
+                          'product': self.encoder.oid('products', product), 'quantity': quantity,
+                          'priceAtSale': price, 'purchasePrice': cost,
+                          'total': round(price * quantity, 2),
+                          'profit': round((price - cost) * quantity, 2)})
+        when = self._date('sales', index, rng)
+        return self._stamped({
+            '_id': self.encoder.oid('sales', index),
+            'customer': self.encoder.oid('customers', rng.randrange(self.counts['customers'])),
+            'invoiceNumber': f"INV-{FIRST_INVOICE + index}", 'items': items,
+            'saleDate': self.encoder.date(when),
+            'totalAmount': round(sum(item['total'] for item in items), 2),
+            'totalProfit': round(sum(item['profit'] for item in items), 2),
+            'paymentStatus': 'paid' if rng.random() < 0.8 else 'pending', 'status': True,
+        }, when)
+
+    def purchases(self, index, rng):
+        prices = self.prices()
+        items = []
+        for product in rng.sample(range(len(prices)), min(len(prices), rng.randint(1, 4))):
+            cost = prices[product][1]
+            quantity = rng.randint(10, 500)
+            items.append({'_id': self.encoder.oid('purchase_items', index * 8 + len(items)),
+                          'product': self.encoder.oid('products', product), 'quantity': quantity,
+                          'priceAtPurchase': cost, 'total': round(cost * quantity, 2)})
+        when = self._date('purchases', index, rng)
+        return self._stamped({
+            '_id': self.encoder.oid('purchases', index),
+            'supplier': self.encoder.oid('suppliers', rng.randrange(self.counts['suppliers'])),
+            'invoiceNumber': f"INV-{FIRST_INVOICE + index}", 'items': items,
+            'purchaseDate': self.encoder.date(when),
+            'totalAmount': round(sum(item['total'] for item in items), 2), 'status': True,
+        }, when)
+
+    def transactions(self, index, rng):
+        # Same debit/credit rule as transactionService.createTransaction
+        kind = 'cashReceived' if rng.random() < 0.55 else 'expenseVoucher'
+        amount = round(rng.uniform(500, 250000), 2)
+        when = self._date('transactions', index, rng)
+        return self._stamped({
+            '_id': self.encoder.oid('transactions', index),
+            'account': self.encoder.oid('suppliers', rng.randrange(self.counts['suppliers'])),
+            'amount': amount, 'transactionType': kind,
+            'transactionDate': self.encoder.date(when), 'description': rng.choice(EXPENSES),
+            'status': 'completed', 'debit': amount if kind == 'cashReceived' else 0,
+            'credit': amount if kind == 'expenseVoucher' else 0,
+        }, when)
+
+    def roznamcha(self, index, rng):
+        kind = 'cashReceived' if rng.random() < 0.5 else 'expenseVoucher'
+        amount = round(rng.uniform(100, 100000), 2)
+        when = self._date('roznamcha', index, rng)
+        return self._stamped({
+            '_id': self.encoder.oid('roznamcha', index), 'description': rng.choice(EXPENSES),
+            'transactionType': kind, 'status': 'completed',
+            'debit': amount if kind == 'cashReceived' else 0,
+            'credit': amount if kind == 'expenseVoucher' else 0,
+            'entryDate': self.encoder.date(when), 'referenceNumber': f"RZ-{index + 1}",
+        }, when)
+
+    def chunk(self, kind, chunk):
+        """Generate the documents of one chunk of a collection"""
+        rng = self._rng(kind, chunk)
+        make = getattr(self, kind)
+        start = chunk * CHUNK_SIZE
+        end = min(start + CHUNK_SIZE, self.counts[kind])
+        return [make(index, rng) for index in range(start, end)]
+
+
+def plan_counts(preset, overrides):
+    counts = dict(PRESETS[preset])
+    counts.update({name: value for name, value in overrides.items() if value is not None})
+    counts['accounts'] = counts['customers'] + counts['suppliers']
+    return counts
+
+
+def plan_jobs(counts):
+    jobs = []
+    for kind in COLLECTIONS:
+        chunks = (counts[kind] + CHUNK_SIZE - 1) // CHUNK_SIZE
+        jobs.extend((kind, chunk) for chunk in range(chunks))
+    return jobs
+
+
+# Per-process state, set up once by the pool initializer
+_worker = {}
+
+
+def _init_worker(seed, counts, years, url, jsonl_dir):
+    _worker['dataset'] = Dataset(seed, counts, years, Encoder(extended_json=bool(jsonl_dir)))
+    _worker['jsonl_dir'] = jsonl_dir
+    if not jsonl_dir:
+        client = pymongo.MongoClient(url, w=1)
+        _worker['db'] = client.get_default_database()
+
+
+def _run_job(job):
+    kind, chunk = job
+    docs = _worker['dataset'].chunk(kind, chunk)
+    if _worker['jsonl_dir']:
+        path = Path(_worker['jsonl_dir'], f"{COLLECTION_NAMES.get(kind, kind)}-{chunk:05d}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for doc in docs:
+                f.write(json.dumps(doc, separators=(',', ':')))
+                f.write('\n')
+    else:
+        collection = _worker['db'][COLLECTION_NAMES.get(kind, kind)]
+        for start in range(0, len(docs), BATCH_SIZE):
+            collection.insert_many(docs[start:start + BATCH_SIZE], ordered=False,
+                                   bypass_document_validation=True)
+    return kind, len(docs)
+
+
+def _prepare_database(url, drop):
+    db = pymongo.MongoClient(url).get_default_database()
+    if drop:
+        for kind in COLLECTIONS:
+            db.drop_collection(COLLECTION_NAMES.get(kind, kind))
+    return db
+
+
+def _create_indexes(db):
+    # The unique indexes mongoose declares; building them after the bulk
+    # load is much faster than maintaining them during it
+    db.sales.create_index('invoiceNumber', unique=True)
+    db.purchases.create_index('invoiceNumber', unique=True)
+
+
+def generate(counts, seed, years, workers, url=None, jsonl_dir=None, drop=False, log=print):
+    """Generate every collection in parallel; return seconds taken"""
+    db = None
+    if not jsonl_dir:
+        db = _prepare_database(url, drop)
+    else:
+        Path(jsonl_dir).mkdir(parents=True, exist_ok=True)
+
+    start = time.monotonic()
+    done = {kind: 0 for kind in COLLECTIONS}
+    total = sum(counts[kind] for kind in COLLECTIONS)
+    written = 0
+    last_report = start
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(seed, counts, years, url, jsonl_dir)) as pool:
+        for kind, count in pool.imap_unordered(_run_job, plan_jobs(counts)):
+            done[kind] += count
+            written += count
+            now = time.monotonic()
+            if now - last_report >= 5 or written == total:
+                last_report = now
+                log(f"{written:,}/{total:,} documents ({written / (now - start):,.0f}/s)")
+
+    if db is not None:
+        log("Creating indexes...")
+        _create_indexes(db)
+    elapsed = time.monotonic() - start
+    for kind in COLLECTIONS:
+        log(f"  {COLLECTION_NAMES.get(kind, kind):<14} {done[kind]:>12,}")
+    log(f"Generated {total:,} documents in {elapsed:.1f}s")
+    return elapsed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='cross-platform-launcher.py seed',
+                                     description="Load a deterministic synthetic dataset")
+    parser.add_argument('--url', default=os.environ.get('FACTORY_SEED_URL', DEFAULT_URL),
+                        help="MongoDB URL including the database (default %(default)s)")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--years', type=float, default=3, help="period the records span")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--drop', action='store_true', help="drop the collections first")
+    parser.add_argument('--jsonl', metavar='DIR',
+                        help="write Extended JSON files for mongoimport instead of inserting")
+    for name in PRESETS['small']:
+        parser.add_argument(f'--{name}', type=int, help=f"number of {name} (overrides preset)")
+    args = parser.parse_args(argv)
+
+    if not args.jsonl and pymongo is None:
+        print("Inserting into MongoDB needs the pymongo package: pip install pymongo")
+        print("Or write files for mongoimport with --jsonl DIR")
+        return 1
+    if not args.jsonl and 'localhost' not in args.url and '127.0.0.1' not in args.url:
+        print(f"Refusing to seed a non-local database: {args.url}")
+        return 1
+
+    counts = plan_counts(args.preset, {name: getattr(args, name) for name in PRESETS['small']})
+    target = args.jsonl or args.url
+    print(f"Seeding {target} with preset '{args.preset}', seed {args.seed}, "
+          f"{args.workers} worker(s)")
+    generate(counts, args.seed, args.years, args.workers, url=args.url,
+             jsonl_dir=args.jsonl, drop=args.drop)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,324 @@
+"""
+Process-tree-aware shutdown
+Children are started in their own process group so npm, nodemon, node and
+vite can be stopped together, escalating SIGINT -> SIGTERM -> SIGKILL
+"""
+
+import asyncio
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+IS_WINDOWS = os.name == 'nt'
+
+# Seconds to wait after each stage; override with FACTORY_STOP_DEADLINES="5,5,3"
+DEFAULT_DEADLINES = (5.0, 5.0, 3.0)
+POLL_INTERVAL = 0.05
+
+
+def popen_group_kwargs():
+    """Popen arguments that put the child at the head of its own process group"""
+    if IS_WINDOWS:
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+class ShutdownPolicy:
+    """Deadlines for each escalation stage"""
+
+    def __init__(self, interrupt=None, terminate=None, kill=None):
+        defaults = self._from_env()
+        self.interrupt = defaults[0] if interrupt is None else interrupt
+        self.terminate = defaults[1] if terminate is None else terminate
+        self.kill = defaults[2] if kill is None else kill
+
+    @staticmethod
+    def _from_env():
+        value = os.environ.get('FACTORY_STOP_DEADLINES')
+        if value:
+            try:
+                deadlines = tuple(float(part) for part in value.split(','))
+                if len(deadlines) == 3:
+                    return deadlines
+            except ValueError:
+                pass
+        return DEFAULT_DEADLINES
+
+
+class StopResult:
+    """How a process tree was stopped and how long it took"""
+
+    def __init__(self, stage, elapsed, clean):
+        self.stage = stage
+        self.elapsed = elapsed
+        self.clean = clean
+
+    def __str__(self):
+        state = "cleanly" if self.clean else "forcibly"
+        return f"stopped {state} by {self.stage} in {self.elapsed:.2f}s"
+
+
+def _linux_group_alive(pgid):
+    """True if any non-zombie process in /proc belongs to the group"""
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        # fields[0] is the state, fields[2] the process group id
+        if int(fields[2]) == pgid and fields[0] not in (b'Z', b'X'):
+            return True
+    return False
+
+
+def _members_alive(pgid, leader_running):
+    """True while any member of the process group led by pgid exists"""
+    if IS_WINDOWS:
+        return leader_running
+    if sys.platform.startswith('linux'):
+        # Orphaned grandchildren may sit as zombies until init reaps them;
+        # killpg(pgid, 0) would still count those as alive
+        return _linux_group_alive(pgid)
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _group_alive(process):
+    """True while any member of the child's process group exists"""
+    process.poll()  # reap the leader so it does not linger as a zombie
+    return _members_alive(process.pid, process.returncode is None)
+
+
+def _wait_gone(process, deadline):
+    end = time.monotonic() + deadline
+    while time.monotonic() < end:
+        if not _group_alive(process):
+            return True
+        time.sleep(POLL_INTERVAL)
+    return not _group_alive(process)
+
+
+def _send(process, stage):
+    """Deliver one escalation stage to the whole process group"""
+    try:
+        if IS_WINDOWS:
+            if stage == 'SIGINT':
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                args = ['taskkill', '/T', '/PID', str(process.pid)]
+                if stage == 'SIGKILL':
+                    args.insert(1, '/F')
+                subprocess.run(args, capture_output=True)
+        else:
+            os.killpg(process.pid, getattr(signal, stage))
+    except (ProcessLookupError, OSError):
+        pass
+
+
+def stop_process_tree(process, policy=None):
+    """Stop a child and its whole process group; return a StopResult"""
+    policy = policy or ShutdownPolicy()
+    start = time.monotonic()
+    if not _group_alive(process):
+        return StopResult('exit', 0.0, True)
+
+    for stage, deadline in (('SIGINT', policy.interrupt),
+                            ('SIGTERM', policy.terminate),
+                            ('SIGKILL', policy.kill)):
+        _send(process, stage)
+        if _wait_gone(process, deadline):
+            return StopResult(stage, time.monotonic() - start, stage != 'SIGKILL')
+
+    return StopResult('SIGKILL', time.monotonic() - start, False)
+
+
+async def _wait_gone_async(process, deadline):
+    end = time.monotonic() + deadline
+    # The leader's exit is awaited as an event; only grandchildren that
+    # outlive it need polling
+    try:
+        await asyncio.wait_for(process.wait(), deadline)
+    except asyncio.TimeoutError:
+        return not _members_alive(process.pid, True)
+    while time.monotonic() < end:
+        if not _members_alive(process.pid, False):
+            return True
+        await asyncio.sleep(POLL_INTERVAL)
+    return not _members_alive(process.pid, False)
+
+
+async def stop_process_tree_async(process, policy=None):
+    """stop_process_tree for an asyncio.subprocess.Process"""
+    policy = policy or ShutdownPolicy()
+    start = time.monotonic()
+    if not _members_alive(process.pid, process.returncode is None):
+        return StopResult('exit', 0.0, True)
+
+    for stage, deadline in (('SIGINT', policy.interrupt),
+                            ('SIGTERM', policy.terminate),
+                            ('SIGKILL', policy.kill)):
+        _send(process, stage)
+        if await _wait_gone_async(process, deadline):
+            return StopResult(stage, time.monotonic() - start, stage != 'SIGKILL')
+
+    return StopResult('SIGKILL', time.monotonic() - start, False)
+
+
+def _linux_listeners(ports):
+    """Map listening ports to pids by reading /proc/net/tcp and /proc/*/fd"""
+    inodes = {}
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table, 'r') as f:
+                next(f)
+                for row in f:
+                    fields = row.split()
+                    port = int(fields[1].rsplit(':', 1)[1], 16)
+                    # State 0A is TCP_LISTEN
+                    if fields[3] == '0A' and port in ports:
+                        inodes[fields[9]] = port
+        except OSError:
+            continue
+    if not inodes:
+        return {}
+
+    found = {}
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        fd_dir = f'/proc/{pid}/fd'
+        try:
+            for fd in os.listdir(fd_dir):
+                target = os.readlink(f'{fd_dir}/{fd}')
+                if target.startswith('socket:['):
+                    port = inodes.get(target[8:-1])
+                    if port is not None:
+                        found.setdefault(port, set()).add(int(pid))
+        except OSError:
+            continue
+    return found
+
+
+def _netstat_listeners(ports):
+    """Map listening ports to pids with netstat (Windows) or lsof (others)"""
+    found = {}
+    if IS_WINDOWS:
+        result = subprocess.run(['netstat', '-ano', '-p', 'tcp'],
+                                capture_output=True, text=True)
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) >= 5 and parts[3] == 'LISTENING':
+                match = re.search(r':(\d+)$', parts[1])
+                if match and int(match.group(1)) in ports:
+                    found.setdefault(int(match.group(1)), set()).add(int(parts[4]))
+        return found
+
+    for port in ports:
+        try:
+            result = subprocess.run(['lsof', '-nP', f'-iTCP:{port}', '-sTCP:LISTEN', '-t'],
+                                    capture_output=True, text=True)
+        except FileNotFoundError:
+            break
+        pids = {int(pid) for pid in result.stdout.split() if pid.isdigit()}
+        if pids:
+            found[port] = pids
+    return found
+
+
+def find_listeners(ports):
+    """Return {port: {pid, ...}} for processes listening on the given ports"""
+    ports = set(ports)
+    if sys.platform.startswith('linux'):
+        return _linux_listeners(ports)
+    return _netstat_listeners(ports)
+
+
+def process_name(pid):
+    """Best-effort executable name for a pid"""
+    try:
+        if sys.platform.startswith('linux'):
+            with open(f'/proc/{pid}/comm', 'r') as f:
+                return f.read().strip()
+        if IS_WINDOWS:
+            result = subprocess.run(['tasklist', '/FI', f'PID eq {pid}', '/FO', 'CSV', '/NH'],
+                                    capture_output=True, text=True)
+            if not result.stdout.startswith('"'):
+                return ''  # "INFO: No tasks are running..."
+            return result.stdout.split(',')[0].strip('"')
+        result = subprocess.run(['ps', '-p', str(pid), '-o', 'comm='],
+                                capture_output=True, text=True)
+        return os.path.basename(result.stdout.strip())
+    except (OSError, IndexError):
+        return ''
+
+
+def _kill_pid(pid, force):
+    if IS_WINDOWS:
+        args = ['taskkill', '/T', '/PID', str(pid)]
+        if force:
+            args.insert(1, '/F')
+        subprocess.run(args, capture_output=True)
+    else:
+        try:
+            os.kill(pid, signal.SIGKILL if force else signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def _pid_alive(pid):
+    if IS_WINDOWS:
+        return bool(process_name(pid))
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def reclaim_ports(ports, log=None, policy=None):
+    """Stop stale node processes still holding our ports; return True if all are free
+
+    Only node/npm processes are stopped; anything else is reported so we
+    never kill an unrelated program that happens to use the same port.
+    """
+    log = log or print
+    policy = policy or ShutdownPolicy()
+    listeners = find_listeners(ports)
+    if not listeners:
+        return True
+
+    all_free = True
+    own_pid = os.getpid()
+    for port, pids in sorted(listeners.items()):
+        for pid in sorted(pids):
+            if pid == own_pid:
+                continue
+            name = process_name(pid)
+            if 'node' not in name.lower() and 'npm' not in name.lower():
+                log(f"Port {port} is in use by {name or 'unknown'} (pid {pid}); not stopping it")
+                all_free = False
+                continue
+
+            start = time.monotonic()
+            log(f"Reclaiming port {port} from stale {name} (pid {pid})")
+            _kill_pid(pid, force=False)
+            end = start + policy.terminate
+            while time.monotonic() < end and _pid_alive(pid):
+                time.sleep(POLL_INTERVAL)
+            if _pid_alive(pid):
+                _kill_pid(pid, force=True)
+            log(f"Port {port} reclaimed in {time.monotonic() - start:.2f}s")
+    return all_free
@@ -0,0 +1,159 @@
+"""
+Dependency-graph launch scheduler
+Each launch stage names the stages it needs; a stage starts as soon as
+those have finished, so independent work (the client's npm install and
+the server's startup) overlaps instead of running in a fixed order
+"""
+
+import asyncio
+import contextlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking stages (installs, builds, port cleanup) that may run at once
+DEFAULT_WORKERS = 4
+
+
+class Stage:
+    """One node of the launch graph and how its run went"""
+
+    def __init__(self, name, action, after=(), blocking=False):
+        self.name = name
+        # A coroutine function, or a plain function with blocking=True;
+        # a false return value fails the stage
+        self.action = action
+        self.after = tuple(after)
+        self.blocking = blocking
+        self.state = 'pending'
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class StageGraph:
+    """Run stages with maximum overlap and report the launch's critical path"""
+
+    def __init__(self, log=None, profiler=None, max_workers=DEFAULT_WORKERS):
+        self.log = log or print
+        self.profiler = profiler
+        self.max_workers = max_workers
+        self.stages = {}
+        self.origin = None
+
+    def add(self, name, action, after=(), blocking=False):
+        for dependency in after:
+            if dependency not in self.stages:
+                raise ValueError(f"stage {name!r} depends on unknown stage {dependency!r}")
+        stage = self.stages[name] = Stage(name, action, after, blocking)
+        return stage
+
+    def record(self, name, after, finished):
+        """Add an event timed outside the graph, e.g. a port answering
+
+        It counts as starting when the last of `after` finished.
+        """
+        stage = Stage(name, None, [d for d in after if d in self.stages])
+        stage.state = 'done'
+        stage.finished = finished
+        stage.started = max([self.stages[d].finished for d in stage.after
+                             if self.stages[d].finished is not None] or [finished])
+        self.stages[name] = stage
+        return stage
+
+    async def run(self):
+        """Run every stage; return True when all of them succeeded
+
+        After a failure no further stages start, but those already running
+        are allowed to finish. Cancelling the run abandons running stages;
+        a blocking one keeps its thread until its action returns.
+        """
+        self.origin = time.monotonic()
+        loop = asyncio.get_event_loop()
+        running = {}
+        failed = False
+        executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                      thread_name_prefix='launch-stage')
+        try:
+            while True:
+                if not failed:
+                    for stage in self.stages.values():
+                        if stage.state == 'pending' and all(
+                                self.stages[d].state == 'done' for d in stage.after):
+                            stage.state = 'running'
+                            running[asyncio.ensure_future(
+                                self._run_stage(stage, loop, executor))] = stage
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    if future.result() is False:
+                        failed = True
+        except asyncio.CancelledError:
+            # The launch was abandoned (Ctrl+C, window closed): stop waiting
+            # for the stages still running instead of blocking the loop
+            for future in running:
+                future.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+            for stage in self.stages.values():
+                if stage.state == 'pending':
+                    stage.state = 'skipped'
+        return not failed
+
+    async def _run_stage(self, stage, loop, executor):
+        phase = self.profiler.phase(stage.name) if self.profiler else contextlib.nullcontext()
+        stage.started = time.monotonic()
+        try:
+            with phase:
+                if stage.blocking:
+                    ok = await loop.run_in_executor(executor, stage.action)
+                else:
+                    ok = await stage.action()
+        except Exception as e:
+            self.log(f"Launch stage '{stage.name}' failed: {e}")
+            ok = False
+        stage.finished = time.monotonic()
+        stage.state = 'done' if ok else 'failed'
+        return stage.state == 'done'
+
+    def critical_path(self):
+        """The chain of stages that decided when the last one finished
+
+        Walks back from the stage that finished last, each time to the
+        dependency that finished latest, i.e. the one it was waiting for.
+        """
+        finished = [s for s in self.stages.values() if s.finished is not None]
+        if not finished:
+            return []
+        stage = max(finished, key=lambda s: s.finished)
+        path = [stage]
+        while True:
+            previous = [self.stages[d] for d in stage.after
+                        if self.stages[d].finished is not None]
+            if not previous:
+                break
+            stage = max(previous, key=lambda s: s.finished)
+            path.append(stage)
+        return path[::-1]
+
+    def summary(self):
+        """Text report of the critical path and how much work overlapped"""
+        path = self.critical_path()
+        if not path:
+            return "No launch stages ran"
+        total = path[-1].finished - self.origin
+        work = sum(s.duration for s in self.stages.values() if s.action)
+        steps = " -> ".join(f"{s.name} {s.duration:.1f}s" for s in path)
+        lines = [f"Critical path ({total:.1f}s): {steps}",
+                 f"Stages did {work:.1f}s of work in {total:.1f}s"]
+        failed = [s.name for s in self.stages.values() if s.state in ('failed', 'skipped')]
+        if failed:
+            lines.append(f"Failed or skipped: {', '.join(failed)}")
+        return "\n".join(lines)
@@ -0,0 +1,298 @@
+"""
+Warm-standby server replacement
+Runs the API on an alternate port behind the local proxy; a restart,
+crash or source change starts a replacement, waits until it answers,
+switches the proxy over and drains the old instance
+"""
+
+import asyncio
+import os
+import time
+
+from factory_launcher.readiness import check_port_async
+from factory_launcher.supervisor import RESTART_NEVER, Service, ServiceSpec
+
+DEFAULT_BACKEND_PORTS = (3101, 3102)
+READY_TIMEOUT = 90.0
+DRAIN_TIMEOUT = 10.0
+WATCH_INTERVAL = 1.0
+SKIP_DIRS = {'node_modules', 'dist', '.git'}
+
+
+def standby_enabled():
+    return os.environ.get('FACTORY_WARM_STANDBY', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def backend_ports():
+    """The two ports instances alternate between; FACTORY_STANDBY_PORTS=a,b"""
+    value = os.environ.get('FACTORY_STANDBY_PORTS')
+    if value:
+        try:
+            ports = tuple(int(part) for part in value.split(','))
+            if len(ports) == 2 and ports[0] != ports[1]:
+                return ports
+        except ValueError:
+            pass
+    return DEFAULT_BACKEND_PORTS
+
+
+def dev_server_spec(app_dir, node_cmd):
+    """The dev server without nodemon; the standby service reloads it instead"""
+    return ServiceSpec('server', [node_cmd, 'src/index.js'], app_dir / 'server',
+                       env={'NODE_ENV': 'development'}, max_restarts=10,
+                       ready_pattern=r'Listening to port')
+
+
+def _source_state(paths):
+    state = {}
+    for root_path in paths:
+        for root, dirs, files in os.walk(root_path):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+class StandbyService:
+    """A supervised service made of short-lived instances behind a proxy
+
+    Offers the same interface as supervisor.Service, so the Supervisor,
+    resource monitor and GUI treat it as the 'server' service.
+    """
+
+    def __init__(self, spec, proxy, ports=None, watch=None, log=None,
+                 shutdown_policy=None, on_ready=None, on_line=None):
+        self.spec = spec
+        self.proxy = proxy
+        self.ports = ports or backend_ports()
+        self.watch = watch
+        self.log = log or print
+        self.shutdown_policy = shutdown_policy
+        self.on_ready = on_ready
+        self.on_line = on_line
+        self.current = None
+        # port -> old instance still draining
+        self.retiring = {}
+        self.state = 'stopped'
+        self.crash_count = 0
+        self.restart_count = 0
+        self.ready_at = None
+        self.last_stop = None
+        self._stopping = None
+        self._replace = None
+        self._task = None
+        self._watch_task = None
+
+    @property
+    def name(self):
+        return self.spec.name
+
+    @property
+    def process(self):
+        return self.current.process if self.current else None
+
+    @property
+    def recent(self):
+        return self.current.recent if self.current else []
+
+    @property
+    def started_at(self):
+        return self.current.started_at if self.current else None
+
+    def start(self):
+        self._stopping = asyncio.Event()
+        self._replace = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+        if self.watch:
+            self._watch_task = asyncio.ensure_future(self._watch_sources())
+        return self._task
+
+    async def stop(self):
+        if self._stopping:
+            self._stopping.set()
+        if self._watch_task:
+            self._watch_task.cancel()
+        if self._task:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), 30)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+        self.state = 'stopped'
+
+    async def restart(self):
+        """Replace the running instance without dropping connections"""
+        self.request_replace("restart requested")
+
+    def request_replace(self, reason):
+        if self._replace and not self._replace.is_set():
+            self.log(f"[{self.name}] {reason}; starting a replacement")
+            self._replace.set()
+
+    async def wait(self):
+        if self._task:
+            await asyncio.shield(self._task)
+
+    def is_running(self):
+        return self.state in ('starting', 'running', 'backoff')
+
+    def status(self):
+        status = self.current.status() if self.current else {'pid': None, 'uptime': 0,
+                                                             'last_stop_seconds': None}
+        status.update(name=self.name, state=self.state, crashes=self.crash_count,
+                      restarts=self.restart_count, port=self.proxy.backend)
+        return status
+
+    def _instance(self, port):
+        spec = self.spec
+        env = dict(spec.env or {}, PORT=str(port))
+        instance_spec = ServiceSpec(f"{spec.name}:{port}", spec.cmd, spec.cwd, env=env,
+                                    restart=RESTART_NEVER, crash_pattern=spec.crash_pattern,
+                                    ready_pattern=spec.ready_pattern)
+        instance = Service(instance_spec, self.log, self.shutdown_policy, on_line=self._line)
+        instance.port = port
+        return instance
+
+    def _line(self, instance, line):
+        if self.on_line:
+            self.on_line(self, line)
+
+    async def _launch(self):
+        """Start an instance on the free port; return it once it answers, else None"""
+        busy = set(self.retiring)
+        if self.current and not self.current.finished():
+            busy.add(self.current.port)
+        port = next((p for p in self.ports if p not in busy), self.ports[0])
+        instance = self._instance(port)
+        instance.start()
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + READY_TIMEOUT
+        while loop.time() < deadline and not self._stopping.is_set():
+            if instance.finished():
+                break
+            if await check_port_async('127.0.0.1', port, use_http=False, timeout=0.5):
+                return instance
+            await asyncio.sleep(0.2)
+        self.log(f"[{self.name}] replacement on port {port} did not become ready")
+        await instance.stop()
+        return None
+
+    async def _retire(self, instance):
+        """Let in-flight requests on an old instance finish, then stop it"""
+        self.retiring[instance.port] = instance
+        try:
+            remaining = await self.proxy.drain(instance.port, DRAIN_TIMEOUT)
+            if remaining:
+                self.log(f"[{self.name}] {remaining} connection(s) to port {instance.port} "
+                         f"still open after {DRAIN_TIMEOUT:.0f}s")
+            await instance.stop()
+            self.last_stop = instance.last_stop
+        finally:
+            self.retiring.pop(instance.port, None)
+
+    def _promote(self, instance):
+        self.current = instance
+        self.proxy.switch(instance.port)
+        self.ready_at = time.monotonic()
+        self.state = 'running'
+        if self.on_ready:
+            self.on_ready(self)
+
+    async def _run(self):
+        spec = self.spec
+        delay = spec.backoff_initial
+        streak = 0
+        while not self._stopping.is_set():
+            self.state = 'starting'
+            instance = await self._launch()
+            if self._stopping.is_set():
+                if instance:
+                    await instance.stop()
+                break
+            if instance is None:
+                # Keep serving from the old instance if it is still up
+                if self.current and not self.current.finished():
+                    self.state = 'running'
+                    await self._wait_for_event()
+                    continue
+                streak += 1
+                if spec.max_restarts is not None and streak > spec.max_restarts:
+                    self.log(f"[{self.name}] giving up after {spec.max_restarts} restarts")
+                    self.state = 'failed'
+                    return
+                self.state = 'backoff'
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    delay = min(delay * 2, spec.backoff_max)
+                    continue
+
+            old = self.current
+            self._promote(instance)
+            if old:
+                self.restart_count += 1
+                asyncio.ensure_future(self._retire(old))
+            await self._wait_for_event()
+            if self._stopping.is_set():
+                break
+            if self.current.finished():
+                # Crashed: hold new connections in the proxy until a
+                # replacement is up instead of refusing them
+                self.proxy.detach(self.current.port)
+                self.crash_count += 1
+                runtime = time.monotonic() - (self.current.started_at or time.monotonic())
+                self.log(f"[{self.name}] instance on port {self.current.port} exited after "
+                         f"{runtime:.1f}s; crash #{self.crash_count}")
+                self.current = None
+                if runtime >= spec.stable_after:
+                    delay = spec.backoff_initial
+                    streak = 0
+                streak += 1
+                if spec.max_restarts is not None and streak > spec.max_restarts:
+                    self.log(f"[{self.name}] giving up after {spec.max_restarts} restarts")
+                    self.state = 'failed'
+                    return
+                # The first crash is replaced at once; a crash loop backs off
+                if streak > 1:
+                    self.state = 'backoff'
+                    self.log(f"[{self.name}] restarting in {delay:.1f}s")
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), delay)
+                        break
+                    except asyncio.TimeoutError:
+                        delay = min(delay * 2, spec.backoff_max)
+
+        # Stopping for good: no point draining what is left
+        instances = list(self.retiring.values())
+        if self.current:
+            instances.append(self.current)
+        await asyncio.gather(*(instance.stop() for instance in instances))
+        if self.current:
+            self.last_stop = self.current.last_stop
+        self.state = 'stopped'
+
+    async def _wait_for_event(self):
+        """Wait for a stop request, a replace request or the instance exiting"""
+        waiters = [asyncio.ensure_future(self._stopping.wait()),
+                   asyncio.ensure_future(self._replace.wait())]
+        if self.current:
+            waiters.append(asyncio.ensure_future(self.current.wait()))
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+        self._replace.clear()
+
+    async def _watch_sources(self):
+        """Replace the server when its sources change, as nodemon would restart it"""
+        previous = await asyncio.get_event_loop().run_in_executor(None, _source_state, self.watch)
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            state = await asyncio.get_event_loop().run_in_executor(None, _source_state, self.watch)
+            if state != previous:
+                previous = state
+                self.request_replace("sources changed")
@@ -0,0 +1,303 @@
+"""
+Process supervisor for the server and client dev processes
+Each service runs as its own child with its own restart policy,
+backoff, crash counter and log stream, all driven by one asyncio loop
+"""
+
+import asyncio
+import collections
+import os
+import re
+import subprocess
+import time
+
+from factory_launcher.output import CHUNK_SIZE, LineSplitter
+from factory_launcher.shutdown import ShutdownPolicy, popen_group_kwargs, stop_process_tree_async
+
+RESTART_NEVER = 'never'
+RESTART_ON_FAILURE = 'on-failure'
+RESTART_ALWAYS = 'always'
+
+RECENT_LINES = 200
+
+
+class ServiceSpec:
+    """Static description of a supervised service"""
+
+    def __init__(self, name, cmd, cwd, env=None, restart=RESTART_ON_FAILURE,
+                 max_restarts=10, backoff_initial=1.0, backoff_max=30.0,
+                 stable_after=60.0, crash_pattern=None, ready_pattern=None):
+        self.name = name
+        self.cmd = list(cmd)
+        self.cwd = cwd
+        self.env = env
+        self.restart = restart
+        self.max_restarts = max_restarts
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        # A run longer than this resets the backoff and crash streak
+        self.stable_after = stable_after
+        # Output that means "crashed" even though the process keeps running,
+        # e.g. nodemon's "app crashed - waiting for file changes"
+        self.crash_pattern = re.compile(crash_pattern) if crash_pattern else None
+        # Output that means the service is up, e.g. Vite's "ready in 412 ms"
+        self.ready_pattern = re.compile(ready_pattern) if ready_pattern else None
+
+
+class Service:
+    """Runtime state of one supervised service
+
+    Every method except status() and is_running() must run on the event loop.
+    """
+
+    def __init__(self, spec, log, shutdown_policy=None, on_ready=None, on_line=None):
+        self.spec = spec
+        self.log = log
+        self.on_ready = on_ready
+        self.on_line = on_line
+        self.ready_at = None
+        self.shutdown_policy = shutdown_policy or ShutdownPolicy()
+        self.last_stop = None
+        self.process = None
+        self.state = 'stopped'
+        self.crash_count = 0
+        self.restart_count = 0
+        self.started_at = None
+        self.recent = collections.deque(maxlen=RECENT_LINES)
+        self._stopping = None
+        self._task = None
+        self._stop_task = None
+        self._crashed_by_output = False
+        self._restart_requested = False
+
+    @property
+    def name(self):
+        return self.spec.name
+
+    def start(self):
+        """Start supervising the service as a task on the running loop"""
+        self._stopping = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    async def stop(self):
+        """Stop the service and disable restarts"""
+        if self._stopping:
+            self._stopping.set()
+        process = self.process
+        if process:
+            try:
+                self.last_stop = await self._stop_process(process)
+                if self.last_stop.elapsed > 0:
+                    self.log(f"[{self.name}] {self.last_stop}")
+            except Exception as e:
+                self.log(f"[{self.name}] error stopping: {e}")
+        if self._task:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), 10)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+        self.state = 'stopped'
+
+    async def restart(self):
+        """Restart the child without counting a crash"""
+        process = self.process
+        if process:
+            self._restart_requested = True
+            await self._stop_process(process)
+
+    async def wait(self):
+        """Wait until the service stops for good"""
+        if self._task:
+            await asyncio.shield(self._task)
+
+    def _stop_process(self, process):
+        return stop_process_tree_async(process, self.shutdown_policy)
+
+    def is_running(self):
+        return self.state in ('starting', 'running', 'backoff')
+
+    def finished(self):
+        """True once the supervising task has ended (stopped, exited or gave up)"""
+        return self._task is not None and self._task.done()
+
+    def status(self):
+        uptime = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            'name': self.name,
+            'state': self.state,
+            'pid': self.process.pid if self.process else None,
+            'crashes': self.crash_count,
+            'restarts': self.restart_count,
+            'uptime': round(uptime, 1) if self.state == 'running' else 0,
+            'last_stop_seconds': round(self.last_stop.elapsed, 2) if self.last_stop else None,
+        }
+
+    async def _spawn(self):
+        env = None
+        if self.spec.env:
+            env = dict(os.environ, **self.spec.env)
+        self.state = 'starting'
+        self._crashed_by_output = False
+        self.ready_at = None
+        self.process = await asyncio.create_subprocess_exec(
+            *self.spec.cmd,
+            cwd=str(self.spec.cwd),
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            **popen_group_kwargs()
+        )
+        self.started_at = time.monotonic()
+        self.state = 'running'
+        self.log(f"[{self.name}] started (pid {self.process.pid})")
+
+    async def _pump_output(self):
+        """Forward output to this service's log stream until the pipe closes"""
+        splitter = LineSplitter()
+        while True:
+            chunk = await self.process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            for line in splitter.feed(chunk):
+                self._handle_line(line)
+        for line in splitter.flush():
+            self._handle_line(line)
+
+    def _handle_line(self, line):
+        self.recent.append(line)
+        self.log(f"[{self.name}] {line}")
+        if self.on_line:
+            self.on_line(self, line)
+        if (self.spec.ready_pattern and self.ready_at is None
+                and self.spec.ready_pattern.search(line)):
+            self.ready_at = time.monotonic()
+            if self.on_ready:
+                self.on_ready(self)
+        if (self.spec.crash_pattern and not self._crashed_by_output
+                and self.spec.crash_pattern.search(line)):
+            self._crashed_by_output = True
+            self._stop_task = asyncio.ensure_future(self._stop_process(self.process))
+
+    async def _run(self):
+        spec = self.spec
+        delay = spec.backoff_initial
+        streak = 0
+
+        while not self._stopping.is_set():
+            try:
+                await self._spawn()
+            except OSError as e:
+                self.log(f"[{self.name}] failed to start: {e}")
+                self.state = 'failed'
+                return
+
+            await self._pump_output()
+            returncode = await self.process.wait()
+            runtime = time.monotonic() - self.started_at
+            if self._stopping.is_set():
+                break
+            if self._restart_requested:
+                self._restart_requested = False
+                self.restart_count += 1
+                self.log(f"[{self.name}] restarting on request")
+                continue
+
+            crashed = returncode != 0 or self._crashed_by_output
+            if crashed:
+                self.crash_count += 1
+                self.log(f"[{self.name}] crashed (exit code {returncode}) "
+                         f"after {runtime:.1f}s; crash #{self.crash_count}")
+            else:
+                self.log(f"[{self.name}] exited after {runtime:.1f}s")
+
+            if spec.restart == RESTART_NEVER or (spec.restart == RESTART_ON_FAILURE and not crashed):
+                self.state = 'exited' if not crashed else 'failed'
+                return
+
+            if runtime >= spec.stable_after:
+                delay = spec.backoff_initial
+                streak = 0
+            streak += 1
+            if spec.max_restarts is not None and streak > spec.max_restarts:
+                self.log(f"[{self.name}] giving up after {spec.max_restarts} restarts")
+                self.state = 'failed'
+                return
+
+            self.state = 'backoff'
+            self.log(f"[{self.name}] restarting in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, spec.backoff_max)
+            self.restart_count += 1
+
+        self.state = 'stopped'
+
+
+class Supervisor:
+    """Start, watch and stop a set of independent services on one event loop"""
+
+    def __init__(self, log=None, shutdown_policy=None, on_ready=None, on_line=None):
+        self.log = log or print
+        self.on_ready = on_ready
+        # Called with (service, line) for every output line, on the loop
+        self.on_line = on_line
+        self.shutdown_policy = shutdown_policy or ShutdownPolicy()
+        self.services = collections.OrderedDict()
+        self.last_stop_seconds = None
+        self._started = set()
+
+    def add(self, spec):
+        service = Service(spec, self.log, self.shutdown_policy, self.on_ready, self.on_line)
+        self.services[spec.name] = service
+        return service
+
+    def add_service(self, service):
+        """Supervise an object with Service's interface, e.g. a StandbyService"""
+        self.services[service.name] = service
+        return service
+
+    def start_all(self):
+        """Start every service not started yet; must be called on the event loop"""
+        for name, service in self.services.items():
+            if name not in self._started:
+                self._started.add(name)
+                service.start()
+
+    async def stop_all(self):
+        # Stop in reverse start order so the client goes before its API
+        start = time.monotonic()
+        for service in reversed(list(self.services.values())):
+            await service.stop()
+        self.last_stop_seconds = time.monotonic() - start
+        self.log(f"All services stopped in {self.last_stop_seconds:.2f}s")
+
+    async def wait(self):
+        """Wait until every service has stopped, exited or given up"""
+        await asyncio.gather(*(service.wait() for service in self.services.values()))
+
+    def is_running(self):
+        return any(service.is_running() for service in self.services.values())
+
+    def status(self):
+        return [service.status() for service in self.services.values()]
+
+
+def app_services(app_dir, npm_cmd, scripts=('dev', 'dev')):
+    """Return the default server and client service specs
+
+    `scripts` names the npm scripts run in server/ and client/; the GUI
+    launcher runs the built app with ('start', 'preview').
+    """
+    npm = list(npm_cmd) if isinstance(npm_cmd, (list, tuple)) else [npm_cmd]
+    server_script, client_script = scripts
+    return [
+        ServiceSpec('server', npm + ['run', server_script], app_dir / 'server',
+                    max_restarts=10, crash_pattern=r'\[nodemon\] app crashed',
+                    ready_pattern=r'Listening to port'),
+        ServiceSpec('client', npm + ['run', client_script], app_dir / 'client',
+                    max_restarts=5, ready_pattern=r'ready in \d+'),
+    ]
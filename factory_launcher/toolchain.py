@@ -0,0 +1,169 @@
+"""
+Cached Node.js toolchain discovery
+Remembers the resolved node/npm binaries and versions in a per-user file,
+validated by the binaries' mtime and inode, so launches skip the probe
+"""
+
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from factory_launcher.paths import user_cache_dir
+
+CACHE_VERSION = 1
+VERSION_TIMEOUT = 10
+
+# Installing or switching Node versions touches these, invalidating the cache
+WATCHED_PATHS = (
+    '~/.nvm/versions/node',
+    '~/.nvm/alias/default',
+    '~/AppData/Roaming/nvm/settings.txt',
+)
+
+
+def _stat_key(path):
+    """Cheap identity of a file: (mtime_ns, inode, size), or None if missing"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_ino, st.st_size]
+
+
+def _watched_state():
+    return {path: _stat_key(os.path.expanduser(path)) for path in WATCHED_PATHS}
+
+
+def _run_version(cmd, timeout):
+    try:
+        result = subprocess.run([cmd, '--version'], capture_output=True,
+                                text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def check_versions(node_cmd, npm_cmd, timeout=VERSION_TIMEOUT):
+    """Run `node --version` and `npm --version` at the same time"""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        node_future = pool.submit(_run_version, node_cmd, timeout)
+        npm_future = pool.submit(_run_version, npm_cmd, timeout)
+        return node_future.result(), npm_future.result()
+
+
+class Toolchain:
+    """Resolved node and npm binaries"""
+
+    def __init__(self, node_path, npm_path, node_version, npm_version, cached=False):
+        self.node_path = node_path
+        self.npm_path = npm_path
+        self.node_version = node_version
+        self.npm_version = npm_version
+        self.cached = cached
+
+    def bin_dirs(self):
+        dirs = []
+        for path in (self.node_path, self.npm_path):
+            directory = os.path.dirname(path)
+            if directory not in dirs:
+                dirs.append(directory)
+        return dirs
+
+    def activate(self):
+        """Put the toolchain's directories at the front of PATH"""
+        entries = os.environ.get('PATH', '').split(os.pathsep)
+        for directory in reversed(self.bin_dirs()):
+            if directory not in entries:
+                entries.insert(0, directory)
+        os.environ['PATH'] = os.pathsep.join(entries)
+
+
+class ToolchainCache:
+    """Per-user cache of the last successful toolchain probe"""
+
+    def __init__(self, path=None):
+        self.path = path or user_cache_dir() / 'toolchain.json'
+
+    def load(self):
+        """Return the cached Toolchain if every recorded binary is unchanged"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get('version') != CACHE_VERSION or data.get('watched') != _watched_state():
+            return None
+        for key in ('node', 'npm'):
+            entry = data.get(key) or {}
+            if not entry.get('path') or _stat_key(entry['path']) != entry.get('stat'):
+                return None
+        return Toolchain(data['node']['path'], data['npm']['path'],
+                         data['node']['version'], data['npm']['version'], cached=True)
+
+    def save(self, toolchain):
+        data = {
+            'version': CACHE_VERSION,
+            'watched': _watched_state(),
+            'node': {'path': toolchain.node_path, 'version': toolchain.node_version,
+                     'stat': _stat_key(toolchain.node_path)},
+            'npm': {'path': toolchain.npm_path, 'version': toolchain.npm_version,
+                    'stat': _stat_key(toolchain.npm_path)},
+        }
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def node_version(node_cmd='node'):
+    """The active Node.js version, read from the toolchain cache when it is valid"""
+    toolchain = ToolchainCache().load()
+    if toolchain:
+        return toolchain.node_version
+    return _run_version(node_cmd, VERSION_TIMEOUT)
+
+
+def resolve_toolchain(node_cmd, npm_cmd, discover=None, log=None, cache=None):
+    """Return the node/npm Toolchain, probing only when the cache is invalid
+
+    `discover` is the launcher's own PATH setup (nvm, standard install
+    folders); it only runs when the cached toolchain cannot be used.
+    """
+    log = log or print
+    cache = cache or ToolchainCache()
+
+    toolchain = cache.load()
+    if toolchain:
+        toolchain.activate()
+        return toolchain
+
+    if discover:
+        discover()
+    node_path = shutil.which(node_cmd)
+    npm_path = shutil.which(npm_cmd)
+    if not node_path or not npm_path:
+        log(f"{'Node.js' if not node_path else 'npm'} not found on PATH")
+        return None
+
+    node_version, npm_version = check_versions(node_path, npm_path)
+    if not node_version or not npm_version:
+        log(f"{'Node.js' if not node_version else 'npm'} not found or not working")
+        return None
+
+    toolchain = Toolchain(node_path, npm_path, node_version, npm_version)
+    try:
+        cache.save(toolchain)
+    except OSError as e:
+        log(f"Could not cache Node.js toolchain: {e}")
+    return toolchain
@@ -6,13 +6,19 @@ Cross-platform GUI launcher for the MERN application
 
 import os
 import sys
-import subprocess
 import threading
-import time
 import webbrowser
-import json
 from pathlib import Path
 
+from factory_launcher.aio import LoopThread, TkDispatcher
+from factory_launcher.install import install_all
+from factory_launcher.instance import claim, release
+from factory_launcher.log_buffer import LogHistory
+from factory_launcher.log_sink import TkLogSink
+from factory_launcher.readiness import ReadinessProbe
+from factory_launcher.supervisor import Supervisor, app_services
+from factory_launcher.toolchain import resolve_toolchain
+
 try:
     import tkinter as tk
     from tkinter import ttk, messagebox, scrolledtext
@@ -23,21 +29,20 @@ except ImportError:
 class AppLauncher:
     def __init__(self):
         self.app_dir = Path(__file__).parent
-        self.processes = []
+        self.supervisor = None
+        self.loop_thread = None
         self.root = None
+        self.dispatcher = None
         self.log_text = None
+        self.log_sink = None
+        self.readiness_probe = None
         
     def check_requirements(self):
         """Check if Node.js and npm are installed"""
-        # First, try to load nvm environment
-        self.setup_node_environment()
-        
-        try:
-            subprocess.run(['node', '--version'], capture_output=True, check=True)
-            subprocess.run(['npm', '--version'], capture_output=True, check=True)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        # Loads the nvm environment only when the cached toolchain is stale
+        toolchain = resolve_toolchain('node', 'npm', discover=self.setup_node_environment,
+                                      log=self.log)
+        return toolchain is not None
     
     def setup_node_environment(self):
         """Setup Node.js environment (nvm support)"""
@@ -75,27 +80,10 @@ class AppLauncher:
         """Install all dependencies"""
         self.log("Installing dependencies...")
         
-        try:
-            # Install root dependencies
-            if not (self.app_dir / 'node_modules').exists():
-                self.log("Installing root dependencies...")
-                subprocess.run(['npm', 'install'], cwd=self.app_dir, check=True)
-            
-            # Install client dependencies
-            if not (self.app_dir / 'client' / 'node_modules').exists():
-                self.log("Installing client dependencies...")
-                subprocess.run(['npm', 'install'], cwd=self.app_dir / 'client', check=True)
-            
-            # Install server dependencies
-            if not (self.app_dir / 'server' / 'node_modules').exists():
-                self.log("Installing server dependencies...")
-                subprocess.run(['npm', 'install'], cwd=self.app_dir / 'server', check=True)
-            
+        if install_all(self.app_dir, 'npm', log=self.log):
             self.log("Dependencies installed successfully!")
             return True
-        except subprocess.CalledProcessError as e:
-            self.log(f"Error installing dependencies: {e}")
-            return False
+        return False
     
     def start_application(self):
         """Start the MERN application"""
@@ -104,38 +92,36 @@ class AppLauncher:
             self.log("Frontend will be available at: http://localhost:5173")
             self.log("Backend will be available at: http://localhost:3000")
             
-            # Start the application using npm run dev
-            process = subprocess.Popen(
-                ['npm', 'run', 'dev'],
-                cwd=self.app_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
+            # Server and client run as separate supervised children, each
+            # restarted on its own; their output is logged line by line
+            if self.loop_thread is None:
+                self.loop_thread = LoopThread().start()
+            supervisor = Supervisor(log=self.log)
+            for spec in app_services(self.app_dir, 'npm'):
+                supervisor.add(spec)
+            self.loop_thread.loop.call_soon_threadsafe(supervisor.start_all)
+            self.supervisor = supervisor
             
-            self.processes.append(process)
+            # Open the browser once both ports answer
+            threading.Thread(target=self.wait_until_ready, daemon=True).start()
             
-            # Start a thread to read output
-            if self.log_text:
-                thread = threading.Thread(target=self.read_output, args=(process,))
-                thread.daemon = True
-                thread.start()
-            
-            # Wait a bit and then open browser
-            threading.Timer(5.0, self.open_browser).start()
-            
-            return process
+            return supervisor
             
         except Exception as e:
             self.log(f"Error starting application: {e}")
             return None
     
-    def read_output(self, process):
-        """Read and display process output"""
-        for line in iter(process.stdout.readline, ''):
-            if line:
-                self.log(line.strip())
+    def wait_until_ready(self):
+        """Poll the client and server ports, then open the browser"""
+        self.readiness_probe = ReadinessProbe(log=self.log)
+        if self.readiness_probe.wait():
+            self.log(f"Application ready in {self.readiness_probe.elapsed:.1f}s")
+            self.open_browser()
+        elif self.is_app_running():
+            self.log("Application did not become ready; open http://localhost:5173 manually")
+    
+    def is_app_running(self):
+        return self.supervisor is not None and self.supervisor.is_running()
     
     def open_browser(self):
         """Open the application in default browser"""
@@ -148,25 +134,19 @@ class AppLauncher:
     def log(self, message):
         """Log message to console and GUI if available"""
         print(message)
-        if self.log_text:
-            self.log_text.insert(tk.END, f"{message}\n")
-            self.log_text.see(tk.END)
-            if self.root:
-                self.root.update()
+        # Safe from reader threads; the Tk main loop draws queued lines in batches
+        if self.log_sink:
+            self.log_sink.write(message)
     
     def stop_application(self):
         """Stop all running processes"""
         self.log("Stopping application...")
-        for process in self.processes:
-            try:
-                process.terminate()
-                process.wait(timeout=5)
-            except:
-                try:
-                    process.kill()
-                except:
-                    pass
-        self.processes.clear()
+        if self.readiness_probe:
+            self.readiness_probe.cancel()
+        if self.supervisor:
+            # Each service's process group goes down SIGINT -> SIGTERM -> SIGKILL
+            self.loop_thread.call(self.supervisor.stop_all())
+            self.supervisor = None
         self.log("Application stopped")
     
     def create_gui(self):
@@ -207,7 +187,11 @@ class AppLauncher:
         
         self.browser_button = ttk.Button(buttons_frame, text="Open in Browser", 
                                         command=self.open_browser)
-        self.browser_button.pack(side=tk.LEFT)
+        self.browser_button.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.older_button = ttk.Button(buttons_frame, text="Load Older Logs", 
+                                      command=self.on_load_older_click)
+        self.older_button.pack(side=tk.LEFT)
         
         # Log area
         log_label = ttk.Label(main_frame, text="Application Log:")
@@ -215,6 +199,11 @@ class AppLauncher:
         
         self.log_text = scrolledtext.ScrolledText(main_frame, height=20, width=80)
         self.log_text.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.log_sink = TkLogSink(self.root, self.log_text, history=LogHistory('launcher'))
+        self.log_sink.start()
+        # Control-socket commands reach the widgets through here
+        self.dispatcher = TkDispatcher(self.root)
+        self.dispatcher.start()
         
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
@@ -232,6 +221,9 @@ class AppLauncher:
     
     def on_start_click(self):
         """Handle start button click"""
+        if self.start_button.instate(['disabled']):
+            # Already starting or running
+            return
         self.start_button.config(state=tk.DISABLED)
         self.status_var.set("Starting application...")
         
@@ -244,8 +236,7 @@ class AppLauncher:
                 return
             
             if self.install_dependencies():
-                process = self.start_application()
-                if process:
+                if self.start_application():
                     self.status_var.set("Application running")
                     self.stop_button.config(state=tk.NORMAL)
                 else:
@@ -264,15 +255,59 @@ class AppLauncher:
         self.stop_button.config(state=tk.DISABLED)
         self.status_var.set("Application stopped")
     
+    def on_restart_click(self):
+        """Stop the application, then start it again"""
+        # on_stop_click returns once every service has exited
+        self.on_stop_click()
+        self.on_start_click()
+    
+    def on_load_older_click(self):
+        """Handle load older logs button click"""
+        if not self.log_sink.load_older():
+            self.status_var.set("No older log history")
+    
     def on_closing(self):
         """Handle window closing"""
-        if self.processes:
+        if self.supervisor:
             if messagebox.askokcancel("Quit", "Application is running. Stop and quit?"):
                 self.stop_application()
+                self.dispatcher.stop()
+                self.log_sink.close()
                 self.root.destroy()
         else:
+            self.dispatcher.stop()
+            self.log_sink.close()
             self.root.destroy()
     
+    def handle_control(self, request):
+        """Answer a command from the control socket (on its own thread)"""
+        command = request['command']
+        running = self.is_app_running()
+        status = {'ok': True, 'launcher': 'launcher', 'pid': os.getpid(), 'running': running}
+        if command == 'status':
+            return status
+        if command == 'activate':
+            command = 'open' if running else 'start'
+        if command in ('profile', 'heap'):
+            return dict(status, ok=False, error="captures need cross-platform-launcher.py")
+        # Tk is not thread-safe: queue the action for the window's main loop
+        if command == 'open':
+            if self.dispatcher:
+                self.dispatcher.post(self.root.deiconify)
+            self.open_browser()
+            return dict(status, message="Opened http://localhost:5173")
+        if not self.dispatcher:
+            return dict(status, ok=False, error=f"'{command}' needs the launcher window")
+        if command == 'start' and not running:
+            self.dispatcher.post(self.on_start_click)
+        elif command == 'stop' and running:
+            self.dispatcher.post(self.on_stop_click)
+        elif command == 'restart':
+            self.dispatcher.post(self.on_restart_click)
+        elif command == 'quit':
+            self.dispatcher.post(self.on_closing)
+        return dict(status, message=f"Sent '{command}' to the launcher window")
+    
     def run_cli(self):
         """Run in command line mode"""
         print("Factory Management App Launcher (CLI Mode)")
@@ -289,11 +324,11 @@ class AppLauncher:
         
         print("Starting application...")
         try:
-            process = self.start_application()
-            if process:
+            supervisor = self.start_application()
+            if supervisor:
                 print("Application started successfully!")
                 print("Press Ctrl+C to stop")
-                process.wait()
+                self.loop_thread.call(supervisor.wait())
             else:
                 print("Failed to start application")
                 return False
@@ -306,6 +341,16 @@ class AppLauncher:
 def main():
     launcher = AppLauncher()
     
+    # A second launch shows the running app instead of starting another copy
+    claimed = claim('launcher', launcher.handle_control)
+    if claimed is None:
+        return True
+    try:
+        return run_launcher(launcher)
+    finally:
+        release(claimed)
+
+def run_launcher(launcher):
     if len(sys.argv) > 1 and sys.argv[1] == '--cli':
         return launcher.run_cli()
     
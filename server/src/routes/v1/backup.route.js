@@ -4,30 +4,98 @@ const { exec } = require('child_process');
 const path = require('path');
 const fs = require('fs');
 
-router.get('/download', async (req, res) => {
+// The launcher exports its scheduled backups (FACTORY_BACKUP_AT) into
+// FACTORY_BACKUP_EXPORT_DIR with a marker naming the backup's age; a recent
+// export is served as is, and no request ever waits for a dump
+const BACKUP_MAX_AGE_MS = (Number(process.env.BACKUP_MAX_AGE_HOURS) || 26) * 60 * 60 * 1000;
+const EXPORT_FILE = 'logix-backup.gz';
+const EXPORT_MARKER = 'logix-backup.json';
+// Without an export, a dump runs in the background and is served for a
+// short while after it finishes, so a retry gets it but a later click
+// gets fresh data; on-demand dumps never count as an export
+const ON_DEMAND_FILE = 'on-demand-backup.gz';
+const ON_DEMAND_MAX_AGE_MS = 10 * 60 * 1000;
+const RETRY_AFTER_SECONDS = 30;
+
+let dumpRunning = false;
+let failedDump = null;
+
+const backupDir = () => process.env.FACTORY_BACKUP_EXPORT_DIR || path.join(__dirname, '../../../backup');
+
+const scheduledExport = (dir) => {
   try {
-    // Create a backup directory if it doesn't exist
-    const backupDir = path.join(__dirname, '../../backup');
-    if (!fs.existsSync(backupDir)) fs.mkdirSync(backupDir);
+    const marker = JSON.parse(fs.readFileSync(path.join(dir, EXPORT_MARKER), 'utf8'));
+    const file = path.join(dir, marker.archive || EXPORT_FILE);
+    if (Date.now() - Date.parse(marker.created) < BACKUP_MAX_AGE_MS && fs.existsSync(file)) {
+      return file;
+    }
+  } catch (err) {
+    // No export from the launcher yet
+  }
+  return null;
+};
 
-    // Backup file path
-    const backupFile = path.join(backupDir, 'logix-backup.gz');
+const recentDump = (dir) => {
+  const file = path.join(dir, ON_DEMAND_FILE);
+  try {
+    if (Date.now() - fs.statSync(file).mtimeMs < ON_DEMAND_MAX_AGE_MS) return file;
+  } catch (err) {
+    // No dump yet
+  }
+  return null;
+};
 
-    // Run mongodump to create a gzip archive
-    exec(`mongodump --uri="${process.env.MONGODB_URI || 'mongodb://localhost:27017/factory'}" --archive=${backupFile} --gzip`, (error) => {
+// One mongodump at a time, written aside and renamed so a partial archive
+// is never served
+const startDump = (dir) => {
+  if (dumpRunning) return;
+  dumpRunning = true;
+  const backupFile = path.join(dir, ON_DEMAND_FILE);
+  const partFile = `${backupFile}.part`;
+  exec(
+    `mongodump --uri="${process.env.MONGODB_URI || 'mongodb://localhost:27017/factory'}" --archive="${partFile}" --gzip`,
+    (error) => {
+      dumpRunning = false;
       if (error) {
-        return res.status(500).send('Backup failed: ' + error.message);
+        failedDump = error;
+        return;
+      }
+      try {
+        fs.renameSync(partFile, backupFile);
+      } catch (err) {
+        failedDump = err;
       }
+    }
+  );
+};
+
+router.get('/download', async (req, res) => {
+  try {
+    // Create a backup directory if it doesn't exist
+    const dir = backupDir();
+    if (!fs.existsSync(dir)) fs.mkdirSync(dir, { recursive: true });
+
+    const file = scheduledExport(dir) || recentDump(dir);
+    if (file) {
       // Send the backup file as a download
-      res.download(backupFile, 'mongodb-backup.gz', (err) => {
-        if (err) res.status(500).send('Download failed');
-        // Optionally, delete the backup file after sending
-        // fs.unlinkSync(backupFile);
+      return res.download(file, 'mongodb-backup.gz', (err) => {
+        if (err && !res.headersSent) res.status(500).send('Download failed');
       });
-    });
+    }
+
+    if (failedDump && !dumpRunning) {
+      const error = failedDump;
+      failedDump = null;
+      return res.status(500).send('Backup failed: ' + error.message);
+    }
+    // Dumping on the request path would hold it (and the database) for as
+    // long as mongodump runs; start one and let the client come back
+    startDump(dir);
+    res.set('Retry-After', String(RETRY_AFTER_SECONDS));
+    res.status(503).send('Backup not yet available; one is being prepared, try again shortly');
   } catch (err) {
     res.status(500).send('Error: ' + err.message);
   }
 });
 
-module.exports = router;
\ No newline at end of file
+module.exports = router;
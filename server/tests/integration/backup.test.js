@@ -0,0 +1,117 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const request = require('supertest');
+const httpStatus = require('http-status');
+
+jest.mock('child_process', () => ({ ...jest.requireActual('child_process'), exec: jest.fn() }));
+
+const { exec } = require('child_process');
+const app = require('../../src/app');
+
+const binaryParser = (res, callback) => {
+  const chunks = [];
+  res.on('data', (chunk) => chunks.push(chunk));
+  res.on('end', () => callback(null, Buffer.concat(chunks)));
+};
+
+const download = () => request(app).get('/v1/backup/download').buffer(true).parse(binaryParser);
+
+describe('Backup routes', () => {
+  let exportDir;
+  let dumps;
+
+  beforeEach(() => {
+    exportDir = fs.mkdtempSync(path.join(os.tmpdir(), 'backup-test-'));
+    process.env.FACTORY_BACKUP_EXPORT_DIR = exportDir;
+    dumps = 0;
+    // Stand-in for mongodump: write a new archive where it was asked to
+    exec.mockImplementation((command, callback) => {
+      dumps += 1;
+      fs.writeFileSync(command.match(/--archive="([^"]+)"/)[1], `dump ${dumps}`);
+      callback(null);
+    });
+  });
+
+  afterEach(() => {
+    delete process.env.FACTORY_BACKUP_EXPORT_DIR;
+    fs.rmdirSync(exportDir, { recursive: true });
+  });
+
+  const writeExport = (created) => {
+    fs.writeFileSync(path.join(exportDir, 'logix-backup.gz'), 'scheduled');
+    fs.writeFileSync(
+      path.join(exportDir, 'logix-backup.json'),
+      JSON.stringify({ generation: 'g1', created: created.toISOString(), archive: 'logix-backup.gz' })
+    );
+  };
+
+  describe('GET /v1/backup/download', () => {
+    test('should serve a recent launcher export without running mongodump', async () => {
+      writeExport(new Date());
+
+      const res = await download().expect(httpStatus.OK);
+
+      expect(res.body.toString()).toBe('scheduled');
+      expect(exec).not.toHaveBeenCalled();
+    });
+
+    test('should answer 503 and dump in the background when there is no export', async () => {
+      const first = await download().expect(httpStatus.SERVICE_UNAVAILABLE);
+      const second = await download().expect(httpStatus.OK);
+
+      expect(first.headers['retry-after']).toBe('30');
+      expect(second.body.toString()).toBe('dump 1');
+      expect(exec).toHaveBeenCalledTimes(1);
+      expect(fs.existsSync(path.join(exportDir, 'logix-backup.gz'))).toBe(false);
+    });
+
+    test('should run one mongodump for concurrent requests', async () => {
+      let finish;
+      exec.mockImplementation((command, callback) => {
+        dumps += 1;
+        finish = () => {
+          fs.writeFileSync(command.match(/--archive="([^"]+)"/)[1], `dump ${dumps}`);
+          callback(null);
+        };
+      });
+
+      await download().expect(httpStatus.SERVICE_UNAVAILABLE);
+      await download().expect(httpStatus.SERVICE_UNAVAILABLE);
+      expect(exec).toHaveBeenCalledTimes(1);
+
+      finish();
+      const res = await download().expect(httpStatus.OK);
+      expect(res.body.toString()).toBe('dump 1');
+    });
+
+    test('should dump again once the last on-demand dump is old', async () => {
+      await download().expect(httpStatus.SERVICE_UNAVAILABLE);
+      const old = new Date(Date.now() - 60 * 60 * 1000);
+      fs.utimesSync(path.join(exportDir, 'on-demand-backup.gz'), old, old);
+
+      await download().expect(httpStatus.SERVICE_UNAVAILABLE);
+      const res = await download().expect(httpStatus.OK);
+
+      expect(res.body.toString()).toBe('dump 2');
+      expect(exec).toHaveBeenCalledTimes(2);
+    });
+
+    test('should dump in the background when the launcher export is stale', async () => {
+      writeExport(new Date(Date.now() - 30 * 60 * 60 * 1000));
+
+      await download().expect(httpStatus.SERVICE_UNAVAILABLE);
+      const res = await download().expect(httpStatus.OK);
+
+      expect(res.body.toString()).toBe('dump 1');
+      expect(exec).toHaveBeenCalledTimes(1);
+    });
+
+    test('should return 500 after mongodump fails', async () => {
+      exec.mockImplementation((command, callback) => callback(new Error('mongodump not found')));
+
+      await download().expect(httpStatus.SERVICE_UNAVAILABLE);
+      await download().expect(httpStatus.INTERNAL_SERVER_ERROR);
+    });
+  });
+});
@@ -4,14 +4,21 @@ Windows-Specific Launcher for Factory Management App
 Handles Windows encoding and console issues
 """
 
-import os
+import asyncio
 import sys
-import subprocess
+import signal
 import platform
 import time
 import webbrowser
 from pathlib import Path
 
+from factory_launcher.aio import run_blocking
+from factory_launcher.install import install_all
+from factory_launcher.supervisor import Supervisor, app_services
+from factory_launcher.readiness import DEFAULT_PORTS, ReadinessProbe
+from factory_launcher.shutdown import reclaim_ports
+from factory_launcher.toolchain import resolve_toolchain
+
 # Set UTF-8 encoding for Windows console
 if platform.system() == 'Windows':
     import locale
@@ -27,7 +34,8 @@ if platform.system() == 'Windows':
 class WindowsLauncher:
     def __init__(self):
         self.app_dir = Path(__file__).parent
-        self.process = None
+        self.supervisor = None
+        self.ready_task = None
         
     def log(self, message):
         """Log message with timestamp"""
@@ -41,24 +49,17 @@ class WindowsLauncher:
     def check_requirements(self):
         """Check if Node.js and npm are installed"""
         try:
-            # Check Node.js
-            result = subprocess.run(['node', '--version'], 
-                                  capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                self.log(f"✓ Node.js found: {result.stdout.strip()}")
-            else:
-                self.log("✗ Node.js not found")
+            # Cached unless node.exe/npm.cmd changed; otherwise both version
+            # checks run at the same time
+            toolchain = resolve_toolchain('node', 'npm', log=self.log)
+            if not toolchain:
+                self.log("✗ Node.js or npm not found")
                 return False
             
-            # Check npm
-            result = subprocess.run(['npm', '--version'], 
-                                  capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                self.log(f"✓ npm found: {result.stdout.strip()}")
-                return True
-            else:
-                self.log("✗ npm not found")
-                return False
+            source = " (cached)" if toolchain.cached else ""
+            self.log(f"✓ Node.js found: {toolchain.node_version}{source}")
+            self.log(f"✓ npm found: {toolchain.npm_version}{source}")
+            return True
                 
         except Exception as e:
             self.log(f"Error checking requirements: {e}")
@@ -69,37 +70,8 @@ class WindowsLauncher:
         self.log("Installing dependencies...")
         
         try:
-            # Install root dependencies
-            if not (self.app_dir / 'node_modules').exists():
-                self.log("Installing root dependencies...")
-                result = subprocess.run(['npm', 'install'], 
-                                      cwd=self.app_dir, 
-                                      capture_output=True, text=True, timeout=300)
-                if result.returncode != 0:
-                    self.log(f"Error installing root dependencies")
-                    return False
-            
-            # Install client dependencies
-            client_dir = self.app_dir / 'client'
-            if client_dir.exists() and not (client_dir / 'node_modules').exists():
-                self.log("Installing client dependencies...")
-                result = subprocess.run(['npm', 'install'], 
-                                      cwd=client_dir, 
-                                      capture_output=True, text=True, timeout=300)
-                if result.returncode != 0:
-                    self.log(f"Error installing client dependencies")
-                    return False
-            
-            # Install server dependencies
-            server_dir = self.app_dir / 'server'
-            if server_dir.exists() and not (server_dir / 'node_modules').exists():
-                self.log("Installing server dependencies...")
-                result = subprocess.run(['npm', 'install'], 
-                                      cwd=server_dir, 
-                                      capture_output=True, text=True, timeout=300)
-                if result.returncode != 0:
-                    self.log(f"Error installing server dependencies")
-                    return False
+            if not install_all(self.app_dir, 'npm.cmd', log=self.log):
+                return False
             
             self.log("✓ Dependencies installed successfully!")
             return True
@@ -108,37 +80,25 @@ class WindowsLauncher:
             self.log(f"Error installing dependencies: {e}")
             return False
     
-    def start_application(self):
+    async def start_application(self):
         """Start the application"""
         try:
             self.log("Starting Factory Management Application...")
             
-            # Use Windows-specific command
-            cmd = ['cmd', '/c', 'npm', 'run', 'dev']
+            # Stop stale node processes left holding our ports by a previous run
+            await run_blocking(reclaim_ports, DEFAULT_PORTS, self.log)
             
-            # Start the application with proper encoding
-            self.process = subprocess.Popen(
-                cmd,
-                cwd=self.app_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                bufsize=1
-            )
+            # Server and client run as separate supervised children
+            self.supervisor = Supervisor(log=self.log)
+            for spec in app_services(self.app_dir, ['cmd', '/c', 'npm']):
+                self.supervisor.add(spec)
+            self.supervisor.start_all()
             
             self.log("✓ Application started successfully!")
-            self.log("Opening browser in 5 seconds...")
+            self.log("Browser will open when http://localhost:5173 and http://localhost:3000 answer")
             
-            # Open browser after delay
-            time.sleep(5)
-            try:
-                webbrowser.open("http://localhost:5173")
-                self.log("✓ Browser opened: http://localhost:5173")
-            except:
-                self.log("Could not open browser automatically")
-                self.log("Please open: http://localhost:5173")
+            # Readiness polling shares the event loop with the output readers
+            self.ready_task = asyncio.ensure_future(self.open_browser_when_ready())
             
             return True
             
@@ -146,54 +106,68 @@ class WindowsLauncher:
             self.log(f"Error starting application: {e}")
             return False
     
-    def monitor_output(self):
-        """Monitor application output"""
-        if not self.process:
+    async def open_browser_when_ready(self):
+        """Open the browser as soon as both ports answer"""
+        probe = ReadinessProbe(log=self.log)
+        if await probe.wait_async():
+            self.log(f"✓ Application ready in {probe.elapsed:.1f}s")
+        else:
+            self.log("Application is not answering yet, opening browser anyway")
+        try:
+            await run_blocking(webbrowser.open, "http://localhost:5173")
+            self.log("✓ Browser opened: http://localhost:5173")
+        except:
+            self.log("Could not open browser automatically")
+            self.log("Please open: http://localhost:5173")
+    
+    async def monitor_output(self):
+        """Wait while the supervised services run; their output is logged as it arrives"""
+        if not self.supervisor:
             return
         
+        loop = asyncio.get_event_loop()
+        stop_requested = asyncio.Event()
+        # Ctrl+C only sets an event; the loop wakes on it instead of polling
+        signal.signal(signal.SIGINT, lambda *args: loop.call_soon_threadsafe(stop_requested.set))
+        
         try:
             self.log("Application is running...")
             self.log("Press Ctrl+C to stop")
             self.log("=" * 50)
             
-            while True:
-                output = self.process.stdout.readline()
-                if output == '' and self.process.poll() is not None:
-                    break
-                if output:
-                    try:
-                        # Clean the output for display
-                        clean_output = output.strip()
-                        # Remove ANSI color codes
-                        import re
-                        clean_output = re.sub(r'\x1b\[[0-9;]*m', '', clean_output)
-                        if clean_output:
-                            print(clean_output)
-                    except:
-                        print("[Output with encoding issues]")
-                        
-        except KeyboardInterrupt:
-            self.log("\nStopping application...")
-            self.stop_application()
+            waiters = [asyncio.ensure_future(self.supervisor.wait()),
+                       asyncio.ensure_future(stop_requested.wait())]
+            _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in pending:
+                waiter.cancel()
+            
+            if stop_requested.is_set():
+                self.log("\nStopping application...")
+            await self.stop_application()
         except Exception as e:
             self.log(f"Error monitoring output: {e}")
+        finally:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
     
-    def stop_application(self):
+    async def stop_application(self):
         """Stop the application"""
-        if self.process:
+        if self.ready_task:
+            self.ready_task.cancel()
+            self.ready_task = None
+        if self.supervisor:
             try:
-                # Terminate the process
-                self.process.terminate()
-                self.process.wait(timeout=5)
+                await self.supervisor.stop_all()
                 self.log("✓ Application stopped")
-            except:
-                # Force kill if needed
-                try:
-                    subprocess.run(['taskkill', '/F', '/PID', str(self.process.pid)], 
-                                 capture_output=True)
-                    self.log("✓ Application force stopped")
-                except:
-                    pass
+            except Exception as e:
+                self.log(f"Error stopping application: {e}")
+            self.supervisor = None
+    
+    async def run_services(self):
+        """Start the services and keep them running until Ctrl+C or exit"""
+        if not await self.start_application():
+            return False
+        await self.monitor_output()
+        return True
     
     def run(self):
         """Main run method"""
@@ -215,15 +189,12 @@ class WindowsLauncher:
             input("\nPress Enter to exit...")
             return False
         
-        # Start application
-        if not self.start_application():
+        # Start the application and monitor it on one event loop
+        if not asyncio.run(self.run_services()):
             self.log("\n❌ Failed to start application!")
             input("\nPress Enter to exit...")
             return False
         
-        # Monitor output
-        self.monitor_output()
-        
         return True
 
 if __name__ == "__main__":